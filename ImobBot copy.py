@@ -2,7 +2,6 @@ import os
 import re
 import time
 import threading
-import unicodedata
 import pandas as pd
 import logging
 import asyncio
@@ -45,44 +44,11 @@ active_scraping_tasks = {}  # {user_id: {'cancelled': bool, 'thread': threading.
 scraping_lock = threading.Lock()
 
 # --- Constantes e dados ---
-ZONAS_RJ = {
-    "Zona Central": ["Centro", "Catumbi", "Cidade Nova", "Estácio", "Gamboa", "Lapa", "Mangueira", "Paquetá", "Rio Comprido", "Santa Teresa", "Santo Cristo", "Saúde", "Vasco da Gama"],
-    "Zona Sul": ["Botafogo", "Glória", "Catete", "Copacabana", "Cosme Velho", "Flamengo", "Gávea", "Humaitá", "Ipanema", "Jardim Botânico", "Lagoa", "Laranjeiras", "Leblon", "Leme", "Rocinha", "São Conrado", "Urca", "Vidigal"],
-    "Zona Oeste": ["Anil", "Barra da Tijuca", "Barra de Guaratiba", "Camorim", "Cidade de Deus", "Curicica", "Freguesia (Jacarepaguá)", "Gardênia Azul", "Grumari", "Itanhangá", "Jacarepaguá", "Joá", "Praça Seca", "Pechincha", "Recreio dos Bandeirantes", "Tanque", "Taquara", "Vargem Grande", "Vargem Pequena", "Vila Valqueire", "Bangu", "Deodoro", "Gericinó", "Jardim Sulacap", "Magalhães Bastos", "Padre Miguel", "Realengo", "Santíssimo", "Senador Camará", "Vila Militar", "Campo Grande", "Cosmos", "Guaratiba", "Inhoaíba", "Paciência", "Pedra de Guaratiba", "Santa Cruz", "Senador Vasconcelos", "Sepetiba"],
-    "Zona Norte": ["Acari", "Pavuna ", "São Cristóvão", "Benfica", "Alto da Boa Vista", "Andaraí", "Abolição", "Água Santa", "Cachambi", "Caju", "Del Castilho", "Encantado", "Engenho de Dentro", "Engenho Novo", "Grajaú", "Higienópolis", "Jacaré", "Jacarezinho", "Lins de Vasconcelos", "Manguinhos", "Maria da Graça", "Maracanã", "Méier", "Piedade", "Pilares", "Praça da Bandeira", "Riachuelo", "Rocha", "Sampaio", "São Francisco Xavier", "Tijuca", "Vila Isabel", "Bancários", "Bonsucesso", "Cacuia", "Cocotá", "Freguesia (Ilha do Governador)", "Galeão", "Jardim Carioca", "Jardim Guanabara", "Maré", "Moneró", "Olaria", "Pitangueiras", "Portuguesa", "Praia da Bandeira", "Ramos", "Ribeira", "Tauá", "Zumbi", "Acari", "Anchieta", "Barros Filho", "Bento Ribeiro", "Brás de Pina", "Campinho", "Cavalcanti", "Cascadura", "Coelho Neto", "Colégio", "Cordovil", "Costa Barros", "Engenheiro Leal", "Engenho da Rainha", "Guadalupe", "Honório Gurgel", "Inhaúma", "Irajá", "Jardim América", "Madureira", "Marechal Hermes", "Oswaldo Cruz", "Parada de Lucas", "Parque Anchieta", "Parque Colúmbia", "Pavuna", "Penha", "Penha Circular", "Quintino Bocaiuva", "Ricardo de Albuquerque", "Rocha Miranda", "Tomás Coelho", "Turiaçu", "Vaz Lobo", "Vicente de Carvalho", "Vigário Geral", "Vila da Penha", "Vila Kosmos", "Vista Alegre"]
-}
-
-# Carrega cidades validadas do interior do RJ (arquivo deve estar no mesmo diretório)
-try:
-    with open("cidades_rj_validadas.txt", "r", encoding="utf-8") as f:
-        CIDADES_RJ = [line.strip() for line in f if line.strip()]
-    logger.info(f"✅ Loaded {len(CIDADES_RJ)} cities from cidades_rj_validadas.txt")
-    if len(CIDADES_RJ) == 0:
-        logger.warning("⚠️ File cidades_rj_validadas.txt is empty")
-except FileNotFoundError:
-    logger.error("❌ File cidades_rj_validadas.txt not found")
-    CIDADES_RJ = []
-except Exception as e:
-    logger.error(f"❌ Error loading cidades_rj_validadas.txt: {str(e)}")
-    CIDADES_RJ = []
-
-TIPOS_IMOVEL = [
-    "Apartamento", 
-    "Casa", 
-    "Casa de Condomínio",
-    "Cobertura Residencial",
-    "Kitnet Residencial",
-    "Flat Residencial",
-    "Terreno",
-    "Prédio Residencial",
-    "Prédio Comercial",
-    "Sala Comercial",
-    "Galpões Comerciais", 
-    "Pontos Comerciais",
-    "Consultórios Comerciais",
-    "Imóveis Comerciais",
-    "Fazendas / Sitios"
-]
+# Zonas, bairros, cidades, tipos de imóvel e slugs vêm de localidades_rj.json
+from localidades import (
+    ZONAS_RJ, CIDADES_RJ, TIPOS_IMOVEL,
+    TIPO_SLUGS_VIVAREAL, ZONA_SLUGS, CIDADE_SLUGS, BAIRRO_SLUGS_VIVAREAL, normalize_str, slug,
+)
 MODALIDADES = ["Aluguel", "Venda"]
 
 # --- Estados da conversa ---
@@ -111,18 +77,6 @@ def gpt4o_ask(prompt, system=None):
         return "Desculpe, houve um erro na comunicação. Tente novamente."
 
 # --- Funções utilitárias ---
-def normalize_str(s):
-    if not s:
-        return ""
-    # Remove acentos e caracteres especiais
-    s = unicodedata.normalize('NFD', s)
-    s = ''.join(c for c in s if unicodedata.category(c) != 'Mn')
-    # Converte para minúsculas e substitui espaços por hífens
-    s = s.lower().strip()
-    s = re.sub(r'[^\w\s-]', '', s) # Remove caracteres não alfanuméricos, exceto espaços e hífens
-    s = re.sub(r'[-\s]+', '-', s) # Substitui um ou mais espaços/hífens por um único hífen
-    return s.strip('-')
-
 def build_vivareal_url(context):
     """
     Monta a URL do Viva Real para busca, seguindo o padrão exato do site
@@ -135,63 +89,34 @@ def build_vivareal_url(context):
     bairro = context.get('bairro', '').strip().lower() if context.get('bairro') else ''
     local = context.get('local', '')
 
-    # Mapeamento de tipologia para slug do Viva Real
-    tipo_slug_map = {
-        'apartamento': 'apartamento_residencial',
-        'casa': 'casa_residencial',
-        'casa de condomínio': "condominio_residencial",
-        'cobertura residencial': "cobertura_residencial",
-        'kitnet residencial': "kitnet_residencial",
-        'flat residencial': "flat_residencial",
-        'terreno': 'lote-terreno_residencial',
-        'prédio residencial': 'edificio-residencial_comercial',
-        'prédio comercial': 'predio_comercial',
-        'sala comercial': 'sala_comercial',
-        'galpões comerciais': "galpao_comercial",
-        'pontos comerciais': "ponto-comercial_comercial",
-        'consultórios comerciais': "consultorio_comercial",
-        'imóveis comerciais': "imovel-comercial_comercial",
-        'fazendas / sitios': 'granja_comercial'
-    }
-    tipo_slug = tipo_slug_map.get(tipo, tipo)
+    tipo_slug = TIPO_SLUGS_VIVAREAL.get(tipo, tipo)
 
     # Modalidade
     trans_slug = 'venda' if modalidade == 'venda' else 'aluguel'
 
-    # Mapeamento de zonas para slug do Viva Real
-    zona_slug_map = {
-        'zona sul': 'zona-sul',
-        'zona norte': 'zona-norte',
-        'zona oeste': 'zona-oeste',
-        'centro': 'zona-central',
-        'zona central': 'zona-central'
-    }
-
-
-
     # Montagem da URL
     if local == 'todo_estado':
         # Todo o estado: /venda/rj/apartamento_residencial/
         url = f"{base_url}/{trans_slug}/rj/{tipo_slug}/"
     elif local == 'cidade':
         # Cidade do interior: /venda/rj/marica/casa_residencial/
-        cidade_norm = normalize_str(cidade)
+        cidade_norm = slug(CIDADE_SLUGS, cidade)
         url = f"{base_url}/{trans_slug}/rj/{cidade_norm}/{tipo_slug}/"
     elif local == 'zona':
         # Zona completa: /venda/rj/rio-de-janeiro/zona-sul/
-        zona_slug = zona_slug_map.get(zona, normalize_str(zona))
+        zona_slug = slug(ZONA_SLUGS, zona)
         if tipo_slug:
             url = f"{base_url}/{trans_slug}/rj/rio-de-janeiro/{zona_slug}/{tipo_slug}/"
         else:
             url = f"{base_url}/{trans_slug}/rj/rio-de-janeiro/{zona_slug}/"
     elif local == 'zona_completa':
         # Zona completa (nova funcionalidade): /venda/rj/rio-de-janeiro/zona-sul/casa_residencial/
-        zona_slug = zona_slug_map.get(zona, normalize_str(zona))
+        zona_slug = slug(ZONA_SLUGS, zona)
         url = f"{base_url}/{trans_slug}/rj/rio-de-janeiro/{zona_slug}/{tipo_slug}/"
     elif local == 'bairro':
         # Bairro específico: /venda/rj/rio-de-janeiro/zona-sul/gloria/casa_residencial/
-        zona_slug = zona_slug_map.get(zona, normalize_str(zona))
-        bairro_norm = normalize_str(bairro)
+        zona_slug = slug(ZONA_SLUGS, zona)
+        bairro_norm = slug(BAIRRO_SLUGS_VIVAREAL, bairro)
         url = f"{base_url}/{trans_slug}/rj/rio-de-janeiro/{zona_slug}/{bairro_norm}/{tipo_slug}/"
     else:
         # fallback para cidade do RJ
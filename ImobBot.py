@@ -2,7 +2,6 @@ import os
 import re
 import time
 import threading
-import unicodedata
 import pandas as pd
 import logging
 import asyncio
@@ -45,492 +44,11 @@ active_scraping_tasks = {}  # {user_id: {'cancelled': bool, 'thread': threading.
 scraping_lock = threading.Lock()
 
 # --- Constantes e dados ---
-ZONAS_RJ = {
-    "Zona Central": ["Centro", "Catumbi", "Cidade Nova", "Estácio", "Gamboa", "Lapa", "Mangueira", "Paquetá", "Rio Comprido", "Santa Teresa", "Santo Cristo", "Saúde", "Vasco da Gama"],
-    "Zona Sul": ["Botafogo", "Glória", "Catete", "Copacabana", "Cosme Velho", "Flamengo", "Gávea", "Humaitá", "Ipanema", "Jardim Botânico", "Lagoa", "Laranjeiras", "Leblon", "Leme", "Rocinha", "São Conrado", "Urca", "Vidigal"],
-    "Zona Oeste": ["Anil", "Barra da Tijuca", "Barra de Guaratiba", "Camorim", "Cidade de Deus", "Curicica", "Freguesia (Jacarepaguá)", "Gardênia Azul", "Grumari", "Itanhangá", "Jacarepaguá", "Joá", "Praça Seca", "Pechincha", "Recreio dos Bandeirantes", "Tanque", "Taquara", "Vargem Grande", "Vargem Pequena", "Vila Valqueire", "Bangu", "Deodoro", "Gericinó", "Jardim Sulacap", "Magalhães Bastos", "Padre Miguel", "Realengo", "Santíssimo", "Senador Camará", "Vila Militar", "Campo Grande", "Cosmos", "Guaratiba", "Inhoaíba", "Paciência", "Pedra de Guaratiba", "Santa Cruz", "Senador Vasconcelos", "Sepetiba"],
-    "Zona Norte": ["Acari", "Pavuna ", "São Cristóvão", "Benfica", "Alto da Boa Vista", "Andaraí", "Abolição", "Água Santa", "Cachambi", "Caju", "Del Castilho", "Encantado", "Engenho de Dentro", "Engenho Novo", "Grajaú", "Higienópolis", "Jacaré", "Jacarezinho", "Lins de Vasconcelos", "Manguinhos", "Maria da Graça", "Maracanã", "Méier", "Piedade", "Pilares", "Praça da Bandeira", "Riachuelo", "Rocha", "Sampaio", "São Francisco Xavier", "Tijuca", "Vila Isabel", "Bancários", "Bonsucesso", "Cacuia", "Cocotá", "Freguesia (Ilha do Governador)", "Galeão", "Jardim Carioca", "Jardim Guanabara", "Maré", "Moneró", "Olaria", "Pitangueiras", "Portuguesa", "Praia da Bandeira", "Ramos", "Ribeira", "Tauá", "Zumbi", "Acari", "Anchieta", "Barros Filho", "Bento Ribeiro", "Brás de Pina", "Campinho", "Cavalcanti", "Cascadura", "Coelho Neto", "Colégio", "Cordovil", "Costa Barros", "Engenheiro Leal", "Engenho da Rainha", "Guadalupe", "Honório Gurgel", "Inhaúma", "Irajá", "Jardim América", "Madureira", "Marechal Hermes", "Oswaldo Cruz", "Parada de Lucas", "Parque Anchieta", "Parque Colúmbia", "Pavuna", "Penha", "Penha Circular", "Quintino Bocaiuva", "Ricardo de Albuquerque", "Rocha Miranda", "Tomás Coelho", "Turiaçu", "Vaz Lobo", "Vicente de Carvalho", "Vigário Geral", "Vila da Penha", "Vila Kosmos", "Vista Alegre"]
-}
-
-# Carrega cidades validadas do interior do RJ (arquivo deve estar no mesmo diretório)
-try:
-    with open("cidades_rj_validadas.txt", "r", encoding="utf-8") as f:
-        CIDADES_RJ = [line.strip() for line in f if line.strip()]
-    logger.info(f"✅ Loaded {len(CIDADES_RJ)} cities from cidades_rj_validadas.txt")
-    if len(CIDADES_RJ) == 0:
-        logger.warning("⚠️ File cidades_rj_validadas.txt is empty")
-except FileNotFoundError:
-    logger.error("❌ File cidades_rj_validadas.txt not found")
-    CIDADES_RJ = []
-except Exception as e:
-    logger.error(f"❌ Error loading cidades_rj_validadas.txt: {str(e)}")
-    CIDADES_RJ = []
-
-# Dados das cidades do interior do RJ com seus bairros
-CIDADES_INTERIOR_BAIRROS = {
-    "Angra dos Reis": [
-        "Abraão (Ilha Grande)", "Areal", "Balneário", "Belém", "Bonfim", "Camorim",
-        "Camorim Pequeno", "Centro", "Enseada (Ilha Grande)", "Enseada das Estrelas (Ilha Grande)",
-        "Frade", "Gamboa do Bracuí", "Garatucaia", "Jacuecanga", "Japuíba", "Marinas",
-        "Mombaça", "Monsuaba", "Morro da Carioca", "Morro da Cruz", "Morro do Carmo",
-        "Morro do Peres", "Parque das Palmeiras", "Perequê", "Praia Brava", "Praia do Anil",
-        "Praia Grande", "Retiro", "Ribeira", "Santa Rita do Bracuí", "Santo Antônio",
-        "São Bento", "Sapé", "Sertão do Bracuí", "Vila do Abraão", "Vila Histórica de Mambucaba",
-        "Vila Velha"
-    ],
-    "Aperibé": [
-        "Centro", "Ponte Seca", "Vila Tostes", "Presidente Kenedy", "Nossa Senhora de Fátima",
-        "São João", "Verdes Vales"
-    ],
-    "Araruama": [
-        "Areal", "Bananeiras", "Barbudo", "Boa Perna", "Centro", "Coqueiral",
-        "Engenho Grande", "Fazendinha", "Hawai", "Hospício", "Iguabinha", "Japão",
-        "Jardim Califórnia", "Jardim São Paulo", "Monteiro", "Morro Grande",
-        "Nossa Senhora de Nazareth", "Novo Horizonte", "Outeiro", "Paracatu",
-        "Parque Hotel", "Parati", "Pernambuca", "Ponta do Capim", "Pontinha",
-        "Praia do Hospício", "Praia Seca", "São Vicente de Paulo", "Viaduto", "Vila Capri"
-    ],
-    "Areal": [
-        "Centro", "Distrito de Alberto Torres", "Granja São José", "Vila de Areal"
-    ],
-    "Armação dos Búzios": [
-        "Alto de Búzios", "Armação", "Baía Formosa", "Barra da Lagoa", "Brava", "Canto",
-        "Centro", "Ferradura", "Forno", "Geribá", "João Fernandes", "José Gonçalves",
-        "Manguinhos", "Ossos", "Praia Rasa", "São José", "Tartaruga", "Tucuns"
-    ],
-    "Arraial do Cabo": [
-        "Caiçara", "Caminho do Pontal", "Canaa", "Centro", "Figueira", "Macedônia",
-        "Monte Alto", "Morro da Boa Vista", "Morro da Cabocla", "Parque das Garças",
-        "Pernambuca", "Pontal", "Prainha", "Praia dos Anjos", "Praia Grande", "Sítio",
-        "Taio", "Vila Canaã", "Vila Industrial"
-    ],
-    "Barra do Piraí": [
-        "Asa Branca", "Caixa D'água Velha", "Califórnia da Barra", "Carvão", "Centro",
-        "Chácara Farani", "Coimbra", "Coqueiros", "Distrito de Ipiabas", "Dr. Mesquita",
-        "Grota do Neném", "Horto", "Maracanã", "Matadouro", "Morro do Gama", "Muqueca",
-        "Oficinas Velhas", "Parque Santana", "Roseira", "Santo Antônio", "São João",
-        "São Luís", "Vargem Grande", "Vila Helena", "Vila Suíça"
-    ],
-    "Barra Mansa": [
-        "Ano Bom", "Apiadeiro", "Boa Sorte", "Boa Vista", "Bocaininha", "Centro",
-        "Colônia Santo Antônio", "Estamparia", "Jardim América", "Jardim Boa Vista",
-        "Jardim Central", "Jardim Marilu", "Jardim Primavera", "Light",
-        "Nossa Senhora do Amparo", "Nova Esperança", "Piteiras", "Rialto", "Roselândia",
-        "Santa Clara", "Santa Izabel", "Santa Rosa", "São Francisco de Assis",
-        "São Judas Tadeu", "São Luiz", "São Silvestre", "Saudade", "Siderlândia",
-        "Verbo Divino", "Vila Coringa", "Vila Elmira", "Vila Independência", "Vila Maria",
-        "Vila Nova", "Vila Orlandélia", "Vila Principal", "Vila Ursulino", "Vista Alegre"
-    ],
-    "Belford Roxo": [
-        "Areia Branca", "Barro Vermelho", "Bayer", "Bom Pastor", "Centro", "Coelho da Rocha",
-        "Farrula", "Heliópolis", "Itaipu", "Jardim do Ipê", "Jardim Gláucia", "Lote XV",
-        "Nova Aurora", "Piam", "Redentor", "Santa Amélia", "Santa Maria", "Santa Teresa",
-        "Santo Antônio da Prata", "São Bernardo", "São Francisco de Assis", "São Vicente",
-        "Sargento Roncalli", "Vale do Ipê", "Vila Pauline", "Xavantes"
-    ],
-    "Bom Jardim": [
-        "Alto de Santa Cruz", "Bairro de Fátima", "Centro", "Jardim Ornellas", "Maravilha",
-        "Parque das Águas", "São Miguel", "Varginha", "Vila da Amizade"
-    ],
-    "Bom Jesus do Itabapoana": [
-        "Centro", "Bela Vista", "Pimentel Marques", "Lia Márcia", "Novo", "Monte Calvário",
-        "José Lima", "Parque do Trevo"
-    ],
-    "Cabo Frio": [
-        "Algodoal", "Braga", "Caminho de Búzios", "Centro", "Dunas do Peró", "Foguete",
-        "Gamboa", "Guarani", "Itajuru", "Jardim Caiçara", "Jardim Excelsior",
-        "Jardim Flamboyant", "Jardim Olinda", "Jardim Peró", "Ogiva", "Palmeiras",
-        "Parque Burle", "Passagem", "Peró", "Portinho", "Praia do Siqueira",
-        "Recanto das Dunas", "São Bento", "São Cristóvão", "Unamar", "Vila do Sol", "Vila Nova"
-    ],
-     "Cachoeiras de Macacu": [
-        "Centro", "Japuíba", "Papucaia", "Subaio", "Boca do Mato", "Funchal",
-        "Castália", "Valério"
-    ],
-    "Cambuci": [
-        "Centro", "Floresta", "Cruzeiro", "São João do Paraíso", "Três Irmãos", "Funil",
-        "Monte Verde"
-    ],
-    "Campos dos Goytacazes": [
-        "Centro", "Parque Califórnia", "Parque Tamandaré", "Parque Santo Amaro",
-        "Parque Rosário", "Pelinca", "Parque Leopoldina", "Horto Municipal",
-        "Jardim Carioca", "Parque Turf Club", "Parque Corrientes", "Parque São Caetano",
-        "Parque Tarcísio Miranda", "Goytacazes", "Donana", "Goitacazes", "Farol de São Tomé",
-        "Travessão", "Guarus", "Ururaí", "Dores de Macabu", "Mundo Novo", "Tocos",
-        "Santo Eduardo", "Santa Maria"
-    ],
-    "Cantagalo": [
-        "Centro", "São José", "Parque das Árvores", "Triângulo", "Santo Antônio",
-        "São Pedro", "Boa Sorte"
-    ],
-    "Carapebus": [
-        "Centro", "Sapecado", "Urbis", "Praia de Carapebus", "Capelinha", "Vila Cândida"
-    ],
-    "Cardoso Moreira": [
-        "Centro", "Cachoeiro", "Orminda", "Catarino", "Parque das Acácias",
-        "Nossa Senhora da Penha"
-    ],
-    "Carmo": [
-        "Centro", "Botafogo", "Herdeiros", "Jardim Carmo", "Nossa Senhora da Glória",
-        "Parque Industrial"
-    ],
-    "Casimiro de Abreu": [
-        "Centro", "Barra de São João", "Rio Dourado", "Professor Souza", "Mataruna",
-        "Industrial", "Jardim Miramar"
-    ],
-    "Comendador Levy Gasparian": [
-        "Centro", "Afonso Arinos", "Fonseca Almeida", "Grotão", "Gulf"
-    ],
-    "Conceição de Macabu": [
-        "Centro", "Bocaina", "Vila São José", "Rhódia", "Piteiras", "Calçadinha"
-    ],
-    "Cordeiro": [
-        "Centro", "Retiro Poético", "Dois Valos", "Manancial", "Rodolfo", "São Luiz"
-    ],
-    "Duas Barras": [
-        "Centro", "Jardim do Lago", "Matadouro", "Vargem Grande", "Fazenda do Campo"
-    ],
-    "Duque de Caxias": [
-        "Bar dos Cavalheiros", "Centro", "Centenário", "Chácaras Arcampo", "Doutor Laureano",
-        "Engenho do Porto", "Gramacho", "Jardim Gramacho", "Jardim Leal", "Jardim Olavo Bilac",
-        "Lagunas e Dourados", "Parque Duque", "Parque Fluminense", "Parque Sarapuí",
-        "Periquitos", "Sarapuí", "Vila São Luís", "Vila Sarapuí", "Vinte e Cinco de Agosto",
-        "Campos Elíseos", "Capivari", "Chácaras Rio-Petrópolis", "Cidade dos Meninos",
-        "Figueira", "Imbariê", "Jardim Anhangá", "Jardim Primavera", "Mardi Gras",
-        "Nova Campinas", "Pilar", "Parada Angélica", "Parada Morabi", "Parque Eldorado",
-        "Parque Equitativa", "Santa Cruz da Serra", "Santa Lúcia", "Saracuruna", "Taquara",
-        "Vila Maria Helena", "Vila Santa Cruz", "Xerém"
-    ],
-    "Engenheiro Paulo de Frontin": [
-        "Centro", "Rodolfo de Abreu", "Graminha", "Sacra Família do Tinguá", "Morro Azul"
-    ],
-    "Guapimirim": [
-        "Bananal", "Centro", "Citrolândia", "Corujas", "Gleba de Fora", "Iconha",
-        "Jardim Guapimirim", "Limoeiro", "Monte Olivete", "Orindi", "Parada Ideal",
-        "Parque das Rosas", "Quinta Mariana", "Segredo", "Vale das Pedrinhas", "Vila Olímpia"
-    ],
-    "Iguaba Grande": [
-        "Centro", "Canellas City", "Cidade Nova", "Iguabela", "Jardim Solares",
-        "Lagoa Azul", "Parque Tamariz", "Pedreira"
-    ],
-    "Itaboraí": [
-        "Aldeia da Prata", "Ampliação", "Apolo", "Caluge", "Centro", "Chácaras de Inoã",
-        "Gebara", "Granjas Cabuçu", "Itambi", "Joaquim de Oliveira", "Manilha",
-        "Marambaia", "Nancilândia", "Nova Cidade", "Outeiro das Pedras", "Pachecos",
-        "Porto das Caixas", "Retiro São Joaquim", "Rio Várzea", "Sambaetiba",
-        "Santo Expedito", "São Joaquim", "São José", "Três Pontes", "Venda das Pedras",
-        "Visconde de Itaboraí"
-    ],
-    "Itaguaí": [
-        "Centro", "Vila Margarida", "Engenho", "Parque Brisamar", "Monte Serrat",
-        "Jardim América", "Leandro", "Coroa Grande", "Ilha da Madeira", "Vila Geni",
-        "Chaperó", "Ibirapitanga", "Mazomba", "Piranema"
-    ],
-    "Italva": [
-        "Centro", "Boa Vista", "Parque Industrial", "São Caetano", "Saldanha da Gama"
-    ],
-    "Itaocara": [
-        "Centro", "Cidade Nova", "Jardim da Aldeia", "Bocaina", "Caxias", "Adolvane"
-    ],
-    "Itaperuna": [
-        "Aeroporto", "Bela Vista", "Boa Fortuna", "Carulas", "Centro", "Cidade Nova",
-        "Cehab", "Fiteiro", "Frigorífico", "Glória", "Governo", "Horto Florestal",
-        "Jardim Surubi", "Lions", "Matadouro", "Niterói", "Presidente Costa e Silva",
-        "Presidente Humberto de Alencar Castelo Branco", "São Francisco", "São José",
-        "São Mateus", "Vale do Sol", "Vinhosa"
-    ],
-    "Itatiaia": [
-        "Centro", "Jardim Itatiaia", "Vila Magnólia", "Vila Odete", "Maromba", "Maringá", "Penedo"
-    ],
-    "Japeri": [
-        "Alecrim", "Belo Horizonte", "Beira-Mar", "Centro", "Chacrinha", "Cidade Jardim",
-        "Engenheiro Pedreira", "Eucaliptos", "Guandu", "Jardim Delamare", "Jardim Primavera",
-        "Jardim Semeador", "Lagoa do Sapo", "Laranjal", "Marajoara", "Mucajá", "Nova Belém",
-        "Parque Mucajá", "Santa Amélia", "Santa Inês", "São Jorge", "Vila Central",
-        "Vila Conceição", "Virgem de Fátima"
-    ],
-    "Macaé": [
-        "Aeroporto", "Aroeira", "Barra de Macaé", "Botafogo", "Cajueiros", "Campo do Oeste",
-        "Cancela Preta", "Cavaleiros", "Centro", "Costa do Sol", "Engenho da Praia",
-        "Eixo Sul", "Glória", "Granja dos Cavaleiros", "Horto", "Imbetiba", "Imboassica",
-        "Jardim Guanabara", "Jardim Santo Antônio", "Jardim Vitória", "Lagoa", "Lagomar",
-        "Miramar", "Mirante da Lagoa", "Nova Brasília", "Nova Holanda", "Novo Cavaleiros",
-        "Parque Aeroporto", "Parque de Tubos", "Parque Valentina Miranda", "Pecado",
-        "Praia Campista", "Riviera Fluminense", "Santa Mônica", "Sol y Mar", "Vale Encantado",
-        "Virgem Santa", "Visconde de Araújo"
-    ],
-    "Macuco": [
-        "Centro", "Barreira", "Glória", "Reta"
-    ],
-    "Magé": [
-        "Centro (Magé)", "Flexeiras", "Barbuda", "Pico", "Vila Nova", "Saco",
-        "Centro (Vila Inhomirim)", "Fragoso", "Piabetá", "Suruí", "Guia de Pacobaíba",
-        "Mauá", "Pau Grande", "Rio do Ouro", "Santo Aleixo"
-    ],
-    "Mangaratiba": [
-        "Centro", "Conceição de Jacareí", "Ibicuí", "Itacuruçá", "Muriqui",
-        "Praia do Saco", "Serra do Piloto", "Vila de Muriqui"
-    ],
-    "Maricá": [
-        "Araçatiba", "Barra de Maricá", "Caju", "Caxito", "Centro", "Condado de Maricá",
-        "Flamengo", "Guaratiba", "Inoã", "Itaipuaçu", "Jacaroá", "Jaconé",
-        "Jardim Atlântico", "Mumbuca", "Parque Nanci", "Pindobas", "Ponta Grossa",
-        "Ponta Negra", "Recanto de Itaipuaçu", "São José do Imbassaí", "Spar",
-        "Ubatiba", "Zacarias"
-    ],
-    "Mendes": [
-        "Centro", "Independência", "Humberto Antunes", "Santa Rita", "Vila Mariana"
-    ],
-    "Mesquita": [
-        "Alto Uruguai", "Banco de Areia", "Centro", "Chatuba", "Coreia", "Cosmorama",
-        "Edson Passos", "Jacutinga", "Juscelino", "Rocha Sobrinho", "Santa Terezinha",
-        "Santo Elias", "Vila Emil"
-    ],
-    "Miguel Pereira": [
-        "Arcádia", "Barão de Javary", "Centro", "Conrado", "Governador Portela",
-        "Lagoa das Lontras", "Paes Leme", "Plante Café", "Ramada", "Vera Cruz", "Vila Suíça"
-    ],
-    "Miracema": [
-        "Centro", "Santa Terezinha", "Cehab", "Vila Nova", "Santa Cruz", "Rodolfo"
-    ],
-    "Natividade": [
-        "Centro", "Sindicato", "Liberdade", "Popular", "Balança"
-    ],
-    "Nilópolis": [
-        "Cabuís", "Centro", "Nova Cidade", "Manoel Reis", "Nossa Senhora de Fátima",
-        "Novo Horizonte", "Olinda", "Paiol de Pólvora", "Santos Dumont", "Tropical"
-    ],
-    "Niterói": [
-        "Badu", "Baldeador", "Barreto", "Boa Viagem", "Cachoeiras", "Cafubá",
-        "Camboinhas", "Cantagalo", "Caramujo", "Centro", "Charitas", "Cubango",
-        "Engenhoca", "Engenho do Mato", "Fátima", "Fonseca", "Gragoatá", "Icaraí",
-        "Ilha da Conceição", "Ingá", "Itaipu", "Ititioca", "Jacaré", "Jurujuba",
-        "Largo da Batalha", "Maceió", "Maria Paula", "Matapaca", "Morro do Estado",
-        "Muriqui", "Pé Pequeno", "Piratininga", "Ponta d'Areia", "Rio do Ouro",
-        "Santa Bárbara", "Santa Rosa", "Santana", "São Domingos", "São Francisco",
-        "São Lourenço", "Sapê", "Tenente Jardim", "Várzea das Moças", "Viçoso Jardim",
-        "Viradouro", "Vital Brazil"
-    ],
-    "Nova Friburgo": [
-        "Amparo", "Braunes", "Caledônia", "Cardinot", "Cascatinha", "Centro",
-        "Chácara do Paraíso", "Conselheiro Paulino", "Cônego", "Duas Pedras",
-        "Jardim Califórnia", "Jardim Ouro Preto", "Lagoinha", "Lumiar", "Mury",
-        "Olaria", "Paissandu", "Parque São Clemente", "Ponte da Saudade", "Prado",
-        "Riograndina", "São Geraldo", "São Pedro da Serra", "Suspiro", "Vale dos Pinheiros",
-        "Varginha", "Vila Guarani", "Vilage"
-    ],
-    "Nova Iguaçu": [
-        "Adrianópolis", "Austin", "Bairro da Luz", "Boa Esperança", "Califórnia",
-        "Caonze", "Centro", "Cobrex", "Comendador Soares", "Figueiras", "Jardim Alvorada",
-        "Jardim Guandu", "Jardim Iguaçu", "Jardim Nova Era", "Jardim Palmares",
-        "Jardim Tropical", "Kennedy", "Km 32", "Miguel Couto", "Moquetá", "Nova América",
-        "Palhada", "Parque Ambaí", "Posse", "Prata", "Rancho Novo", "Riachão",
-        "Santa Eugênia", "Tinguá", "Vila de Cava", "Vila Nova", "Vila Operária"
-    ],
-    "Paracambi": [
-        "Centro", "Cascata", "Fábrica", "Guarajuba", "Jardim Nova Era", "Lages",
-        "Parque Industrial", "Sabugo", "São José", "Vila São José"
-    ],
-    "Paraíba do Sul": [
-        "Centro", "Jatobá", "Liberdade", "Ponte", "Salutaris", "Vila Salutaris"
-    ],
-    "Paraty": [
-        "Barra Grande", "Caboclo", "Caborê", "Centro Histórico", "Chácara da Saudade",
-        "Corumbê", "Cunha", "Fátima", "Jabaquara", "Laranjeiras", "Mangueira",
-        "Paraty Mirim", "Patrimônio", "Ponte Branca", "Pontal", "Portão de Ferro",
-        "Praia Grande", "São Gonçalo", "Saudade", "Sertão do Taquari", "Trindade"
-    ],
-    "Paty do Alferes": [
-        "Centro", "Arcozelo", "Avelar", "Monte Alegre", "Palmares"
-    ],
-    "Petrópolis": [
-        "Alto da Serra", "Araras", "Bairro Castrioto", "Bingen", "Cascatinha",
-        "Castelânea", "Centro Histórico", "Chácara Flora", "Cidale", "Coronel Veiga",
-        "Corrêas", "Duarte da Silveira", "Duchas", "Fazenda Inglesa", "Floresta",
-        "Independência", "Itaipava", "Itamarati", "Jardim Americano", "Mosela",
-        "Nogueira", "Pedro do Rio", "Posse", "Quitandinha", "Retiro", "Samambaia",
-        "São Sebastião", "Secretário", "Siméria", "Valparaíso", "Vila Militar"
-    ],
-    "Pinheiral": [
-        "Centro", "Cruzeiro", "Parque Maíra", "Rolamão", "Varjão"
-    ],
-    "Piraí": [
-        "Centro", "Santanésia", "Arrozal", "Jaqueira", "Varjão"
-    ],
-    "Porciúncula": [
-        "Centro", "João Clóvis", "Ilha", "Operário", "Santo Antônio"
-    ],
-    "Porto Real": [
-        "Centro", "Freitas Soares", "Jardim das Acácias", "Nova Colônia", "Parque Mariana"
-    ],
-    "Quatis": [
-        "Centro", "Barrinha", "Jardim Independência", "Nossa Senhora do Rosário", "Pilotos"
-    ],
-    "Queimados": [
-        "Aliança", "Belmonte", "Centro", "Coimbra", "Fanchem", "Glória", "Inconfidência",
-        "Jardim da Fonte", "Jardim do Trevo", "Jardim São Miguel", "Nossa Senhora da Conceição",
-        "Paraíso", "Parque Ipanema", "Parque Valdariosa", "Ponte Preta", "São Francisco",
-        "São Roque", "Tri-Campeão", "Vila do Tinguá", "Vila Nascente", "Vila Pacaembu",
-        "Vila Americana", "Vila Guimarães"
-    ],
-    "Quissamã": [
-        "Centro", "Barra do Furado", "Canto da Saudade", "Machadinha", "Piteiras"
-    ],
-    "Resende": [
-        "Alto dos Passos", "Barbosa Lima", "Baixada da Olaria", "Cabral", "Campos Elíseos",
-        "Centro", "Cidade Alegria", "Engenheiro Passos", "Fazenda da Barra", "Ipiranga",
-        "Itapuca", "Jardim Aliança", "Jardim Beira Rio", "Jardim Brasília", "Jardim Jalisco",
-        "Liberdade", "Manejo", "Mirante das Agulhas", "Montese", "Morada da Colina",
-        "Morada do Contorno", "Morada da Barra", "Nova Liberdade", "Paraíso",
-        "Parque Ipiranga", "Parque Zito", "Penhasco", "Penedo", "Serrinha do Alambari",
-        "Surubi", "Toyota", "Vicentina", "Vila Julieta", "Vila Moderna", "Vila Santa Isabel"
-    ],
-    "Rio Bonito": [
-        "Centro", "Boqueirão", "Praça Cruzeiro", "Rio do Ouro", "Jacuba", "Mangueirinha"
-    ],
-    "Rio Claro": [
-        "Centro", "Lídice", "Passa Três", "Getulândia", "São João Marcos"
-    ],
-    "Rio das Flores": [
-        "Centro", "Abarracamento", "Cachoeira do Funil", "Manuel Duarte", "Taboas"
-    ],
-    "Rio das Ostras": [
-        "Alphaville", "Ancora", "Balneário Remanso", "Boca da Barra", "Centro",
-        "Chácara Mariléa", "Cidade Beira Mar", "Cidade Praiana", "Colinas", "Costazul",
-        "Enseada das Gaivotas", "Extensão do Bosque", "Floresta das Gaivotas",
-        "Jardim Bela Vista", "Jardim Campomar", "Jardim Mariléa", "Jardim Miramar",
-        "Liberdade", "Mar do Norte", "Nova Cidade", "Novo Rio das Ostras", "Operário",
-        "Palmital", "Parque da Cidade", "Parque Zabulão", "Praia Mar", "Recanto",
-        "Reduto da Paz", "Recreio", "Rocha Leão", "Santa Irene", "São Cristóvão",
-        "Terra Firme", "Verde Mar", "Village Rio das Ostras", "Zen"
-    ],
-        "Santa Maria Madalena": [
-        "Centro", "Arrastão", "Itapuá", "Parque Itaporanga", "Santo Antônio do Imbé"
-    ],
-    "Santo Antônio de Pádua": [
-        "Centro", "Cidade Nova", "Dezesseis", "Ferreira", "Gerador", "São Félix"
-    ],
-    "São Fidélis": [
-        "Centro", "Barão de Macaúbas", "Coroados", "Ipuca", "Montese", "Penha"
-    ],
-    "São Francisco de Itabapoana": [
-        "Centro", "Barra de Itabapoana", "Gargaú", "Guaxindiba", "Santa Clara", "Sonhos"
-    ],
-    "São Gonçalo": [
-        "Alcântara", "Antonina", "Boaçu", "Brasilândia", "Centro", "Colubandê", "Coelho",
-        "Cruzeiro do Sul", "Engenho do Roçado", "Engenho Pequeno", "Estrela do Norte",
-        "Fazenda dos Mineiros", "Galo Branco", "Gradim", "Guaxindiba", "Itaoca", "Itaúna",
-        "Jardim Amendoeira", "Jardim Catarina", "Jardim Imperial", "Jóquei", "Laranjal",
-        "Lindo Parque", "Luiz Caçador", "Maria Paula", "Mutondo", "Mutuá", "Neves",
-        "Nova Cidade", "Pacheco", "Paraíso", "Parada 40", "Patronato", "Pita",
-        "Porto da Madama", "Porto da Pedra", "Porto do Rosa", "Porto Novo", "Porto Velho",
-        "Raul Veiga", "Recanto das Acácias", "Rocha", "Rosane", "Salgueiro", "Santa Catarina",
-        "Santa Izabel", "Santa Luzia", "São Miguel", "Sete Pontes", "Tenente Jardim",
-        "Tribobó", "Trindade", "Vila Lage", "Vila Três", "Vista Alegre", "Zé Garoto"
-    ],
-    "São João da Barra": [
-        "Centro", "Atafona", "Grussaí", "Cajueiro", "Chapéu de Sol", "Barcelos"
-    ],
-    "São João de Meriti": [
-        "Agostinho Porto", "Centro", "Coelho da Rocha", "Éden", "Engenheiro Belford",
-        "Gato Preto", "Grande Rio", "Jardim Meriti", "Jardim Metrópole", "Jardim Sumaré",
-        "Parque Alian", "Parque Analândia", "Parque Araruama", "Parque Tietê", "São Mateus",
-        "Tomazinho", "Venda Velha", "Vila Norma", "Vila Rosali", "Vilar dos Teles"
-    ],
-    "São José de Ubá": [
-        "Centro", "Betel", "Divinéia", "João Valim"
-    ],
-    "São José do Vale do Rio Preto": [
-        "Centro", "Águas Claras", "Jaguara", "Parada Morelli", "Rio Bonito"
-    ],
-    "São Pedro da Aldeia": [
-        "Centro", "Balneário", "Baixo Grande", "Boqueirão", "Flexeira", "Nova São Pedro",
-        "Poço Fundo", "Praia Linda"
-    ],
-    "São Sebastião do Alto": [
-        "Centro", "Ipituna", "Valão do Barro", "Ibipeba"
-    ],
-    "Sapucaia": [
-        "Centro", "Aparecida", "Anta", "Jamapará", "Pião"
-    ],
-    "Saquarema": [
-        "Água Branca", "Bacaxá", "Barra Nova", "Boqueirão", "Centro", "Coqueiral",
-        "Gravatá", "Ipitangas", "Itaúna", "Jaconé", "Jardim", "Leigo", "Mombaça",
-        "Porto da Roça", "Retiro", "Sampaio Corrêa", "Vilatur"
-    ],
-    "Seropédica": [
-        "Boa Esperança", "Campo Lindo", "Centro", "Fazenda Caxias", "Incra",
-        "Jardim Maracanã", "Piranema", "Santa Sofia", "São Miguel"
-    ],
-    "Silva Jardim": [
-        "Centro", "Boqueirão", "Caxias", "Cidade Nova", "Imbaú"
-    ],
-    "Sumidouro": [
-        "Centro", "Campinas", "Dona Mariana", "Soledade", "Vila de Cima"
-    ],
-    "Tanguá": [
-        "Centro", "Ampliação", "Bandeirantes", "Duques", "Vila Cortes"
-    ],
-    "Teresópolis": [
-        "Agriões", "Albuquerque", "Alto", "Araras", "Barra do Imbuí", "Bom Retiro",
-        "Caxangá", "Comary", "Corta Vento", "Ermitage", "Fátima", "Fonte Santa",
-        "Granja Comary", "Granja Guarani", "Iúcas", "Jardim Cascata", "Jardim Meudon",
-        "Meudon", "Painera", "Paineiras", "Panorama", "Parque do Imbuí", "Parque São Luiz",
-        "Pimenteiras", "Posse", "Prata", "Quebra Frascos", "Quinta Lebrão", "Santa Cecília",
-        "São Pedro", "Soberbo", "Tijuca", "Várzea"
-    ],
-    "Trajano de Moraes": [
-        "Centro", "Visconde de Imbé", "Sodrelândia", "Ponte de Zinco"
-    ],
-    "Três Rios": [
-        "Bemposta", "Cantagalo", "Centro", "Cidade Nova", "Hermitage", "Jaqueline",
-        "Monte Castelo", "Nova Niterói", "Pilões", "Portão", "Purys", "Santa Teresinha",
-        "Triângulo", "Vila Isabel", "Werner Silveira"
-    ],
-    "Valença": [
-        "Alicácio", "Bairro de Fátima", "Belo Horizonte", "Benedito", "Centro",
-        "Chacrinha", "Conservatória", "Esteves", "Hildebrando Lopes", "Jardim Valença",
-        "João Bonito", "Osório", "Paraíso", "Parque Pentagna", "Santa Cruz",
-        "Santa Isabel do Rio Preto", "São Francisco", "Serra da Glória", "Spalla", "Varginha"
-    ],
-    "Vassouras": [
-        "Andrade Costa", "Centro", "Demétrio Ribeiro", "Ferroviários", "Guaíba", "Greco",
-        "Ipiranga", "Madruga", "Massambará", "Matadouro", "Mendes", "Residência",
-
-        "Rovisco Pais", "Santa Amália", "Sebastião Lacerda", "Vila dos Ferroviários"
-    ],
-    "Volta Redonda": [
-        "Açude", "Aero Clube", "Água Limpa", "Aterrado", "Bairro do Retiro", "Barreira Cravo",
-        "Belo Horizonte", "Belmonte", "Brasilândia", "Caieiras", "Candelária", "Casa de Pedra",
-        "Cinquentenário", "Coqueiros", "Conforto", "Dom Bosco", "Eucaliptal", "Jardim Amália",
-        "Jardim Belvedere", "Jardim Normândia", "Jardim Paraíba", "Jardim Ponte Alta",
-        "Laranjal", "Limoeiro", "Monte Castelo", "Morada da Colina", "Niterói",
-        "Nova Primavera", "Nova São Luiz", "Padre Josimo", "Ponte Alta", "Retiro", "Roma",
-        "Sampaio", "Santa Cruz", "Santa Inês", "Santa Rita do Zarur", "Santo Agostinho",
-        "São Cristóvão", "São Geraldo", "São João Batista", "São Lucas", "Sessenta",
-        "Siderlândia", "Siderópolis", "Três Poços", "Vila Americana", "Vila Brasília",
-        "Vila Mury", "Vila Rica", "Vila Santa Cecília", "Voldac"
-    ]
-
-}
-
-TIPOS_IMOVEL = [
-    "Apartamento", 
-    "Casa", 
-    "Casa de Condomínio",
-    "Cobertura Residencial",
-    "Kitnet Residencial",
-    "Flat Residencial",
-    "Terreno",
-    "Prédio Residencial",
-    "Prédio Comercial",
-    "Sala Comercial",
-    "Galpões Comerciais", 
-    "Pontos Comerciais",
-    "Consultórios Comerciais",
-    "Imóveis Comerciais",
-    "Fazendas / Sitios"
-]
+# Zonas, bairros, cidades, tipos de imóvel e slugs vêm de localidades_rj.json
+from localidades import (
+    ZONAS_RJ, CIDADES_RJ, CIDADES_INTERIOR_BAIRROS, TIPOS_IMOVEL,
+    TIPO_SLUGS_VIVAREAL, ZONA_SLUGS, CIDADE_SLUGS, BAIRRO_SLUGS_VIVAREAL, normalize_str, slug,
+)
 MODALIDADES = ["Aluguel", "Venda"]
 
 # --- Estados da conversa ---
@@ -560,18 +78,6 @@ def gpt4o_ask(prompt, system=None):
         return "Desculpe, houve um erro na comunicação. Tente novamente."
 
 # --- Funções utilitárias ---
-def normalize_str(s):
-    if not s:
-        return ""
-    # Remove acentos e caracteres especiais
-    s = unicodedata.normalize('NFD', s)
-    s = ''.join(c for c in s if unicodedata.category(c) != 'Mn')
-    # Converte para minúsculas e substitui espaços por hífens
-    s = s.lower().strip()
-    s = re.sub(r'[^\w\s-]', '', s) # Remove caracteres não alfanuméricos, exceto espaços e hífens
-    s = re.sub(r'[-\s]+', '-', s) # Substitui um ou mais espaços/hífens por um único hífen
-    return s.strip('-')
-
 def build_vivareal_url(context):
     """
     Monta a URL do Viva Real para busca, seguindo o padrão exato do site
@@ -584,68 +90,39 @@ def build_vivareal_url(context):
     bairro = context.get('bairro', '').strip().lower() if context.get('bairro') else ''
     local = context.get('local', '')
 
-    # Mapeamento de tipologia para slug do Viva Real
-    tipo_slug_map = {
-        'apartamento': 'apartamento_residencial',
-        'casa': 'casa_residencial',
-        'casa de condomínio': "condominio_residencial",
-        'cobertura residencial': "cobertura_residencial",
-        'kitnet residencial': "kitnet_residencial",
-        'flat residencial': "flat_residencial",
-        'terreno': 'lote-terreno_residencial',
-        'prédio residencial': 'edificio-residencial_comercial',
-        'prédio comercial': 'predio_comercial',
-        'sala comercial': 'sala_comercial',
-        'galpões comerciais': "galpao_comercial",
-        'pontos comerciais': "ponto-comercial_comercial",
-        'consultórios comerciais': "consultorio_comercial",
-        'imóveis comerciais': "imovel-comercial_comercial",
-        'fazendas / sitios': 'granja_comercial'
-    }
-    tipo_slug = tipo_slug_map.get(tipo, tipo)
+    tipo_slug = TIPO_SLUGS_VIVAREAL.get(tipo, tipo)
 
     # Modalidade
     trans_slug = 'venda' if modalidade == 'venda' else 'aluguel'
 
-    # Mapeamento de zonas para slug do Viva Real
-    zona_slug_map = {
-        'zona sul': 'zona-sul',
-        'zona norte': 'zona-norte',
-        'zona oeste': 'zona-oeste',
-        'centro': 'zona-central',
-        'zona central': 'zona-central'
-    }
-
-
-
     # Montagem da URL
     if local == 'todo_estado':
         # Todo o estado: /venda/rj/apartamento_residencial/
         url = f"{base_url}/{trans_slug}/rj/{tipo_slug}/"
     elif local == 'cidade':
         # Cidade do interior: /venda/rj/marica/casa_residencial/
-        cidade_norm = normalize_str(cidade)
+        cidade_norm = slug(CIDADE_SLUGS, cidade)
         url = f"{base_url}/{trans_slug}/rj/{cidade_norm}/{tipo_slug}/"
     elif local == 'bairro_interior':
         # Bairro de cidade do interior: /venda/rj/angra-dos-reis/bairros/centro/casa_residencial/
-        cidade_norm = normalize_str(cidade)
-        bairro_norm = normalize_str(bairro)
+        cidade_norm = slug(CIDADE_SLUGS, cidade)
+        bairro_norm = slug(BAIRRO_SLUGS_VIVAREAL, bairro)
         url = f"{base_url}/{trans_slug}/rj/{cidade_norm}/bairros/{bairro_norm}/{tipo_slug}/"
     elif local == 'zona':
         # Zona completa: /venda/rj/rio-de-janeiro/zona-sul/
-        zona_slug = zona_slug_map.get(zona, normalize_str(zona))
+        zona_slug = slug(ZONA_SLUGS, zona)
         if tipo_slug:
             url = f"{base_url}/{trans_slug}/rj/rio-de-janeiro/{zona_slug}/{tipo_slug}/"
         else:
             url = f"{base_url}/{trans_slug}/rj/rio-de-janeiro/{zona_slug}/"
     elif local == 'zona_completa':
         # Zona completa (nova funcionalidade): /venda/rj/rio-de-janeiro/zona-sul/casa_residencial/
-        zona_slug = zona_slug_map.get(zona, normalize_str(zona))
+        zona_slug = slug(ZONA_SLUGS, zona)
         url = f"{base_url}/{trans_slug}/rj/rio-de-janeiro/{zona_slug}/{tipo_slug}/"
     elif local == 'bairro':
         # Bairro específico: /venda/rj/rio-de-janeiro/zona-sul/gloria/casa_residencial/
-        zona_slug = zona_slug_map.get(zona, normalize_str(zona))
-        bairro_norm = normalize_str(bairro)
+        zona_slug = slug(ZONA_SLUGS, zona)
+        bairro_norm = slug(BAIRRO_SLUGS_VIVAREAL, bairro)
         url = f"{base_url}/{trans_slug}/rj/rio-de-janeiro/{zona_slug}/{bairro_norm}/{tipo_slug}/"
     else:
         # fallback para cidade do RJ
@@ -1,540 +1,151 @@
 import os
 import re
+import sys
+import itertools
+import math
 import time
 import threading
-import unicodedata
-import pandas as pd
 import logging
+import logging.handlers
+import queue
+import atexit
 import asyncio
+import json
+import unicodedata
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from contextlib import contextmanager, nullcontext
+from urllib.parse import urlparse
 from dotenv import load_dotenv
-from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove, InputFile
+from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove, InputFile, LinkPreviewOptions
+from telegram.error import TimedOut
 from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, filters, ConversationHandler, ContextTypes
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service as ChromeService
-from selenium.webdriver.chrome.options import Options as ChromeOptions
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
-from webdriver_manager.chrome import ChromeDriverManager
 from bs4 import BeautifulSoup
 from bs4.element import Tag
-import openai
+# pandas, selenium, webdriver_manager e openai são importados na primeira
+# utilização (exportação, navegador, GPT) para o bot subir rápido; o bs4 é
+# usado em toda busca, por card e por campo, e fica aqui
 import random
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from typing import Optional
+
+# Carrega variáveis do .env (antes do logging, que lê LOG_LEVEL e afins)
+load_dotenv()
 
 # Configurar logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('imobbot.log', encoding='utf-8')
-    ]
-)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').strip().upper()
+LOG_FILE = os.getenv('LOG_FILE', 'imobbot.log')
+LOG_MAX_BYTES = int(float(os.getenv('LOG_MAX_MB', '50')) * 1024 * 1024)
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', '5'))
+LOG_SAMPLE_EVERY = int(os.getenv('LOG_SAMPLE_EVERY', '50'))  # mensagens repetitivas por imóvel: 1 a cada N
+SAMPLED = {'sampled': True}  # extra= para logs por imóvel que devem ser amostrados
+
+
+class CallSiteSampler(logging.Filter):
+    """
+    Deixa passar só a 1ª e depois 1 a cada `every` mensagens de cada ponto do código
+    marcado com extra=SAMPLED. Mensagens sem a marca passam sempre.
+    """
+    def __init__(self, every):
+        super().__init__()
+        self.every = max(1, every)
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if not getattr(record, 'sampled', False) or self.every == 1:
+            return True
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        if count % self.every:
+            return False
+        if count:
+            record.msg = f"{record.msg} (amostrado: 1 a cada {self.every}, {count + 1} ocorrências)"
+        return True
+
+
+def setup_logging():
+    """
+    As threads de scraping só enfileiram os registros (QueueHandler); a escrita no
+    console e no arquivo rotativo acontece numa única thread (QueueListener), fora do caminho crítico.
+    """
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    stream_handler = logging.StreamHandler()
+    file_handler = logging.handlers.RotatingFileHandler(
+        LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8'
+    )
+    for handler in (stream_handler, file_handler):
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(CallSiteSampler(LOG_SAMPLE_EVERY))
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+
+    listener = logging.handlers.QueueListener(log_queue, stream_handler, file_handler)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+log_listener = setup_logging()
 logger = logging.getLogger(__name__)
 
-# Carrega variáveis do .env
-load_dotenv()
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN') or os.getenv('TELEGRAM_API_KEY')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
-openai.api_key = OPENAI_API_KEY
+# Endereços dos portais; podem apontar para o mock_portal.py em testes de carga
+VIVAREAL_BASE_URL = os.getenv('VIVAREAL_BASE_URL', 'https://www.vivareal.com.br').rstrip('/')
+ZAP_BASE_URL = os.getenv('ZAP_BASE_URL', 'https://www.zapimoveis.com.br').rstrip('/')
 
 # --- Controle global de estado ---
-active_scraping_tasks = {}  # {user_id: {'cancelled': bool, 'thread': threading.Thread}}
+# {user_id: {'cancelled': bool, 'thread': threading.Thread, 'queued': dict | None}}
+# 'queued' é a única busca do usuário aguardando a anterior encerrar (ver queue_scraping_task)
+active_scraping_tasks = {}
 scraping_lock = threading.Lock()
+# O que fazer quando o usuário confirma uma busca com outra ainda rodando:
+# 'reject' recusa a nova; 'replace' cancela a anterior e inicia a nova quando ela encerrar
+DUPLICATE_JOB_POLICY = os.getenv('DUPLICATE_JOB_POLICY', 'reject').strip().lower()
+PREVIOUS_JOB_WAIT_TIMEOUT = 120  # segundos aguardando a coleta anterior liberar os recursos
 
 # --- Constantes e dados ---
-ZONAS_RJ = {
-    "Zona Central": ["Centro", "Catumbi", "Cidade Nova", "Estácio", "Gamboa", "Lapa", "Mangueira", "Paquetá", "Rio Comprido", "Santa Teresa", "Santo Cristo", "Saúde", "Vasco da Gama"],
-    "Zona Sul": ["Botafogo", "Glória", "Catete", "Copacabana", "Cosme Velho", "Flamengo", "Gávea", "Humaitá", "Ipanema", "Jardim Botânico", "Lagoa", "Laranjeiras", "Leblon", "Leme", "Rocinha", "São Conrado", "Urca", "Vidigal"],
-    "Zona Oeste": ["Anil", "Barra da Tijuca", "Barra de Guaratiba", "Camorim", "Cidade de Deus", "Curicica", "Freguesia (Jacarepaguá)", "Gardênia Azul", "Grumari", "Itanhangá", "Jacarepaguá", "Joá", "Praça Seca", "Pechincha", "Recreio dos Bandeirantes", "Tanque", "Taquara", "Vargem Grande", "Vargem Pequena", "Vila Valqueire", "Bangu", "Deodoro", "Gericinó", "Jardim Sulacap", "Magalhães Bastos", "Padre Miguel", "Realengo", "Santíssimo", "Senador Camará", "Vila Militar", "Campo Grande", "Cosmos", "Guaratiba", "Inhoaíba", "Paciência", "Pedra de Guaratiba", "Santa Cruz", "Senador Vasconcelos", "Sepetiba"],
-    "Zona Norte": ["Acari", "Anchieta", "Parque Anchieta", "Pavuna ", "São Cristóvão", "Benfica", "Alto da Boa Vista", "Andaraí", "Abolição", "Água Santa", "Cachambi", "Caju", "Del Castilho", "Encantado", "Engenho de Dentro", "Engenho Novo", "Grajaú", "Higienópolis", "Jacaré", "Jacarezinho", "Lins de Vasconcelos", "Manguinhos", "Maria da Graça", "Maracanã", "Méier", "Piedade", "Pilares", "Praça da Bandeira", "Riachuelo", "Rocha", "Sampaio", "São Francisco Xavier", "Tijuca", "Vila Isabel", "Bancários", "Bonsucesso", "Cacuia", "Cocotá", "Freguesia (Ilha do Governador)", "Galeão", "Jardim Carioca", "Jardim Guanabara", "Maré", "Moneró", "Olaria", "Pitangueiras", "Portuguesa", "Praia da Bandeira", "Ramos", "Ribeira", "Tauá", "Zumbi", "Acari", "Anchieta", "Barros Filho", "Bento Ribeiro", "Brás de Pina", "Campinho", "Cavalcanti", "Cascadura", "Coelho Neto", "Colégio", "Cordovil", "Costa Barros", "Engenheiro Leal", "Engenho da Rainha", "Guadalupe", "Honório Gurgel", "Inhaúma", "Irajá", "Jardim América", "Madureira", "Marechal Hermes", "Oswaldo Cruz", "Parada de Lucas", "Parque Anchieta", "Parque Colúmbia", "Pavuna", "Penha", "Penha Circular", "Quintino Bocaiuva", "Ricardo de Albuquerque", "Rocha Miranda", "Tomás Coelho", "Turiaçu", "Vaz Lobo", "Vicente de Carvalho", "Vigário Geral", "Vila da Penha", "Vila Kosmos", "Vista Alegre"]
-}
-
-# Carrega cidades validadas do interior do RJ (arquivo deve estar no mesmo diretório)
-try:
-    with open("cidades_rj_validadas.txt", "r", encoding="utf-8") as f:
-        CIDADES_RJ = [line.strip() for line in f if line.strip()]
-    logger.info(f"✅ Loaded {len(CIDADES_RJ)} cities from cidades_rj_validadas.txt")
-    if len(CIDADES_RJ) == 0:
-        logger.warning("⚠️ File cidades_rj_validadas.txt is empty")
-except FileNotFoundError:
-    logger.error("❌ File cidades_rj_validadas.txt not found")
-    CIDADES_RJ = []
-except Exception as e:
-    logger.error(f"❌ Error loading cidades_rj_validadas.txt: {str(e)}")
-    CIDADES_RJ = []
-
-# Dados das cidades do interior do RJ com seus bairros
-CIDADES_INTERIOR_BAIRROS = {
-    "Angra dos Reis": [
-        "Abraão (Ilha Grande)", "Areal", "Balneário", "Belém", "Bonfim", "Camorim",
-        "Camorim Pequeno", "Centro", "Enseada (Ilha Grande)", "Enseada das Estrelas (Ilha Grande)",
-        "Frade", "Gamboa do Bracuí", "Garatucaia", "Jacuecanga", "Japuíba", "Marinas",
-        "Mombaça", "Monsuaba", "Morro da Carioca", "Morro da Cruz", "Morro do Carmo",
-        "Morro do Peres", "Parque das Palmeiras", "Perequê", "Praia Brava", "Praia do Anil",
-        "Praia Grande", "Retiro", "Ribeira", "Santa Rita do Bracuí", "Santo Antônio",
-        "São Bento", "Sapé", "Sertão do Bracuí", "Vila do Abraão", "Vila Histórica de Mambucaba",
-        "Vila Velha"
-    ],
-    "Aperibé": [
-        "Centro", "Ponte Seca", "Vila Tostes", "Presidente Kenedy", "Nossa Senhora de Fátima",
-        "São João", "Verdes Vales"
-    ],
-    "Araruama": [
-        "Areal", "Bananeiras", "Barbudo", "Boa Perna", "Centro", "Coqueiral",
-        "Engenho Grande", "Fazendinha", "Hawai", "Hospício", "Iguabinha", "Japão",
-        "Jardim Califórnia", "Jardim São Paulo", "Monteiro", "Morro Grande",
-        "Nossa Senhora de Nazareth", "Novo Horizonte", "Outeiro", "Paracatu",
-        "Parque Hotel", "Parati", "Pernambuca", "Ponta do Capim", "Pontinha",
-        "Praia do Hospício", "Praia Seca", "São Vicente de Paulo", "Viaduto", "Vila Capri"
-    ],
-    "Areal": [
-        "Centro", "Distrito de Alberto Torres", "Granja São José", "Vila de Areal"
-    ],
-    "Armação dos Búzios": [
-        "Alto de Búzios", "Armação", "Baía Formosa", "Barra da Lagoa", "Brava", "Canto",
-        "Centro", "Ferradura", "Forno", "Geribá", "João Fernandes", "José Gonçalves",
-        "Manguinhos", "Ossos", "Praia Rasa", "São José", "Tartaruga", "Tucuns"
-    ],
-    "Arraial do Cabo": [
-        "Caiçara", "Caminho do Pontal", "Canaa", "Centro", "Figueira", "Macedônia",
-        "Monte Alto", "Morro da Boa Vista", "Morro da Cabocla", "Parque das Garças",
-        "Pernambuca", "Pontal", "Prainha", "Praia dos Anjos", "Praia Grande", "Sítio",
-        "Taio", "Vila Canaã", "Vila Industrial"
-    ],
-    "Barra do Piraí": [
-        "Asa Branca", "Caixa D'água Velha", "Califórnia da Barra", "Carvão", "Centro",
-        "Chácara Farani", "Coimbra", "Coqueiros", "Distrito de Ipiabas", "Dr. Mesquita",
-        "Grota do Neném", "Horto", "Maracanã", "Matadouro", "Morro do Gama", "Muqueca",
-        "Oficinas Velhas", "Parque Santana", "Roseira", "Santo Antônio", "São João",
-        "São Luís", "Vargem Grande", "Vila Helena", "Vila Suíça"
-    ],
-    "Barra Mansa": [
-        "Ano Bom", "Apiadeiro", "Boa Sorte", "Boa Vista", "Bocaininha", "Centro",
-        "Colônia Santo Antônio", "Estamparia", "Jardim América", "Jardim Boa Vista",
-        "Jardim Central", "Jardim Marilu", "Jardim Primavera", "Light",
-        "Nossa Senhora do Amparo", "Nova Esperança", "Piteiras", "Rialto", "Roselândia",
-        "Santa Clara", "Santa Izabel", "Santa Rosa", "São Francisco de Assis",
-        "São Judas Tadeu", "São Luiz", "São Silvestre", "Saudade", "Siderlândia",
-        "Verbo Divino", "Vila Coringa", "Vila Elmira", "Vila Independência", "Vila Maria",
-        "Vila Nova", "Vila Orlandélia", "Vila Principal", "Vila Ursulino", "Vista Alegre"
-    ],
-    "Belford Roxo": [
-        "Areia Branca", "Barro Vermelho", "Bayer", "Bom Pastor", "Centro", "Coelho da Rocha",
-        "Farrula", "Heliópolis", "Itaipu", "Jardim do Ipê", "Jardim Gláucia", "Lote XV",
-        "Nova Aurora", "Piam", "Redentor", "Santa Amélia", "Santa Maria", "Santa Teresa",
-        "Santo Antônio da Prata", "São Bernardo", "São Francisco de Assis", "São Vicente",
-        "Sargento Roncalli", "Vale do Ipê", "Vila Pauline", "Xavantes"
-    ],
-    "Bom Jardim": [
-        "Alto de Santa Cruz", "Bairro de Fátima", "Centro", "Jardim Ornellas", "Maravilha",
-        "Parque das Águas", "São Miguel", "Varginha", "Vila da Amizade"
-    ],
-    "Bom Jesus do Itabapoana": [
-        "Centro", "Bela Vista", "Pimentel Marques", "Lia Márcia", "Novo", "Monte Calvário",
-        "José Lima", "Parque do Trevo"
-    ],
-    "Cabo Frio": [
-        "Algodoal", "Braga", "Caminho de Búzios", "Centro", "Dunas do Peró", "Foguete",
-        "Gamboa", "Guarani", "Itajuru", "Jardim Caiçara", "Jardim Excelsior",
-        "Jardim Flamboyant", "Jardim Olinda", "Jardim Peró", "Ogiva", "Palmeiras",
-        "Parque Burle", "Passagem", "Peró", "Portinho", "Praia do Siqueira",
-        "Recanto das Dunas", "São Bento", "São Cristóvão", "Unamar", "Vila do Sol", "Vila Nova"
-    ],
-     "Cachoeiras de Macacu": [
-        "Centro", "Japuíba", "Papucaia", "Subaio", "Boca do Mato", "Funchal",
-        "Castália", "Valério"
-    ],
-    "Cambuci": [
-        "Centro", "Floresta", "Cruzeiro", "São João do Paraíso", "Três Irmãos", "Funil",
-        "Monte Verde"
-    ],
-    "Campos dos Goytacazes": [
-        "Centro", "Parque Califórnia", "Parque Tamandaré", "Parque Santo Amaro",
-        "Parque Rosário", "Pelinca", "Parque Leopoldina", "Horto Municipal",
-        "Jardim Carioca", "Parque Turf Club", "Parque Corrientes", "Parque São Caetano",
-        "Parque Tarcísio Miranda", "Goytacazes", "Donana", "Goitacazes", "Farol de São Tomé",
-        "Travessão", "Guarus", "Ururaí", "Dores de Macabu", "Mundo Novo", "Tocos",
-        "Santo Eduardo", "Santa Maria"
-    ],
-    "Cantagalo": [
-        "Centro", "São José", "Parque das Árvores", "Triângulo", "Santo Antônio",
-        "São Pedro", "Boa Sorte"
-    ],
-    "Carapebus": [
-        "Centro", "Sapecado", "Urbis", "Praia de Carapebus", "Capelinha", "Vila Cândida"
-    ],
-    "Cardoso Moreira": [
-        "Centro", "Cachoeiro", "Orminda", "Catarino", "Parque das Acácias",
-        "Nossa Senhora da Penha"
-    ],
-    "Carmo": [
-        "Centro", "Botafogo", "Herdeiros", "Jardim Carmo", "Nossa Senhora da Glória",
-        "Parque Industrial"
-    ],
-    "Casimiro de Abreu": [
-        "Centro", "Barra de São João", "Rio Dourado", "Professor Souza", "Mataruna",
-        "Industrial", "Jardim Miramar"
-    ],
-    "Comendador Levy Gasparian": [
-        "Centro", "Afonso Arinos", "Fonseca Almeida", "Grotão", "Gulf"
-    ],
-    "Conceição de Macabu": [
-        "Centro", "Bocaina", "Vila São José", "Rhódia", "Piteiras", "Calçadinha"
-    ],
-    "Cordeiro": [
-        "Centro", "Retiro Poético", "Dois Valos", "Manancial", "Rodolfo", "São Luiz"
-    ],
-    "Duas Barras": [
-        "Centro", "Jardim do Lago", "Matadouro", "Vargem Grande", "Fazenda do Campo"
-    ],
-    "Duque de Caxias": [
-        "Bar dos Cavalheiros", "Centro", "Centenário", "Chácaras Arcampo", "Doutor Laureano",
-        "Engenho do Porto", "Gramacho", "Jardim Gramacho", "Jardim Leal", "Jardim Olavo Bilac",
-        "Lagunas e Dourados", "Parque Duque", "Parque Fluminense", "Parque Sarapuí",
-        "Periquitos", "Sarapuí", "Vila São Luís", "Vila Sarapuí", "Vinte e Cinco de Agosto",
-        "Campos Elíseos", "Capivari", "Chácaras Rio-Petrópolis", "Cidade dos Meninos",
-        "Figueira", "Imbariê", "Jardim Anhangá", "Jardim Primavera", "Mardi Gras",
-        "Nova Campinas", "Pilar", "Parada Angélica", "Parada Morabi", "Parque Eldorado",
-        "Parque Equitativa", "Santa Cruz da Serra", "Santa Lúcia", "Saracuruna", "Taquara",
-        "Vila Maria Helena", "Vila Santa Cruz", "Xerém"
-    ],
-    "Engenheiro Paulo de Frontin": [
-        "Centro", "Rodolfo de Abreu", "Graminha", "Sacra Família do Tinguá", "Morro Azul"
-    ],
-    "Guapimirim": [
-        "Bananal", "Centro", "Citrolândia", "Corujas", "Gleba de Fora", "Iconha",
-        "Jardim Guapimirim", "Limoeiro", "Monte Olivete", "Orindi", "Parada Ideal",
-        "Parque das Rosas", "Quinta Mariana", "Segredo", "Vale das Pedrinhas", "Vila Olímpia"
-    ],
-    "Iguaba Grande": [
-        "Centro", "Canellas City", "Cidade Nova", "Iguabela", "Jardim Solares",
-        "Lagoa Azul", "Parque Tamariz", "Pedreira"
-    ],
-    "Itaboraí": [
-        "Aldeia da Prata", "Ampliação", "Apolo", "Caluge", "Centro", "Chácaras de Inoã",
-        "Gebara", "Granjas Cabuçu", "Itambi", "Joaquim de Oliveira", "Manilha",
-        "Marambaia", "Nancilândia", "Nova Cidade", "Outeiro das Pedras", "Pachecos",
-        "Porto das Caixas", "Retiro São Joaquim", "Rio Várzea", "Sambaetiba",
-        "Santo Expedito", "São Joaquim", "São José", "Três Pontes", "Venda das Pedras",
-        "Visconde de Itaboraí"
-    ],
-    "Itaguaí": [
-        "Centro", "Vila Margarida", "Engenho", "Parque Brisamar", "Monte Serrat",
-        "Jardim América", "Leandro", "Coroa Grande", "Ilha da Madeira", "Vila Geni",
-        "Chaperó", "Ibirapitanga", "Mazomba", "Piranema"
-    ],
-    "Italva": [
-        "Centro", "Boa Vista", "Parque Industrial", "São Caetano", "Saldanha da Gama"
-    ],
-    "Itaocara": [
-        "Centro", "Cidade Nova", "Jardim da Aldeia", "Bocaina", "Caxias", "Adolvane"
-    ],
-    "Itaperuna": [
-        "Aeroporto", "Bela Vista", "Boa Fortuna", "Carulas", "Centro", "Cidade Nova",
-        "Cehab", "Fiteiro", "Frigorífico", "Glória", "Governo", "Horto Florestal",
-        "Jardim Surubi", "Lions", "Matadouro", "Niterói", "Presidente Costa e Silva",
-        "Presidente Humberto de Alencar Castelo Branco", "São Francisco", "São José",
-        "São Mateus", "Vale do Sol", "Vinhosa"
-    ],
-    "Itatiaia": [
-        "Centro", "Jardim Itatiaia", "Vila Magnólia", "Vila Odete", "Maromba", "Maringá", "Penedo"
-    ],
-    "Japeri": [
-        "Alecrim", "Belo Horizonte", "Beira-Mar", "Centro", "Chacrinha", "Cidade Jardim",
-        "Engenheiro Pedreira", "Eucaliptos", "Guandu", "Jardim Delamare", "Jardim Primavera",
-        "Jardim Semeador", "Lagoa do Sapo", "Laranjal", "Marajoara", "Mucajá", "Nova Belém",
-        "Parque Mucajá", "Santa Amélia", "Santa Inês", "São Jorge", "Vila Central",
-        "Vila Conceição", "Virgem de Fátima"
-    ],
-    "Macaé": [
-        "Aeroporto", "Aroeira", "Barra de Macaé", "Botafogo", "Cajueiros", "Campo do Oeste",
-        "Cancela Preta", "Cavaleiros", "Centro", "Costa do Sol", "Engenho da Praia",
-        "Eixo Sul", "Glória", "Granja dos Cavaleiros", "Horto", "Imbetiba", "Imboassica",
-        "Jardim Guanabara", "Jardim Santo Antônio", "Jardim Vitória", "Lagoa", "Lagomar",
-        "Miramar", "Mirante da Lagoa", "Nova Brasília", "Nova Holanda", "Novo Cavaleiros",
-        "Parque Aeroporto", "Parque de Tubos", "Parque Valentina Miranda", "Pecado",
-        "Praia Campista", "Riviera Fluminense", "Santa Mônica", "Sol y Mar", "Vale Encantado",
-        "Virgem Santa", "Visconde de Araújo"
-    ],
-    "Macuco": [
-        "Centro", "Barreira", "Glória", "Reta"
-    ],
-    "Magé": [
-        "Centro (Magé)", "Flexeiras", "Barbuda", "Pico", "Vila Nova", "Saco",
-        "Centro (Vila Inhomirim)", "Fragoso", "Piabetá", "Suruí", "Guia de Pacobaíba",
-        "Mauá", "Pau Grande", "Rio do Ouro", "Santo Aleixo"
-    ],
-    "Mangaratiba": [
-        "Centro", "Conceição de Jacareí", "Ibicuí", "Itacuruçá", "Muriqui",
-        "Praia do Saco", "Serra do Piloto", "Vila de Muriqui"
-    ],
-    "Maricá": [
-        "Araçatiba", "Barra de Maricá", "Caju", "Caxito", "Centro", "Condado de Maricá",
-        "Flamengo", "Guaratiba", "Inoã", "Itaipuaçu", "Jacaroá", "Jaconé",
-        "Jardim Atlântico", "Mumbuca", "Parque Nanci", "Pindobas", "Ponta Grossa",
-        "Ponta Negra", "Recanto de Itaipuaçu", "São José do Imbassaí", "Spar",
-        "Ubatiba", "Zacarias"
-    ],
-    "Mendes": [
-        "Centro", "Independência", "Humberto Antunes", "Santa Rita", "Vila Mariana"
-    ],
-    "Mesquita": [
-        "Alto Uruguai", "Banco de Areia", "Centro", "Chatuba", "Coreia", "Cosmorama",
-        "Edson Passos", "Jacutinga", "Juscelino", "Rocha Sobrinho", "Santa Terezinha",
-        "Santo Elias", "Vila Emil"
-    ],
-    "Miguel Pereira": [
-        "Arcádia", "Barão de Javary", "Centro", "Conrado", "Governador Portela",
-        "Lagoa das Lontras", "Paes Leme", "Plante Café", "Ramada", "Vera Cruz", "Vila Suíça"
-    ],
-    "Miracema": [
-        "Centro", "Santa Terezinha", "Cehab", "Vila Nova", "Santa Cruz", "Rodolfo"
-    ],
-    "Natividade": [
-        "Centro", "Sindicato", "Liberdade", "Popular", "Balança"
-    ],
-    "Nilópolis": [
-        "Cabuís", "Centro", "Nova Cidade", "Manoel Reis", "Nossa Senhora de Fátima",
-        "Novo Horizonte", "Olinda", "Paiol de Pólvora", "Santos Dumont", "Tropical"
-    ],
-    "Niterói": [
-        "Badu", "Baldeador", "Barreto", "Boa Viagem", "Cachoeiras", "Cafubá",
-        "Camboinhas", "Cantagalo", "Caramujo", "Centro", "Charitas", "Cubango",
-        "Engenhoca", "Engenho do Mato", "Fátima", "Fonseca", "Gragoatá", "Icaraí",
-        "Ilha da Conceição", "Ingá", "Itaipu", "Ititioca", "Jacaré", "Jurujuba",
-        "Largo da Batalha", "Maceió", "Maria Paula", "Matapaca", "Morro do Estado",
-        "Muriqui", "Pé Pequeno", "Piratininga", "Ponta d'Areia", "Rio do Ouro",
-        "Santa Bárbara", "Santa Rosa", "Santana", "São Domingos", "São Francisco",
-        "São Lourenço", "Sapê", "Tenente Jardim", "Várzea das Moças", "Viçoso Jardim",
-        "Viradouro", "Vital Brazil"
-    ],
-    "Nova Friburgo": [
-        "Amparo", "Braunes", "Caledônia", "Cardinot", "Cascatinha", "Centro",
-        "Chácara do Paraíso", "Conselheiro Paulino", "Cônego", "Duas Pedras",
-        "Jardim Califórnia", "Jardim Ouro Preto", "Lagoinha", "Lumiar", "Mury",
-        "Olaria", "Paissandu", "Parque São Clemente", "Ponte da Saudade", "Prado",
-        "Riograndina", "São Geraldo", "São Pedro da Serra", "Suspiro", "Vale dos Pinheiros",
-        "Varginha", "Vila Guarani", "Vilage"
-    ],
-    "Nova Iguaçu": [
-        "Adrianópolis", "Austin", "Bairro da Luz", "Boa Esperança", "Califórnia",
-        "Caonze", "Centro", "Cobrex", "Comendador Soares", "Figueiras", "Jardim Alvorada",
-        "Jardim Guandu", "Jardim Iguaçu", "Jardim Nova Era", "Jardim Palmares",
-        "Jardim Tropical", "Kennedy", "Km 32", "Miguel Couto", "Moquetá", "Nova América",
-        "Palhada", "Parque Ambaí", "Posse", "Prata", "Rancho Novo", "Riachão",
-        "Santa Eugênia", "Tinguá", "Vila de Cava", "Vila Nova", "Vila Operária"
-    ],
-    "Paracambi": [
-        "Centro", "Cascata", "Fábrica", "Guarajuba", "Jardim Nova Era", "Lages",
-        "Parque Industrial", "Sabugo", "São José", "Vila São José"
-    ],
-    "Paraíba do Sul": [
-        "Centro", "Jatobá", "Liberdade", "Ponte", "Salutaris", "Vila Salutaris"
-    ],
-    "Paraty": [
-        "Barra Grande", "Caboclo", "Caborê", "Centro Histórico", "Chácara da Saudade",
-        "Corumbê", "Cunha", "Fátima", "Jabaquara", "Laranjeiras", "Mangueira",
-        "Paraty Mirim", "Patrimônio", "Ponte Branca", "Pontal", "Portão de Ferro",
-        "Praia Grande", "São Gonçalo", "Saudade", "Sertão do Taquari", "Trindade"
-    ],
-    "Paty do Alferes": [
-        "Centro", "Arcozelo", "Avelar", "Monte Alegre", "Palmares"
-    ],
-    "Petrópolis": [
-        "Alto da Serra", "Araras", "Bairro Castrioto", "Bingen", "Cascatinha",
-        "Castelânea", "Centro Histórico", "Chácara Flora", "Cidale", "Coronel Veiga",
-        "Corrêas", "Duarte da Silveira", "Duchas", "Fazenda Inglesa", "Floresta",
-        "Independência", "Itaipava", "Itamarati", "Jardim Americano", "Mosela",
-        "Nogueira", "Pedro do Rio", "Posse", "Quitandinha", "Retiro", "Samambaia",
-        "São Sebastião", "Secretário", "Siméria", "Valparaíso", "Vila Militar"
-    ],
-    "Pinheiral": [
-        "Centro", "Cruzeiro", "Parque Maíra", "Rolamão", "Varjão"
-    ],
-    "Piraí": [
-        "Centro", "Santanésia", "Arrozal", "Jaqueira", "Varjão"
-    ],
-    "Porciúncula": [
-        "Centro", "João Clóvis", "Ilha", "Operário", "Santo Antônio"
-    ],
-    "Porto Real": [
-        "Centro", "Freitas Soares", "Jardim das Acácias", "Nova Colônia", "Parque Mariana"
-    ],
-    "Quatis": [
-        "Centro", "Barrinha", "Jardim Independência", "Nossa Senhora do Rosário", "Pilotos"
-    ],
-    "Queimados": [
-        "Aliança", "Belmonte", "Centro", "Coimbra", "Fanchem", "Glória", "Inconfidência",
-        "Jardim da Fonte", "Jardim do Trevo", "Jardim São Miguel", "Nossa Senhora da Conceição",
-        "Paraíso", "Parque Ipanema", "Parque Valdariosa", "Ponte Preta", "São Francisco",
-        "São Roque", "Tri-Campeão", "Vila do Tinguá", "Vila Nascente", "Vila Pacaembu",
-        "Vila Americana", "Vila Guimarães"
-    ],
-    "Quissamã": [
-        "Centro", "Barra do Furado", "Canto da Saudade", "Machadinha", "Piteiras"
-    ],
-    "Resende": [
-        "Alto dos Passos", "Barbosa Lima", "Baixada da Olaria", "Cabral", "Campos Elíseos",
-        "Centro", "Cidade Alegria", "Engenheiro Passos", "Fazenda da Barra", "Ipiranga",
-        "Itapuca", "Jardim Aliança", "Jardim Beira Rio", "Jardim Brasília", "Jardim Jalisco",
-        "Liberdade", "Manejo", "Mirante das Agulhas", "Montese", "Morada da Colina",
-        "Morada do Contorno", "Morada da Barra", "Nova Liberdade", "Paraíso",
-        "Parque Ipiranga", "Parque Zito", "Penhasco", "Penedo", "Serrinha do Alambari",
-        "Surubi", "Toyota", "Vicentina", "Vila Julieta", "Vila Moderna", "Vila Santa Isabel"
-    ],
-    "Rio Bonito": [
-        "Centro", "Boqueirão", "Praça Cruzeiro", "Rio do Ouro", "Jacuba", "Mangueirinha"
-    ],
-    "Rio Claro": [
-        "Centro", "Lídice", "Passa Três", "Getulândia", "São João Marcos"
-    ],
-    "Rio das Flores": [
-        "Centro", "Abarracamento", "Cachoeira do Funil", "Manuel Duarte", "Taboas"
-    ],
-    "Rio das Ostras": [
-        "Alphaville", "Ancora", "Balneário Remanso", "Boca da Barra", "Centro",
-        "Chácara Mariléa", "Cidade Beira Mar", "Cidade Praiana", "Colinas", "Costazul",
-        "Enseada das Gaivotas", "Extensão do Bosque", "Floresta das Gaivotas",
-        "Jardim Bela Vista", "Jardim Campomar", "Jardim Mariléa", "Jardim Miramar",
-        "Liberdade", "Mar do Norte", "Nova Cidade", "Novo Rio das Ostras", "Operário",
-        "Palmital", "Parque da Cidade", "Parque Zabulão", "Praia Mar", "Recanto",
-        "Reduto da Paz", "Recreio", "Rocha Leão", "Santa Irene", "São Cristóvão",
-        "Terra Firme", "Verde Mar", "Village Rio das Ostras", "Zen"
-    ],
-        "Santa Maria Madalena": [
-        "Centro", "Arrastão", "Itapuá", "Parque Itaporanga", "Santo Antônio do Imbé"
-    ],
-    "Santo Antônio de Pádua": [
-        "Centro", "Cidade Nova", "Dezesseis", "Ferreira", "Gerador", "São Félix"
-    ],
-    "São Fidélis": [
-        "Centro", "Barão de Macaúbas", "Coroados", "Ipuca", "Montese", "Penha"
-    ],
-    "São Francisco de Itabapoana": [
-        "Centro", "Barra de Itabapoana", "Gargaú", "Guaxindiba", "Santa Clara", "Sonhos"
-    ],
-    "São Gonçalo": [
-        "Alcântara", "Antonina", "Boaçu", "Brasilândia", "Centro", "Colubandê", "Coelho",
-        "Cruzeiro do Sul", "Engenho do Roçado", "Engenho Pequeno", "Estrela do Norte",
-        "Fazenda dos Mineiros", "Galo Branco", "Gradim", "Guaxindiba", "Itaoca", "Itaúna",
-        "Jardim Amendoeira", "Jardim Catarina", "Jardim Imperial", "Jóquei", "Laranjal",
-        "Lindo Parque", "Luiz Caçador", "Maria Paula", "Mutondo", "Mutuá", "Neves",
-        "Nova Cidade", "Pacheco", "Paraíso", "Parada 40", "Patronato", "Pita",
-        "Porto da Madama", "Porto da Pedra", "Porto do Rosa", "Porto Novo", "Porto Velho",
-        "Raul Veiga", "Recanto das Acácias", "Rocha", "Rosane", "Salgueiro", "Santa Catarina",
-        "Santa Izabel", "Santa Luzia", "São Miguel", "Sete Pontes", "Tenente Jardim",
-        "Tribobó", "Trindade", "Vila Lage", "Vila Três", "Vista Alegre", "Zé Garoto"
-    ],
-    "São João da Barra": [
-        "Centro", "Atafona", "Grussaí", "Cajueiro", "Chapéu de Sol", "Barcelos"
-    ],
-    "São João de Meriti": [
-        "Agostinho Porto", "Centro", "Coelho da Rocha", "Éden", "Engenheiro Belford",
-        "Gato Preto", "Grande Rio", "Jardim Meriti", "Jardim Metrópole", "Jardim Sumaré",
-        "Parque Alian", "Parque Analândia", "Parque Araruama", "Parque Tietê", "São Mateus",
-        "Tomazinho", "Venda Velha", "Vila Norma", "Vila Rosali", "Vilar dos Teles"
-    ],
-    "São José de Ubá": [
-        "Centro", "Betel", "Divinéia", "João Valim"
-    ],
-    "São José do Vale do Rio Preto": [
-        "Centro", "Águas Claras", "Jaguara", "Parada Morelli", "Rio Bonito"
-    ],
-    "São Pedro da Aldeia": [
-        "Centro", "Balneário", "Baixo Grande", "Boqueirão", "Flexeira", "Nova São Pedro",
-        "Poço Fundo", "Praia Linda"
-    ],
-    "São Sebastião do Alto": [
-        "Centro", "Ipituna", "Valão do Barro", "Ibipeba"
-    ],
-    "Sapucaia": [
-        "Centro", "Aparecida", "Anta", "Jamapará", "Pião"
-    ],
-    "Saquarema": [
-        "Água Branca", "Bacaxá", "Barra Nova", "Boqueirão", "Centro", "Coqueiral",
-        "Gravatá", "Ipitangas", "Itaúna", "Jaconé", "Jardim", "Leigo", "Mombaça",
-        "Porto da Roça", "Retiro", "Sampaio Corrêa", "Vilatur"
-    ],
-    "Seropédica": [
-        "Boa Esperança", "Campo Lindo", "Centro", "Fazenda Caxias", "Incra",
-        "Jardim Maracanã", "Piranema", "Santa Sofia", "São Miguel"
-    ],
-    "Silva Jardim": [
-        "Centro", "Boqueirão", "Caxias", "Cidade Nova", "Imbaú"
-    ],
-    "Sumidouro": [
-        "Centro", "Campinas", "Dona Mariana", "Soledade", "Vila de Cima"
-    ],
-    "Tanguá": [
-        "Centro", "Ampliação", "Bandeirantes", "Duques", "Vila Cortes"
-    ],
-    "Teresópolis": [
-        "Agriões", "Albuquerque", "Alto", "Araras", "Barra do Imbuí", "Bom Retiro",
-        "Caxangá", "Comary", "Corta Vento", "Ermitage", "Fátima", "Fonte Santa",
-        "Granja Comary", "Granja Guarani", "Iúcas", "Jardim Cascata", "Jardim Meudon",
-        "Meudon", "Painera", "Paineiras", "Panorama", "Parque do Imbuí", "Parque São Luiz",
-        "Pimenteiras", "Posse", "Prata", "Quebra Frascos", "Quinta Lebrão", "Santa Cecília",
-        "São Pedro", "Soberbo", "Tijuca", "Várzea"
-    ],
-    "Trajano de Moraes": [
-        "Centro", "Visconde de Imbé", "Sodrelândia", "Ponte de Zinco"
-    ],
-    "Três Rios": [
-        "Bemposta", "Cantagalo", "Centro", "Cidade Nova", "Hermitage", "Jaqueline",
-        "Monte Castelo", "Nova Niterói", "Pilões", "Portão", "Purys", "Santa Teresinha",
-        "Triângulo", "Vila Isabel", "Werner Silveira"
-    ],
-    "Valença": [
-        "Alicácio", "Bairro de Fátima", "Belo Horizonte", "Benedito", "Centro",
-        "Chacrinha", "Conservatória", "Esteves", "Hildebrando Lopes", "Jardim Valença",
-        "João Bonito", "Osório", "Paraíso", "Parque Pentagna", "Santa Cruz",
-        "Santa Isabel do Rio Preto", "São Francisco", "Serra da Glória", "Spalla", "Varginha"
-    ],
-    "Vassouras": [
-        "Andrade Costa", "Centro", "Demétrio Ribeiro", "Ferroviários", "Guaíba", "Greco",
-        "Ipiranga", "Madruga", "Massambará", "Matadouro", "Mendes", "Residência",
-
-        "Rovisco Pais", "Santa Amália", "Sebastião Lacerda", "Vila dos Ferroviários"
-    ],
-    "Volta Redonda": [
-        "Açude", "Aero Clube", "Água Limpa", "Aterrado", "Bairro do Retiro", "Barreira Cravo",
-        "Belo Horizonte", "Belmonte", "Brasilândia", "Caieiras", "Candelária", "Casa de Pedra",
-        "Cinquentenário", "Coqueiros", "Conforto", "Dom Bosco", "Eucaliptal", "Jardim Amália",
-        "Jardim Belvedere", "Jardim Normândia", "Jardim Paraíba", "Jardim Ponte Alta",
-        "Laranjal", "Limoeiro", "Monte Castelo", "Morada da Colina", "Niterói",
-        "Nova Primavera", "Nova São Luiz", "Padre Josimo", "Ponte Alta", "Retiro", "Roma",
-        "Sampaio", "Santa Cruz", "Santa Inês", "Santa Rita do Zarur", "Santo Agostinho",
-        "São Cristóvão", "São Geraldo", "São João Batista", "São Lucas", "Sessenta",
-        "Siderlândia", "Siderópolis", "Três Poços", "Vila Americana", "Vila Brasília",
-        "Vila Mury", "Vila Rica", "Vila Santa Cecília", "Voldac"
-    ]
-
-}
+# Zonas, bairros, cidades, tipos de imóvel e slugs vêm de localidades_rj.json
+from localidades import (
+    ZONAS_RJ, CIDADES_RJ, CIDADES_INTERIOR_BAIRROS, TIPOS_IMOVEL,
+    TIPO_SLUGS_VIVAREAL, TIPO_SLUGS_ZAP, ZONA_SLUGS, CIDADE_SLUGS,
+    BAIRRO_SLUGS_VIVAREAL, BAIRRO_SLUGS_ZAP, normalize_str, slug,
+    NameIndex, CIDADES_INDEX, CIDADES_INTERIOR_INDEX, BAIRROS_ZONA_INDEX, BAIRROS_INTERIOR_INDEX, TIPOS_INDEX,
+    ZONAS_INDEX, ZONA_DO_BAIRRO, BAIRROS_CAPITAL_INDEX,
+)
 
-TIPOS_IMOVEL = [
-    "Apartamento", 
-    "Casa", 
-    "Casa de Condomínio",
-    "Cobertura Residencial",
-    "Kitnet Residencial",
-    "Flat Residencial",
-    "Terreno",
-    "Prédio Residencial",
-    "Prédio Comercial",
-    "Sala Comercial",
-    "Galpões Comerciais", 
-    "Pontos Comerciais",
-    "Consultórios Comerciais",
-    "Imóveis Comerciais",
-    "Fazendas / Sitios"
-]
 MODALIDADES = ["Aluguel", "Venda"]
 
+# Limite de upload de documentos da Bot API é 50 MB; usamos uma margem de segurança
+TELEGRAM_MAX_DOCUMENT_BYTES = int(float(os.getenv('TELEGRAM_MAX_DOCUMENT_MB', '45')) * 1024 * 1024)
+TELEGRAM_UPLOAD_TIMEOUT = 120  # segundos de escrita por tentativa de envio
+TELEGRAM_CONNECT_TIMEOUT = 10
+TELEGRAM_READ_TIMEOUT = 30
+# A thread espera mais que a requisição inteira (conexão + escrita + leitura da resposta)
+TELEGRAM_UPLOAD_WAIT = TELEGRAM_CONNECT_TIMEOUT + TELEGRAM_UPLOAD_TIMEOUT + TELEGRAM_READ_TIMEOUT + 15
+PREVIEW_SIZE = int(os.getenv('PREVIEW_SIZE', '5'))  # imóveis enviados na prévia antes da planilha
+PROGRESS_UPDATE_INTERVAL = float(os.getenv('PROGRESS_UPDATE_INTERVAL', '3'))  # segundos entre edições do status
+JOB_REPORT_FILE = os.getenv('JOB_REPORT_FILE', 'imobbot_jobs.jsonl')  # uma linha JSON por busca concluída
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))  # 0 desativa o endpoint /metrics
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+ADMIN_USER_IDS = {int(x) for x in os.getenv('ADMIN_USER_IDS', '').replace(' ', '').split(',') if x.isdigit()}
+PROFILE_JOBS = os.getenv('PROFILE_JOBS', '').strip().lower() in ('1', 'true', 'sim', 'yes')  # perfila todas as buscas
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL_MS', '10')) / 1000  # intervalo entre amostras
+DETALHAR_MAX = int(os.getenv('DETALHAR_MAX', '100'))  # imóveis por /detalhar
+SEARCH_HISTORY_FILE = os.getenv('SEARCH_HISTORY_FILE', 'imobbot_buscas.json')  # últimas buscas de cada usuário, para o /repetir
+SEARCH_HISTORY_SIZE = int(os.getenv('SEARCH_HISTORY_SIZE', '5'))
+MAX_SEARCH_COMBINATIONS = int(os.getenv('MAX_SEARCH_COMBINATIONS', '12'))  # bairros x tipos numa busca só
+
 # --- Estados da conversa ---
-(ESCOLHA_LOCAL, ESCOLHA_ZONA, ESCOLHA_BAIRRO, ESCOLHA_CIDADE, ESCOLHA_ZONA_COMPLETA, ESCOLHA_CIDADE_INTERIOR, ESCOLHA_BAIRRO_INTERIOR, ESCOLHA_TIPO, ESCOLHA_MODALIDADE, ESCOLHA_REFINAMENTO, ESCOLHA_PAGINAS, CONFIRMA_BUSCA, AGUARDA_SCRAPING, ESCOLHA_SITE) = range(14)
+(ESCOLHA_LOCAL, ESCOLHA_ZONA, ESCOLHA_BAIRRO, ESCOLHA_CIDADE, ESCOLHA_ZONA_COMPLETA, ESCOLHA_CIDADE_INTERIOR, ESCOLHA_BAIRRO_INTERIOR, ESCOLHA_TIPO, ESCOLHA_MODALIDADE, ESCOLHA_REFINAMENTO, ESCOLHA_PAGINAS, CONFIRMA_BUSCA, AGUARDA_SCRAPING, ESCOLHA_SITE, ESCOLHA_MODO) = range(15)
 
 # --- Função utilitária para GPT-4o mini ---
 def gpt4o_ask(prompt, system=None):
@@ -543,40 +154,32 @@ def gpt4o_ask(prompt, system=None):
         messages.append({"role": "system", "content": system})
     messages.append({"role": "user", "content": prompt})
     
-    logger.info(f"🤖 OpenAI Request - Prompt: {prompt[:100]}...")
+    logger.debug(f"🤖 OpenAI Request - Prompt: {prompt[:100]}...")
     try:
-        response = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=messages,
-            max_tokens=300,
-            temperature=0.2,
-        )
+        import openai
+        openai.api_key = OPENAI_API_KEY
+        with METRICS.timer('imobbot_llm_request_seconds'):
+            response = openai.chat.completions.create(
+                model="gpt-4o",
+                messages=messages,
+                max_tokens=300,
+                temperature=0.2,
+            )
         content = response.choices[0].message.content
         result = content.strip() if content else ""
-        logger.info(f"🤖 OpenAI Response: {result[:100]}...")
+        logger.debug(f"🤖 OpenAI Response: {result[:100]}...")
         return result
     except Exception as e:
         logger.error(f"❌ OpenAI Error: {str(e)}")
+        METRICS.inc('imobbot_llm_errors_total')
         return "Desculpe, houve um erro na comunicação. Tente novamente."
 
 # --- Funções utilitárias ---
-def normalize_str(s):
-    if not s:
-        return ""
-    # Remove acentos e caracteres especiais
-    s = unicodedata.normalize('NFD', s)
-    s = ''.join(c for c in s if unicodedata.category(c) != 'Mn')
-    # Converte para minúsculas e substitui espaços por hífens
-    s = s.lower().strip()
-    s = re.sub(r'[^\w\s-]', '', s) # Remove caracteres não alfanuméricos, exceto espaços e hífens
-    s = re.sub(r'[-\s]+', '-', s) # Substitui um ou mais espaços/hífens por um único hífen
-    return s.strip('-')
-
 def build_vivareal_url(context):
     """
     Monta a URL do Viva Real para busca, seguindo o padrão exato do site
     """
-    base_url = "https://www.vivareal.com.br"
+    base_url = VIVAREAL_BASE_URL
     modalidade = context.get('modalidade', '').strip().lower()
     tipo = context.get('tipo', '').strip().lower()
     cidade = context.get('cidade', '').strip().lower() if context.get('cidade') else ''
@@ -584,68 +187,39 @@ def build_vivareal_url(context):
     bairro = context.get('bairro', '').strip().lower() if context.get('bairro') else ''
     local = context.get('local', '')
 
-    # Mapeamento de tipologia para slug do Viva Real
-    tipo_slug_map = {
-        'apartamento': 'apartamento_residencial',
-        'casa': 'casa_residencial',
-        'casa de condomínio': "condominio_residencial",
-        'cobertura residencial': "cobertura_residencial",
-        'kitnet residencial': "kitnet_residencial",
-        'flat residencial': "flat_residencial",
-        'terreno': 'lote-terreno_residencial',
-        'prédio residencial': 'edificio-residencial_comercial',
-        'prédio comercial': 'predio_comercial',
-        'sala comercial': 'sala_comercial',
-        'galpões comerciais': "galpao_comercial",
-        'pontos comerciais': "ponto-comercial_comercial",
-        'consultórios comerciais': "consultorio_comercial",
-        'imóveis comerciais': "imovel-comercial_comercial",
-        'fazendas / sitios': 'granja_comercial'
-    }
-    tipo_slug = tipo_slug_map.get(tipo, tipo)
+    tipo_slug = TIPO_SLUGS_VIVAREAL.get(tipo, tipo)
 
     # Modalidade
     trans_slug = 'venda' if modalidade == 'venda' else 'aluguel'
 
-    # Mapeamento de zonas para slug do Viva Real
-    zona_slug_map = {
-        'zona sul': 'zona-sul',
-        'zona norte': 'zona-norte',
-        'zona oeste': 'zona-oeste',
-        'centro': 'zona-central',
-        'zona central': 'zona-central'
-    }
-
-
-
     # Montagem da URL
     if local == 'todo_estado':
         # Todo o estado: /venda/rj/apartamento_residencial/
         url = f"{base_url}/{trans_slug}/rj/{tipo_slug}/"
     elif local == 'cidade':
         # Cidade do interior: /venda/rj/marica/casa_residencial/
-        cidade_norm = normalize_str(cidade)
+        cidade_norm = slug(CIDADE_SLUGS, cidade)
         url = f"{base_url}/{trans_slug}/rj/{cidade_norm}/{tipo_slug}/"
     elif local == 'bairro_interior':
         # Bairro de cidade do interior: /venda/rj/angra-dos-reis/bairros/centro/casa_residencial/
-        cidade_norm = normalize_str(cidade)
-        bairro_norm = normalize_str(bairro)
+        cidade_norm = slug(CIDADE_SLUGS, cidade)
+        bairro_norm = slug(BAIRRO_SLUGS_VIVAREAL, bairro)
         url = f"{base_url}/{trans_slug}/rj/{cidade_norm}/bairros/{bairro_norm}/{tipo_slug}/"
     elif local == 'zona':
         # Zona completa: /venda/rj/rio-de-janeiro/zona-sul/
-        zona_slug = zona_slug_map.get(zona, normalize_str(zona))
+        zona_slug = slug(ZONA_SLUGS, zona)
         if tipo_slug:
             url = f"{base_url}/{trans_slug}/rj/rio-de-janeiro/{zona_slug}/{tipo_slug}/"
         else:
             url = f"{base_url}/{trans_slug}/rj/rio-de-janeiro/{zona_slug}/"
     elif local == 'zona_completa':
         # Zona completa (nova funcionalidade): /venda/rj/rio-de-janeiro/zona-sul/casa_residencial/
-        zona_slug = zona_slug_map.get(zona, normalize_str(zona))
+        zona_slug = slug(ZONA_SLUGS, zona)
         url = f"{base_url}/{trans_slug}/rj/rio-de-janeiro/{zona_slug}/{tipo_slug}/"
     elif local == 'bairro':
         # Bairro específico: /venda/rj/rio-de-janeiro/zona-sul/gloria/casa_residencial/
-        zona_slug = zona_slug_map.get(zona, normalize_str(zona))
-        bairro_norm = normalize_str(bairro)
+        zona_slug = slug(ZONA_SLUGS, zona)
+        bairro_norm = slug(BAIRRO_SLUGS_VIVAREAL, bairro)
         url = f"{base_url}/{trans_slug}/rj/rio-de-janeiro/{zona_slug}/{bairro_norm}/{tipo_slug}/"
     else:
         # fallback para cidade do RJ
@@ -658,7 +232,7 @@ def build_zap_url(context):
     """
     Monta a URL do Zap Imóveis para busca, seguindo o padrão exato do site
     """
-    base_url = "https://www.zapimoveis.com.br"
+    base_url = ZAP_BASE_URL
     modalidade = context.get('modalidade', '').strip().lower()
     tipo = context.get('tipo', '').strip().lower()
     cidade = context.get('cidade', '').strip().lower() if context.get('cidade') else ''
@@ -666,136 +240,36 @@ def build_zap_url(context):
     bairro = context.get('bairro', '').strip().lower() if context.get('bairro') else ''
     local = context.get('local', '')
 
-    # Mapeamento de tipologia para slug do Zap Imóveis
-    tipo_slug_map = {
-        'apartamento': 'apartamentos',
-        'casa': 'casas',
-        'casa de condomínio': "casas",
-        'cobertura residencial': "apartamentos",
-        'kitnet residencial': "apartamentos",
-        'flat residencial': "apartamentos",
-        'terreno': 'terrenos-lotes-condominios',
-        'prédio residencial': 'apartamentos',
-        'prédio comercial': 'predios-comerciais',
-        'sala comercial': 'salas-comerciais',
-        'galpões comerciais': "galpoes-comerciais",
-        'pontos comerciais': "pontos-comerciais",
-        'consultórios comerciais': "consultorios-comerciais",
-        'imóveis comerciais': "imoveis-comerciais",
-        'fazendas / sitios': 'fazendas-sitios'
-    }
-    tipo_slug = tipo_slug_map.get(tipo, tipo)
+    tipo_slug = TIPO_SLUGS_ZAP.get(tipo, tipo)
 
     # Modalidade
     trans_slug = 'venda' if modalidade == 'venda' else 'aluguel'
 
-    # Mapeamento de zonas para slug do Zap Imóveis
-    zona_slug_map = {
-        'zona sul': 'zona-sul',
-        'zona norte': 'zona-norte',
-        'zona oeste': 'zona-oeste',
-        'centro': 'zona-central',
-        'zona central': 'zona-central'
-    }
-
-    # Abreviações especiais para Zap Imóveis
-    zap_abrevs = {
-        'Santa Teresa': 'sta-teresa',
-        'São Cristóvão': 's-cristovao',
-        'São Francisco Xavier': 's-francisco-xavier',
-        'Ricardo de Albuquerque': 'ricardo-de-albuquerque',
-        'Rocha Miranda': 'rocha-miranda',
-        'Vila Kosmos': 'vl-kosmos',
-        'Vila da Penha': 'vl-da-penha',
-        'Vila Isabel': 'vl-isabel',
-        'Água Santa': 'agua-santa',
-        'Vista Alegre': 'vista-alegre',
-        'Freguesia (Jacarepaguá)': 'freguesia-jacarepagua',
-        'Gardênia Azul': 'gardenia-azul',
-        'Praça Seca': 'pc-seca',
-        'São Conrado': 's-conrado',
-        'Praça da Bandeira': 'pc-da-bandeira',
-        'Freguesia (Ilha do Governador)': 'freguesia',
-        'Jardim Botânico': 'jd-botanico',
-        'Jardim Carioca': 'jd-carioca',
-        'Jardim Guanabara': 'jd-guanabara',
-        'Jardim América': 'jd-america',
-        'Magalhães Bastos': 'magalhaes-bastos',
-        'Padre Miguel': 'padre-miguel',
-        'Pedra de Guaratiba': 'pedra-de-guaratiba',
-        'Penha Circular': 'penha-circular',
-        'Quintino Bocaiuva': 'quintino-bocaiuva',
-        'Senador Camará': 'senador-camara',
-        'Senador Vasconcelos': 'senador-vasconcelos',
-        'Vargem Grande': 'vargem-grande',
-        'Vargem Pequena': 'vargem-pequena',
-        'Vila Militar': 'vl-militar',
-        'Vila Valqueire': 'vl-valqueire',
-        'Vila Kennedy': 'vl-kennedy',
-        'Jardim Sulacap': 'jd-sulacap',
-        'Cosme Velho': 'cosme-velho',
-        'Cidade Nova': 'cid-nova',
-        'Cidade de Deus': 'cid-de-deus',
-        'Del Castilho': 'del-castilho',
-        'Engenho de Dentro': 'engenho-de-dentro',
-        'Engenho Novo': 'engenho-novo',
-        'Engenheiro Leal': 'engenheiro-leal',
-        'Engenho da Rainha': 'engenho-da-rainha',
-        'Honório Gurgel': 'honorio-gurgel',
-        'Inhaúma': 'inhauma',
-        'Irajá': 'iraja',
-        'Jacaré': 'jacare',
-        'Jacarezinho': 'jacarezinho',
-        'Lins de Vasconcelos': 'lins-de-vasconcelos',
-        'Maria da Graça': 'maria-da-graca',
-        'Maracanã': 'maracana',
-        'Méier': 'meier',
-        'Moneró': 'monero',
-        'Parada de Lucas': 'parada-de-lucas',
-        'Parque Anchieta': 'pq-anchieta',
-        'Parque Colúmbia': 'pq-columbia',
-        'Praia da Bandeira': 'praia-da-bandeira',
-        'Ramos': 'ramos',
-        'Realengo': 'realengo',
-        'Santa Cruz': 'sta-cruz',
-        'Santíssimo': 'santissimo',
-        'Sepetiba': 'sepetiba',
-        'Tanque': 'tanque',
-        'Taquara': 'taquara',
-        'Tauá': 'taua',
-        'Tomás Coelho': 'tomas-coelho',
-        'Turiaçu': 'turiacu',
-        'Vaz Lobo': 'vaz-lobo',
-        'Vicente de Carvalho': 'vicente-de-carvalho',
-        'Vigário Geral': 'vigario-geral',
-        'Zumbi': 'zumbi',
-    }
-
     # Montagem da URL
     if local == 'todo_estado':
         # Todo o estado: /aluguel/apartamentos/rj/
         url = f"{base_url}/{trans_slug}/{tipo_slug}/rj/"
     elif local == 'cidade':
         # Cidade do interior: /aluguel/terrenos-lotes-condominios/rj+tres-rios/
-        cidade_norm = normalize_str(cidade)
+        cidade_norm = slug(CIDADE_SLUGS, cidade)
         url = f"{base_url}/{trans_slug}/{tipo_slug}/rj+{cidade_norm}/"
     elif local == 'bairro_interior':
         # Bairro de cidade do interior: /aluguel/casas/rj+angra-dos-reis+centro/
-        cidade_norm = normalize_str(cidade)
-        bairro_norm = zap_abrevs.get(bairro.title(), normalize_str(bairro))
+        cidade_norm = slug(CIDADE_SLUGS, cidade)
+        bairro_norm = slug(BAIRRO_SLUGS_ZAP, bairro)
         url = f"{base_url}/{trans_slug}/{tipo_slug}/rj+{cidade_norm}+{bairro_norm}/"
     elif local == 'zona':
         # Zona completa: /aluguel/casas/rj+rio-de-janeiro+zona-sul/
-        zona_slug = zona_slug_map.get(zona, normalize_str(zona))
+        zona_slug = slug(ZONA_SLUGS, zona)
         url = f"{base_url}/{trans_slug}/{tipo_slug}/rj+rio-de-janeiro+{zona_slug}/"
     elif local == 'zona_completa':
         # Zona completa: /aluguel/casas/rj+rio-de-janeiro+zona-sul/
-        zona_slug = zona_slug_map.get(zona, normalize_str(zona))
+        zona_slug = slug(ZONA_SLUGS, zona)
         url = f"{base_url}/{trans_slug}/{tipo_slug}/rj+rio-de-janeiro+{zona_slug}/"
     elif local == 'bairro':
         # Bairro específico: /aluguel/casas/rj+rio-de-janeiro+zona-sul+gloria/
-        zona_slug = zona_slug_map.get(zona, normalize_str(zona))
-        bairro_norm = zap_abrevs.get(bairro.title(), normalize_str(bairro))
+        zona_slug = slug(ZONA_SLUGS, zona)
+        bairro_norm = slug(BAIRRO_SLUGS_ZAP, bairro)
         url = f"{base_url}/{trans_slug}/{tipo_slug}/rj+rio-de-janeiro+{zona_slug}+{bairro_norm}/"
     else:
         # fallback para cidade do RJ
@@ -804,11 +278,779 @@ def build_zap_url(context):
     logger.info(f"🔗 Generated Zap URL: {url}")
     return url
 
+# --- Modelo de dados ---
+def parse_brl_number(text):
+    """Converte texto monetário/numérico ('R$ 1.234,56', '70') em float; None se ausente"""
+    if not isinstance(text, str) or text == 'N/A':
+        return None
+    # Remove tudo exceto dígitos e vírgulas, depois substitui vírgula por ponto
+    cleaned = re.sub(r'[^\d,]', '', text).replace(',', '.')
+    try:
+        return float(cleaned) if cleaned else None
+    except ValueError:
+        return None
+
+def parse_count(text):
+    """Converte texto de contagem ('2', '2 quartos') no primeiro inteiro encontrado; None se ausente"""
+    if not isinstance(text, str):
+        return None
+    m = re.search(r'\d+', text)
+    return int(m.group(0)) if m else None
+
+def format_number(value):
+    """Formata um número no padrão brasileiro (1.234 ou 1.234,56); 'N/A' se ausente"""
+    if value is None:
+        return 'N/A'
+    if float(value).is_integer():
+        return f"{int(value):,}".replace(',', '.')
+    return f"{value:,.2f}".replace(',', '#').replace('.', ',').replace('#', '.')
+
+def format_brl(value):
+    """Formata um valor em reais (R$ 1.234); 'N/A' se ausente"""
+    return 'N/A' if value is None else f"R$ {format_number(value)}"
+
+def _text_or_na(value):
+    return 'N/A' if value is None else str(value)
+
+@dataclass(slots=True)
+class DetalhesAnuncio:
+    """Dados extraídos da página de detalhes de um anúncio; campos não encontrados ficam None"""
+    titulo: Optional[str] = None
+    codigos: Optional[str] = None
+    endereco_completo: Optional[str] = None
+    anunciante: Optional[str] = None
+    creci: Optional[str] = None
+    classificacao_anunciante: Optional[str] = None
+    imoveis_cadastrados: Optional[int] = None
+    descricao: Optional[str] = None
+    telefone: Optional[str] = None
+    data_criacao: Optional[str] = None
+
+@dataclass(slots=True)
+class Imovel:
+    """
+    Imóvel coletado de um card de listagem. Valores numéricos ficam tipados e
+    campos ausentes ficam None; a conversão para texto ('N/A', 'R$ 1.234')
+    acontece apenas na exportação, em to_row().
+    """
+    site: str
+    tipo_imovel: Optional[str] = None
+    tipo_transacao: Optional[str] = None
+    link: Optional[str] = None
+    rua: Optional[str] = None
+    endereco: Optional[str] = None
+    bairro: Optional[str] = None
+    municipio: Optional[str] = None
+    estado: Optional[str] = None
+    preco: Optional[float] = None
+    condominio: Optional[float] = None
+    iptu: Optional[float] = None
+    area: Optional[float] = None
+    quartos: Optional[int] = None
+    banheiros: Optional[int] = None
+    vagas: Optional[int] = None
+    detalhes: Optional[DetalhesAnuncio] = None
+    detalhes_pendentes: bool = False  # fora do orçamento de enriquecimento; pode ser detalhado com /detalhar
+
+    def has_valid_link(self):
+        return bool(self.link) and self.link.startswith("http")
+
+    def to_row(self):
+        """Converte o imóvel na linha da planilha, com os nomes de coluna exportados"""
+        det = self.detalhes or DetalhesAnuncio()
+        return {
+            'Site': self.site,
+            'Tipo de Imóvel': _text_or_na(self.tipo_imovel),
+            'Tipo de Transação': _text_or_na(self.tipo_transacao),
+            'Titulo_Anuncio': _text_or_na(det.titulo),
+            'Codigos_Anuncio': _text_or_na(det.codigos),
+            'Preço': format_brl(self.preco),
+            'Condomínio': format_brl(self.condominio),
+            'IPTU': format_brl(self.iptu),
+            'Quartos': _text_or_na(self.quartos),
+            'Banheiros': _text_or_na(self.banheiros),
+            'Vagas': _text_or_na(self.vagas),
+            'Área m²': format_number(self.area),
+            'Rua': _text_or_na(self.rua),
+            'Bairro': _text_or_na(self.bairro),
+            'Município': _text_or_na(self.municipio),
+            'Estado': _text_or_na(self.estado),
+            'Endereco_Completo': _text_or_na(det.endereco_completo),
+            'Anunciante': _text_or_na(det.anunciante),
+            'Creci': _text_or_na(det.creci),
+            'Classificacao_Anunciante': _text_or_na(det.classificacao_anunciante),
+            'Imoveis_Cadastrados': _text_or_na(det.imoveis_cadastrados),
+            'Descricao': _text_or_na(det.descricao),
+            'Telefone': _text_or_na(det.telefone),
+            'Data_Criacao': _text_or_na(det.data_criacao),
+            'Link': _text_or_na(self.link),
+        }
+
+def parse_listing_card(listing, site, tipo_solicitado=None, tipo_transacao=None):
+    """Converte um card da listagem (li[data-cy='rp-property-cd']) do Viva Real ou Zap em um Imovel"""
+    imovel = Imovel(
+        site=site,
+        tipo_imovel=tipo_solicitado if tipo_solicitado and tipo_solicitado != 'N/A' else None,
+        tipo_transacao=tipo_transacao if tipo_transacao and tipo_transacao != 'N/A' else None,
+    )
+    if not isinstance(listing, Tag):
+        return imovel
+    
+    link_tag = listing.find('a', class_='block')
+    if isinstance(link_tag, Tag) and link_tag.has_attr('href'):
+        imovel.link = link_tag['href']
+    
+    # Extrair rua
+    street_p = listing.find('p', {'data-cy': 'rp-cardProperty-street-txt'})
+    if isinstance(street_p, Tag):
+        imovel.rua = street_p.get_text(strip=True)
+    
+    # Extrair endereço completo e separar Bairro, Município e Estado
+    endereco_h2 = listing.find('h2', {'data-cy': 'rp-cardProperty-location-txt'})
+    if isinstance(endereco_h2, Tag):
+        endereco_completo = endereco_h2.get_text(strip=True)
+        imovel.endereco = endereco_completo
+        # Formato típico: "Bairro, Cidade - Estado"
+        parts = endereco_completo.split(',')
+        if len(parts) >= 2:
+            imovel.bairro = parts[0].strip()
+            cidade_estado = parts[1].strip()
+            if ' - ' in cidade_estado:
+                cidade, estado = cidade_estado.split(' - ', 1)
+                imovel.municipio = cidade.strip()
+                imovel.estado = estado.strip()
+            else:
+                imovel.municipio = cidade_estado
+                imovel.estado = 'RJ'  # Padrão para Rio de Janeiro
+        else:
+            imovel.bairro = endereco_completo
+            imovel.municipio = 'Rio de Janeiro'
+            imovel.estado = 'RJ'
+    
+    price_div = listing.find('div', {'data-cy': 'rp-cardProperty-price-txt'})
+    if isinstance(price_div, Tag):
+        paragraphs = price_div.find_all('p')
+        if paragraphs and isinstance(paragraphs[0], Tag):
+            imovel.preco = parse_brl_number(paragraphs[0].get_text(strip=True))
+        if len(paragraphs) > 1 and isinstance(paragraphs[1], Tag):
+            cond_iptu_text = paragraphs[1].get_text(strip=True)
+            cond_match = re.search(r'Cond\.\s*R\$\s*([\d\.,]+)', cond_iptu_text)
+            iptu_match = re.search(r'IPTU\s*R\$\s*([\d\.,]+)', cond_iptu_text)
+            if cond_match:
+                imovel.condominio = parse_brl_number(cond_match.group(1))
+            if iptu_match:
+                imovel.iptu = parse_brl_number(iptu_match.group(1))
+    
+    # Extrair características
+    imovel.area = parse_brl_number(extract_feature(listing, 'rp-cardProperty-propertyArea-txt'))
+    imovel.quartos = parse_count(extract_feature(listing, 'rp-cardProperty-bedroomQuantity-txt'))
+    imovel.banheiros = parse_count(extract_feature(listing, 'rp-cardProperty-bathroomQuantity-txt'))
+    imovel.vagas = parse_count(extract_feature(listing, 'rp-cardProperty-parkingSpacesQuantity-txt'))
+    return imovel
+
+def parse_search_page(html, site, tipo_solicitado=None, tipo_transacao=None):
+    """Extrai todos os cards de uma página de resultados do Viva Real ou Zap"""
+    soup = BeautifulSoup(html, 'html.parser')
+    imoveis = []
+    for listing in soup.find_all('li', {'data-cy': 'rp-property-cd'}):
+        try:
+            imoveis.append(parse_listing_card(listing, site, tipo_solicitado, tipo_transacao))
+        except Exception as e:
+            logger.warning(f"⚠️ Error processing {site} listing: {str(e)}", extra=SAMPLED)
+    return imoveis
+
+# --- Relatório de execução ---
+class JobReport:
+    """Tempos por etapa e contadores de uma busca, gravados como uma linha JSON em JOB_REPORT_FILE.
+
+    Etapas executadas pelos workers (page.*, enrich.*) são somadas entre as threads,
+    então podem passar do tempo total da busca; 'scraping' e 'enrichment' são o tempo de parede.
+    """
+    def __init__(self, user_id, params=None):
+        self.user_id = user_id
+        self.job_id = f"{user_id}_{int(time.time() * 1000)}"
+        self.params = {k: v for k, v in (params or {}).items() if isinstance(v, (str, int, float, bool, dict, list, type(None)))}
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+        self.status = 'incomplete'
+        self.error = None
+        self.files = {}  # artefatos gerados junto com o relatório (ex.: perfil)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        with self._lock:
+            entry = self.stages.setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0})
+            entry['count'] += 1
+            entry['total'] += seconds
+            entry['max'] = max(entry['max'], seconds)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def to_dict(self):
+        with self._lock:
+            stages = {
+                name: {'count': e['count'], 'total_s': round(e['total'], 3), 'max_s': round(e['max'], 3)}
+                for name, e in self.stages.items()
+            }
+            counters = dict(self.counters)
+        return {
+            'job_id': self.job_id,
+            'user_id': self.user_id,
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started_at)),
+            'duration_s': round(time.perf_counter() - self._started, 3),
+            'status': self.status,
+            'error': self.error,
+            'params': self.params,
+            'stages': stages,
+            'counters': counters,
+            'files': self.files,
+        }
+
+    def finish(self):
+        """Grava o relatório e registra um resumo no log; falhas de escrita não derrubam a busca"""
+        data = self.to_dict()
+        try:
+            with open(JOB_REPORT_FILE, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(data, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.warning(f"⚠️ Não foi possível gravar o relatório do job {self.job_id}: {e}")
+        slowest = sorted(data['stages'].items(), key=lambda item: item[1]['total_s'], reverse=True)
+        summary = ", ".join(f"{name}={s['total_s']:.1f}s/{s['count']}" for name, s in slowest)
+        logger.info(f"📊 Job {self.job_id} ({data['status']}) em {data['duration_s']:.1f} s: {summary}")
+        METRICS.inc('imobbot_jobs_total', {'status': data['status']})
+        METRICS.observe('imobbot_job_duration_seconds', data['duration_s'])
+        return data
+
+
+def job_stage(report, name):
+    """Context manager que mede uma etapa no relatório; não faz nada sem relatório (ex.: benchmark)"""
+    return report.stage(name) if report is not None else nullcontext()
+
+
+# --- Métricas ---
+class Metrics:
+    """
+    Contadores, gauges e histogramas do processo, expostos no formato texto do
+    Prometheus em /metrics quando METRICS_PORT está definido.
+    """
+    DEFAULT_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}  # {(nome, labels): valor} para contadores e gauges
+        self._histograms = {}  # {(nome, labels): [contagens por bucket, soma, total]}
+        self._types = {}
+        self._help = {}
+        self._buckets = {}
+        self._callbacks = {}  # gauges calculados na hora da coleta
+
+    def describe(self, name, kind, help_text, buckets=None):
+        self._types[name] = kind
+        self._help[name] = help_text
+        if kind == 'histogram':
+            self._buckets[name] = tuple(buckets or self.DEFAULT_BUCKETS)
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((labels or {}).items()))
+
+    def inc(self, name, labels=None, n=1):
+        key = self._key(name, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + n
+
+    def dec(self, name, labels=None, n=1):
+        self.inc(name, labels, -n)
+
+    def set(self, name, value, labels=None):
+        with self._lock:
+            self._values[self._key(name, labels)] = value
+
+    def set_callback(self, name, func):
+        self._callbacks[name] = func
+
+    def observe(self, name, value, labels=None):
+        key = self._key(name, labels)
+        buckets = self._buckets.get(name, self.DEFAULT_BUCKETS)
+        with self._lock:
+            hist = self._histograms.setdefault(key, [[0] * len(buckets), 0.0, 0])
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    hist[0][i] += 1
+            hist[1] += value
+            hist[2] += 1
+
+    @contextmanager
+    def timer(self, name, labels=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, labels)
+
+    @staticmethod
+    def _format_labels(labels, extra=()):
+        items = list(labels) + list(extra)
+        if not items:
+            return ""
+        escaped = []
+        for key, value in items:
+            value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            escaped.append(f'{key}="{value}"')
+        return "{" + ",".join(escaped) + "}"
+
+    def render(self):
+        for name, func in list(self._callbacks.items()):
+            try:
+                self.set(name, func())
+            except Exception as e:
+                logger.warning(f"⚠️ Erro ao calcular a métrica {name}: {e}")
+
+        with self._lock:
+            values = dict(self._values)
+            histograms = {key: (list(h[0]), h[1], h[2]) for key, h in self._histograms.items()}
+
+        lines = []
+        for name in sorted(self._types):
+            kind = self._types[name]
+            lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == 'histogram':
+                buckets = self._buckets[name]
+                for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, bucket_count in zip(buckets, counts):
+                        lines.append(f"{name}_bucket{self._format_labels(labels, [('le', bound)])} {bucket_count}")
+                    lines.append(f"{name}_bucket{self._format_labels(labels, [('le', '+Inf')])} {count}")
+                    lines.append(f"{name}_sum{self._format_labels(labels)} {total}")
+                    lines.append(f"{name}_count{self._format_labels(labels)} {count}")
+            else:
+                series = [(labels, value) for (metric, labels), value in sorted(values.items()) if metric == name]
+                if not series and kind == 'gauge':
+                    series = [((), 0)]
+                for labels, value in series:
+                    lines.append(f"{name}{self._format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+METRICS.describe('imobbot_active_jobs', 'gauge', "Buscas em andamento")
+METRICS.describe('imobbot_jobs_waiting', 'gauge', "Buscas aguardando a anterior do mesmo usuário encerrar")
+METRICS.describe('imobbot_jobs_total', 'counter', "Buscas encerradas por status")
+METRICS.describe('imobbot_job_duration_seconds', 'histogram', "Duração total das buscas")
+METRICS.describe('imobbot_browsers_alive', 'gauge', "Instâncias do Chrome abertas")
+METRICS.describe('imobbot_playwright_browsers', 'gauge', "Navegadores do motor Playwright conectados")
+METRICS.describe('imobbot_playwright_pages_open', 'gauge', "Abas abertas no motor Playwright")
+METRICS.describe('imobbot_pages_scraped_total', 'counter', "Páginas de resultado processadas por site")
+METRICS.describe('imobbot_page_errors_total', 'counter', "Páginas de resultado com erro ou timeout por site")
+METRICS.describe('imobbot_listings_scraped_total', 'counter', "Imóveis extraídos das páginas de resultado por site")
+METRICS.describe('imobbot_ads_enriched_total', 'counter', "Páginas de anúncio visitadas no enriquecimento por resultado")
+METRICS.describe('imobbot_ads_http_total', 'counter', "Anúncios lidos por HTTP: ok ou enviados ao navegador (fallback)")
+METRICS.describe('imobbot_llm_request_seconds', 'histogram', "Latência das chamadas à OpenAI",
+                 buckets=(0.25, 0.5, 1, 2, 4, 8, 15, 30, 60))
+METRICS.describe('imobbot_llm_errors_total', 'counter', "Chamadas à OpenAI com erro")
+METRICS.describe('imobbot_telegram_send_failures_total', 'counter', "Falhas de envio ao Telegram por tipo e tentativa")
+METRICS.describe('imobbot_telegram_documents_sent_total', 'counter', "Planilhas entregues ao Telegram")
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = METRICS.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Coletas periódicas não devem poluir o log do bot
+
+
+def start_metrics_server(port=METRICS_PORT, host=METRICS_HOST):
+    """Sobe o endpoint /metrics numa thread daemon; retorna o servidor (ou None se desativado)"""
+    if not port:
+        return None
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    logger.info(f"📈 Métricas disponíveis em http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+# --- Profiling ---
+profile_requests = set()  # usuários cuja próxima busca será perfilada (comando /perfil)
+profile_lock = threading.Lock()
+_job_numbers = itertools.count(1)
+
+def job_thread_name(user_id):
+    """Nome único da thread da busca; os workers herdam como prefixo, o que permite perfilar só esta busca"""
+    return f"imobbot-job-{user_id}-{next(_job_numbers)}"
+
+def request_profile(user_id):
+    with profile_lock:
+        profile_requests.add(user_id)
+
+def should_profile(user_id):
+    """True se a busca que está começando deve rodar sob o profiler (consome o pedido do /perfil)"""
+    with profile_lock:
+        if user_id in profile_requests:
+            profile_requests.discard(user_id)
+            return True
+    return PROFILE_JOBS
+
+
+class SamplingProfiler:
+    """
+    Profiler por amostragem da thread da busca e dos seus workers (threads cujo nome
+    começa pelo nome da thread da busca). A cada `interval` segundos lê as pilhas com
+    sys._current_frames(), sem instrumentar as funções, então o overhead fica baixo
+    mesmo com Chrome e BeautifulSoup em várias threads.
+
+    Gera <base>.folded (pilhas colapsadas para flamegraph.pl, speedscope ou inferno)
+    e <base>.txt (funções com mais amostras próprias e acumuladas).
+    """
+    def __init__(self, thread_name, interval=PROFILE_INTERVAL):
+        self.thread_name = thread_name
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.elapsed = time.perf_counter() - self._started
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                name = names.get(ident, '')
+                if name == self.thread_name:
+                    role = 'job'
+                elif name.startswith(self.thread_name + '_'):
+                    role = 'worker'
+                else:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(role)
+                key = ";".join(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+                self.samples += 1
+
+    def write(self, base_path):
+        """Grava os arquivos do perfil e retorna seus caminhos"""
+        folded_path = f"{base_path}.folded"
+        with open(folded_path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+
+        own, cumulative = {}, {}
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')[1:]
+            if frames:
+                own[frames[-1]] = own.get(frames[-1], 0) + count
+            for func in set(frames):
+                cumulative[func] = cumulative.get(func, 0) + count
+
+        summary_path = f"{base_path}.txt"
+        total = max(self.samples, 1)
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            f.write(f"Thread: {self.thread_name}\n")
+            f.write(f"Duração: {self.elapsed:.1f} s, {self.samples} amostras a cada {self.interval * 1000:.0f} ms (somadas entre threads)\n")
+            for title, table in (("Tempo próprio", own), ("Tempo acumulado", cumulative)):
+                f.write(f"\n{title}:\n")
+                for func, count in sorted(table.items(), key=lambda item: item[1], reverse=True)[:40]:
+                    f.write(f"{count:>8} {count / total * 100:6.1f}%  {func}\n")
+        return [folded_path, summary_path]
+
+
+def start_job_profiler(user_id):
+    """Inicia o profiler para a busca na thread atual, se pedido; senão None"""
+    if not should_profile(user_id):
+        return None
+    logger.info(f"🔬 Profiling search for user {user_id} ({threading.current_thread().name})")
+    return SamplingProfiler(threading.current_thread().name).start()
+
+def finish_job_profiler(profiler, report):
+    """Para o profiler e grava os arquivos ao lado do relatório de jobs"""
+    if profiler is None:
+        return
+    profiler.stop()
+    base_path = os.path.join(os.path.dirname(JOB_REPORT_FILE) or '.', f"perfil_{report.job_id}")
+    try:
+        report.files['profile'] = profiler.write(base_path)
+        logger.info(f"🔬 Profile written: {report.files['profile']}")
+    except OSError as e:
+        logger.warning(f"⚠️ Não foi possível gravar o perfil do job {report.job_id}: {e}")
+
+
 # --- Scraping ---
-def scrape_vivareal(url, refinamentos, max_pages=5, user_id=None, tipo_solicitado=None, tipo_transacao=None):
+# 'selenium': um Chrome por página/anúncio (padrão); 'playwright': poucos navegadores com muitas abas
+SCRAPER_ENGINE = os.getenv('SCRAPER_ENGINE', 'selenium').strip().lower()
+SEARCH_RESULTS_SELECTOR = "li[data-cy='rp-property-cd'], div.results-list__container > p"
+# Seções que parse_ad_details lê; a página de anúncio está pronta quando todas existem
+AD_DETAILS_SELECTORS = [
+    "section[data-testid='advertiser-info-container']",
+    "section[data-testid='description-container']",
+]
+# 'eager' devolve o driver.get no DOMContentLoaded, sem esperar fotos e pixels de anúncio;
+# a prontidão de verdade vem das esperas pelos seletores acima
+PAGE_LOAD_STRATEGY = os.getenv('PAGE_LOAD_STRATEGY', 'eager').strip().lower()
+AD_WAIT_TIMEOUT = float(os.getenv('AD_WAIT_TIMEOUT', '5'))  # depois disso o anúncio é lido com o que tiver carregado
+
+# Enriquecimento: 'http' lê as páginas de anúncio direto por HTTP e só abre navegador para
+# as que falharem; 'browser' usa sempre o navegador (comportamento antigo)
+ENRICH_MODE = os.getenv('ENRICH_MODE', 'http').strip().lower()
+HTTP_ENRICH_WORKERS = int(os.getenv('HTTP_ENRICH_WORKERS', '24'))
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', '15'))
+# O telefone só aparece depois de JS; pedir telefone manda para o navegador os anúncios sem ele
+ENRICH_PHONE = os.getenv('ENRICH_PHONE', '').strip().lower() in ('1', 'true', 'sim', 'yes')
+# Orçamento do enriquecimento: só os ENRICH_TOP_K imóveis mais relevantes, dentro de
+# ENRICH_TIME_BUDGET segundos; o resto vai para a planilha marcado como pendente (0 = sem limite)
+ENRICH_TOP_K = int(os.getenv('ENRICH_TOP_K', '200'))
+ENRICH_TIME_BUDGET = float(os.getenv('ENRICH_TIME_BUDGET', '180'))
+# Detalhes de anúncios já visitados são reaproveitados por AD_CACHE_TTL segundos (0 desativa);
+# as páginas de resultado são sempre buscadas de novo, porque preços e anúncios mudam
+AD_CACHE_TTL = float(os.getenv('AD_CACHE_TTL', '21600'))
+AD_CACHE_MAX = int(os.getenv('AD_CACHE_MAX', '5000'))
+
+# --- Bloqueio de recursos ---
+# Só o HTML (e o JS que monta os cards) interessa ao parser; fotos, fontes, vídeos e
+# rastreadores são a maior parte do tráfego de uma página de imóvel e ficam de fora.
+def _env_list(name, default):
+    return [item.strip().lower() for item in os.getenv(name, default).split(',') if item.strip()]
+
+RESOURCE_BLOCKING = os.getenv('RESOURCE_BLOCKING', '1').strip().lower() in ('1', 'true', 'sim', 'yes')
+# Tipos de recurso liberados (nomes do Playwright); o documento principal nunca é bloqueado
+ALLOWED_RESOURCE_TYPES = set(_env_list('ALLOWED_RESOURCE_TYPES', 'document,script,xhr,fetch,stylesheet,other'))
+BLOCKED_DOMAINS = _env_list('BLOCKED_DOMAINS', (
+    'google-analytics.com,googletagmanager.com,doubleclick.net,googlesyndication.com,'
+    'facebook.net,facebook.com,hotjar.com,clarity.ms,criteo.com,criteo.net,taboola.com,'
+    'outbrain.com,tiktok.com,bing.com,newrelic.com,nr-data.net'
+))
+# Domínios sempre liberados, mesmo que caiam num tipo ou domínio bloqueado
+ALLOWED_DOMAINS = _env_list('ALLOWED_DOMAINS', '')
+
+# O Chrome via Selenium só aceita padrões de URL (CDP Network.setBlockedURLs), então
+# os tipos viram extensões de arquivo e ALLOWED_DOMAINS só retira domínios de BLOCKED_DOMAINS
+RESOURCE_TYPE_URL_PATTERNS = {
+    'image': ['*.jpg*', '*.jpeg*', '*.png*', '*.gif*', '*.webp*', '*.avif*', '*.svg*', '*.ico*'],
+    'media': ['*.mp4*', '*.webm*', '*.m3u8*', '*.mp3*'],
+    'font': ['*.woff*', '*.woff2*', '*.ttf*', '*.otf*', '*.eot*'],
+    'stylesheet': ['*.css*'],
+}
+
+def domain_matches(host, domains):
+    host = (host or '').lower()
+    return any(host == domain or host.endswith('.' + domain) for domain in domains)
+
+def should_block_request(resource_type, url):
+    """Regra usada no roteamento de requisições do Playwright"""
+    if resource_type == 'document':
+        return False
+    host = urlparse(url).hostname
+    if domain_matches(host, ALLOWED_DOMAINS):
+        return False
+    return resource_type not in ALLOWED_RESOURCE_TYPES or domain_matches(host, BLOCKED_DOMAINS)
+
+def blocked_url_patterns():
+    """Padrões para o Network.setBlockedURLs do Chrome"""
+    patterns = []
+    for resource_type, type_patterns in RESOURCE_TYPE_URL_PATTERNS.items():
+        if resource_type not in ALLOWED_RESOURCE_TYPES:
+            patterns.extend(type_patterns)
+    for domain in BLOCKED_DOMAINS:
+        if not domain_matches(domain, ALLOWED_DOMAINS):
+            patterns.append(f"*://*.{domain}/*")
+            patterns.append(f"*://{domain}/*")
+    return patterns
+
+def apply_resource_blocking(driver):
+    """Ativa o bloqueio num Chrome recém-aberto, antes da primeira navegação"""
+    if not RESOURCE_BLOCKING:
+        return
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': blocked_url_patterns()})
+    except Exception as e:
+        logger.warning(f"⚠️ Could not enable resource blocking: {e}", extra=SAMPLED)
+
+_playwright_engine = None
+_playwright_engine_lock = threading.Lock()
+
+def get_playwright_engine():
+    """Motor Playwright compartilhado pelo processo, criado no primeiro uso"""
+    global _playwright_engine
+    with _playwright_engine_lock:
+        if _playwright_engine is None:
+            from playwright_engine import PlaywrightEngine
+            _playwright_engine = PlaywrightEngine(block_request=should_block_request if RESOURCE_BLOCKING else None)
+            atexit.register(_playwright_engine.close)
+            METRICS.set_callback('imobbot_playwright_browsers', lambda: _playwright_engine.browsers_alive)
+            METRICS.set_callback('imobbot_playwright_pages_open', lambda: _playwright_engine.open_pages)
+        return _playwright_engine
+
+def search_page_url(url, page):
+    if page == 1:
+        return url
+    return f"{url}&pagina={page}" if '?' in url else f"{url}?pagina={page}"
+
+def fetch_pages_playwright(urls, stage_prefix, report=None, **kwargs):
+    """Gera (url, html ou None) pelo motor Playwright, medindo as etapas como '<stage_prefix>.navigation' etc."""
+    engine = get_playwright_engine()
+    return engine.fetch_iter(urls, stage=lambda name: job_stage(report, f"{stage_prefix}.{name}"), **kwargs)
+
+def iter_search_pages_playwright(url, max_pages, site, tipo_solicitado=None, tipo_transacao=None, report=None):
+    """Gera a lista de imóveis de cada página de resultados, na ordem em que as páginas terminam"""
+    page_urls = [search_page_url(url, page) for page in range(1, max_pages + 1)]
+    for page_url, html in fetch_pages_playwright(page_urls, 'page', report, wait_selector=SEARCH_RESULTS_SELECTOR, timeout=10):
+        if html is None:
+            METRICS.inc('imobbot_page_errors_total', {'site': site})
+            yield []
+            continue
+        with job_stage(report, 'page.parse'):
+            page_data = parse_search_page(html, site, tipo_solicitado, tipo_transacao)
+        logger.info(f"🏠 [Playwright] Found {len(page_data)} properties on {page_url}")
+        METRICS.inc('imobbot_pages_scraped_total', {'site': site})
+        METRICS.inc('imobbot_listings_scraped_total', {'site': site}, len(page_data))
+        yield page_data
+
+# --- Busca fatiada (shards) ---
+# Estado e zonas inteiras estouram o limite de páginas de uma URL só; divididos em
+# cidades/zonas/bairros, cada fatia traz as primeiras páginas da sua região. As
+# páginas pedidas pelo usuário são o orçamento total por site, dividido entre as fatias
+SHARDED_SEARCH = os.getenv('SHARDED_SEARCH', '1').strip().lower() in ('1', 'true', 'sim', 'yes')
+SHARD_WORKERS = int(os.getenv('SHARD_WORKERS', '4'))  # páginas simultâneas somando todas as fatias
+SHARD_MAX_PAGES = int(os.getenv('SHARD_MAX_PAGES', '2'))  # páginas por fatia, no máximo
+SEARCH_SITES = {'viva': ['viva'], 'zap': ['zap'], 'ambos': ['viva', 'zap']}
+
+def search_shards(user_data):
+    """
+    Fatias de uma busca ampla, cada uma com os mesmos parâmetros e um local mais
+    estreito; a busca original entra como primeira fatia para cobrir anúncios sem
+    bairro/cidade reconhecidos. Buscas já estreitas voltam como fatia única.
+    """
+    if not SHARDED_SEARCH:
+        return [user_data]
+    local = user_data.get('local')
+    zona = user_data.get('zona')
+    if local == 'todo_estado':
+        shards = [{**user_data, 'local': 'zona', 'zona': nome} for nome in ZONAS_RJ]
+        shards += [{**user_data, 'local': 'cidade', 'cidade': cidade} for cidade in CIDADES_RJ if cidade != 'Rio de Janeiro']
+    elif local in ('zona', 'zona_completa') and zona in ZONAS_RJ:
+        shards = [{**user_data, 'local': 'bairro', 'bairro': bairro} for bairro in ZONAS_RJ[zona]]
+    else:
+        return [user_data]
+    return [user_data] + shards
+
+def expand_choices(user_data):
+    """Uma busca por combinação de bairro e tipo escolhidos (listas em bairros_busca/tipos_busca)"""
+    bairros = user_data.get('bairros_busca') or [user_data.get('bairro')]
+    tipos = user_data.get('tipos_busca') or [user_data.get('tipo')]
+    if len(bairros) * len(tipos) == 1:
+        return [user_data]
+    return [{**user_data, 'bairro': bairro, 'tipo': tipo} for bairro in bairros for tipo in tipos]
+
+def split_page_budget(parts, budget):
+    """
+    Divide `budget` páginas entre as fatias, na ordem (a busca ampla primeiro), até
+    SHARD_MAX_PAGES por fatia; fatias que não couberem no orçamento ficam de fora
+    """
+    if len(parts) == 1:
+        return [(parts[0], budget)]
+    plan = []
+    for part in parts:
+        if budget <= 0:
+            break
+        pages = min(budget, SHARD_MAX_PAGES)
+        plan.append((part, pages))
+        budget -= pages
+    return plan
+
+def plan_search(user_data, max_pages):
+    """
+    Lista de (busca, páginas) a coletar em cada site: uma por combinação de bairro e
+    tipo, com as max_pages pedidas divididas entre as fatias de search_shards
+    """
+    plan = []
+    for combo in expand_choices(user_data):
+        plan.extend(split_page_budget(search_shards(combo), max_pages))
+    return plan
+
+def scrape_search(site, user_data, refinamentos, max_pages, user_id=None, on_page=None, report=None, max_workers=4):
+    """Monta a URL de um site ('viva' ou 'zap') para os parâmetros e coleta as páginas"""
+    tipo_solicitado = user_data.get('tipo', 'N/A')
+    tipo_transacao = user_data.get('modalidade', 'N/A')
+    if site == 'zap':
+        with job_stage(report, 'url_build'):
+            url = build_zap_url(user_data)
+        logger.info(f"🌐 Scraping Zap Imóveis: {url}")
+        return scrape_zap(url, refinamentos, max_pages=max_pages, user_id=user_id, tipo_solicitado=tipo_solicitado, tipo_transacao=tipo_transacao, on_page=on_page, report=report, max_workers=max_workers)
+    with job_stage(report, 'url_build'):
+        url = build_vivareal_url(user_data)
+    logger.info(f"🌐 Scraping Viva Real: {url}")
+    return scrape_vivareal(url, refinamentos, max_pages=max_pages, user_id=user_id, tipo_solicitado=tipo_solicitado, tipo_transacao=tipo_transacao, on_page=on_page, report=report, max_workers=max_workers)
+
+def scrape_sharded(sites, plan, refinamentos, user_id=None, on_page=None, report=None):
+    """
+    Coleta todas as fatias do plano (pares busca, páginas) em todos os sites em
+    paralelo, com no máximo SHARD_WORKERS páginas abertas ao mesmo tempo (uma por
+    fatia em andamento), e junta os resultados sem repetir anúncios.
+    """
+    logger.info(f"🧩 Sharded search: {len(plan)} shards x {len(sites)} site(s), {sum(pages for _, pages in plan)} page(s) per site, {SHARD_WORKERS} workers")
+    data = []
+    with ThreadPoolExecutor(max_workers=SHARD_WORKERS, thread_name_prefix=threading.current_thread().name) as executor:
+        futures = [
+            executor.submit(scrape_search, site, shard, refinamentos, pages, user_id, on_page, report, 1)
+            for shard, pages in plan for site in sites
+        ]
+        for future in as_completed(futures):
+            if user_id and is_scraping_cancelled(user_id):
+                logger.info(f"🚫 Sharded search cancelled for user {user_id}")
+                break
+            try:
+                data.extend(future.result())
+            except Exception as e:
+                logger.error(f"❌ Error in search shard: {str(e)}")
+
+    # Fatias se sobrepõem (a busca ampla e as regiões dela, tipos vizinhos): um anúncio por link
+    unique = {}
+    for imovel in data:
+        unique.setdefault(imovel.link or id(imovel), imovel)
+    logger.info(f"🧩 Sharded search merged {len(data)} listings into {len(unique)} unique")
+    return list(unique.values())
+
+def scrape_vivareal(url, refinamentos, max_pages=5, user_id=None, tipo_solicitado=None, tipo_transacao=None, on_page=None, report=None, max_workers=4):
     logger.info(f"🕷️ Starting scraping: {url}, max_pages: {max_pages}, tipo: {tipo_solicitado}, transacao: {tipo_transacao}")
     data = []
-    max_workers = min(4, max_pages)  # Limite de 4 threads para não sobrecarregar
+    max_workers = min(max_workers, max_pages)  # Até 4 navegadores por busca (1 por fatia em buscas fatiadas)
 
     def scrape_page(page):
         # Verificar cancelamento no início de cada página
@@ -816,170 +1058,118 @@ def scrape_vivareal(url, refinamentos, max_pages=5, user_id=None, tipo_solicitad
             logger.info(f"🚫 Scraping cancelled for user {user_id} on page {page}")
             return []
             
+        # Selenium só é carregado quando esta busca realmente usa um navegador
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service as ChromeService
+        from selenium.webdriver.chrome.options import Options as ChromeOptions
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.common.exceptions import TimeoutException
+        from webdriver_manager.chrome import ChromeDriverManager
         options = ChromeOptions()
         options.add_argument("--headless=new")
         options.add_argument("--disable-gpu")
         options.add_argument("--window-size=1920,1200")
         options.add_argument("--no-sandbox")
         options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36')
+        options.page_load_strategy = PAGE_LOAD_STRATEGY
         driver = None
         page_data = []
         try:
-            service = ChromeService(ChromeDriverManager().install())
-            driver = webdriver.Chrome(service=service, options=options)
+            with job_stage(report, 'page.browser_start'):
+                service = ChromeService(ChromeDriverManager().install())
+                driver = webdriver.Chrome(service=service, options=options)
+                METRICS.inc('imobbot_browsers_alive')
+                apply_resource_blocking(driver)
             if page == 1:
                 page_url = url
             else:
                 page_url = f"{url}&pagina={page}" if '?' in url else f"{url}?pagina={page}"
-            logger.info(f"📄 [Thread] Scraping page {page}: {page_url}")
-            driver.get(page_url)
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "li[data-cy='rp-property-cd'], div.results-list__container > p"))
-            )
+            logger.debug(f"📄 [Thread] Scraping page {page}: {page_url}")
+            with job_stage(report, 'page.navigation'):
+                driver.get(page_url)
+            with job_stage(report, 'page.wait'):
+                WebDriverWait(driver, 10).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, SEARCH_RESULTS_SELECTOR))
+                )
             
             # Verificar cancelamento após carregar a página
             if user_id and is_scraping_cancelled(user_id):
                 logger.info(f"🚫 Scraping cancelled for user {user_id} after loading page {page}")
                 return []
                 
-            soup = BeautifulSoup(driver.page_source, 'html.parser')
-            listings = soup.find_all('li', {'data-cy': 'rp-property-cd'})
-            logger.info(f"🏠 [Thread] Found {len(listings)} properties on page {page}")
-            for listing in listings:
-                # Verificar cancelamento durante o processamento
-                if user_id and is_scraping_cancelled(user_id):
-                    logger.info(f"🚫 Scraping cancelled for user {user_id} during processing page {page}")
-                    return page_data
-                    
-                try:
-                    d = {}
-                    # Adicionar Site
-                    d['Site'] = 'Viva Real'
-                    
-                    # Adicionar tipo solicitado
-                    d['Tipo de Imóvel'] = tipo_solicitado if tipo_solicitado else 'N/A'
-                    
-                    # Adicionar tipo de transação
-                    d['Tipo de Transação'] = tipo_transacao if tipo_transacao else 'N/A'
-                    
-                    link_tag = listing.find('a', class_='block') if isinstance(listing, Tag) else None
-                    d['Link'] = link_tag['href'] if isinstance(link_tag, Tag) and link_tag.has_attr('href') else 'N/A'
-                    
-                    # Extrair rua
-                    street_p = listing.find('p', {'data-cy': 'rp-cardProperty-street-txt'}) if isinstance(listing, Tag) else None
-                    d['Rua'] = street_p.get_text(strip=True) if isinstance(street_p, Tag) else 'N/A'
-                    
-                    # Extrair endereço completo
-                    endereco_h2 = listing.find('h2', {'data-cy': 'rp-cardProperty-location-txt'}) if isinstance(listing, Tag) else None
-                    endereco_completo = endereco_h2.get_text(strip=True) if isinstance(endereco_h2, Tag) else 'N/A'
-                    d['Endereço'] = endereco_completo
-                    
-                    # Separar Estado, Município e Bairro do endereço
-                    if endereco_completo != 'N/A':
-                        # Formato típico: "Bairro, Cidade - Estado"
-                        parts = endereco_completo.split(',')
-                        if len(parts) >= 2:
-                            bairro = parts[0].strip()
-                            cidade_estado = parts[1].strip()
-                            
-                            # Separar cidade e estado
-                            if ' - ' in cidade_estado:
-                                cidade, estado = cidade_estado.split(' - ', 1)
-                                d['Bairro'] = bairro
-                                d['Município'] = cidade.strip()
-                                d['Estado'] = estado.strip()
-                            else:
-                                d['Bairro'] = bairro
-                                d['Município'] = cidade_estado
-                                d['Estado'] = 'RJ'  # Padrão para Rio de Janeiro
-                        else:
-                            d['Bairro'] = endereco_completo
-                            d['Município'] = 'Rio de Janeiro'
-                            d['Estado'] = 'RJ'
-                    else:
-                        d['Bairro'] = 'N/A'
-                        d['Município'] = 'N/A'
-                        d['Estado'] = 'N/A'
-                    
-                    price_div = listing.find('div', {'data-cy': 'rp-cardProperty-price-txt'}) if isinstance(listing, Tag) else None
-                    if isinstance(price_div, Tag):
-                        paragraphs = price_div.find_all('p')
-                        if paragraphs and isinstance(paragraphs[0], Tag):
-                            d['Preço'] = paragraphs[0].get_text(strip=True)
-                        else:
-                            d['Preço'] = 'N/A'
-                        if len(paragraphs) > 1 and isinstance(paragraphs[1], Tag):
-                            cond_iptu_text = paragraphs[1].get_text(strip=True)
-                            cond_match = re.search(r'Cond\.\s*R\$\s*([\d\.,]+)', cond_iptu_text)
-                            iptu_match = re.search(r'IPTU\s*R\$\s*([\d\.,]+)', cond_iptu_text)
-                            d['Condomínio'] = cond_match.group(1) if cond_match else 'N/A'
-                            d['IPTU'] = iptu_match.group(1) if iptu_match else 'N/A'
-                    else:
-                        d['Preço'] = 'N/A'
-                        d['Condomínio'] = 'N/A'
-                        d['IPTU'] = 'N/A'
-                    
-                    d['Área m²'] = extract_feature(listing, 'rp-cardProperty-propertyArea-txt')
-                    d['Quartos'] = extract_feature(listing, 'rp-cardProperty-bedroomQuantity-txt')
-                    d['Banheiros'] = extract_feature(listing, 'rp-cardProperty-bathroomQuantity-txt')
-                    d['Vagas'] = extract_feature(listing, 'rp-cardProperty-parkingSpacesQuantity-txt')
-                    
-                    page_data.append(d)
-                except Exception as e:
-                    logger.warning(f"⚠️ [Thread] Error processing listing on page {page}: {str(e)}")
-                    continue
+            with job_stage(report, 'page.parse'):
+                page_data = parse_search_page(driver.page_source, 'Viva Real', tipo_solicitado, tipo_transacao)
+            logger.info(f"🏠 [Thread] Found {len(page_data)} properties on page {page}")
+            METRICS.inc('imobbot_pages_scraped_total', {'site': 'Viva Real'})
+            METRICS.inc('imobbot_listings_scraped_total', {'site': 'Viva Real'}, len(page_data))
         except TimeoutException:
             logger.warning(f"⚠️ [Thread] Timeout on page {page}, skipping")
+            METRICS.inc('imobbot_page_errors_total', {'site': 'Viva Real'})
         except Exception as e:
             logger.error(f"❌ [Thread] Error on page {page}: {str(e)}")
+            METRICS.inc('imobbot_page_errors_total', {'site': 'Viva Real'})
         finally:
             if driver:
                 try:
                     driver.quit()
                 except:
                     pass
+                METRICS.dec('imobbot_browsers_alive')
             # Pequeno delay randômico para evitar bloqueio
             time.sleep(random.uniform(0.5, 1.5))
         return page_data
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_page = {executor.submit(scrape_page, page): page for page in range(1, max_pages + 1)}
-        for future in as_completed(future_to_page):
-            page = future_to_page[future]
-            # Verificar cancelamento antes de processar cada resultado
+    if SCRAPER_ENGINE == 'playwright':
+        for page_data in iter_search_pages_playwright(url, max_pages, 'Viva Real', tipo_solicitado, tipo_transacao, report):
             if user_id and is_scraping_cancelled(user_id):
-                logger.info(f"🚫 Scraping cancelled for user {user_id} during thread processing")
+                logger.info(f"🚫 Scraping cancelled for user {user_id} during page processing")
                 break
-            try:
-                result = future.result()
-                data.extend(result)
-            except Exception as e:
-                logger.error(f"❌ [ThreadPool] Error on page {page}: {str(e)}")
+            data.extend(page_data)
+            if on_page:
+                on_page(page_data)
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=threading.current_thread().name) as executor:
+            future_to_page = {executor.submit(scrape_page, page): page for page in range(1, max_pages + 1)}
+            for future in as_completed(future_to_page):
+                page = future_to_page[future]
+                # Verificar cancelamento antes de processar cada resultado
+                if user_id and is_scraping_cancelled(user_id):
+                    logger.info(f"🚫 Scraping cancelled for user {user_id} during thread processing")
+                    break
+                try:
+                    result = future.result()
+                    data.extend(result)
+                    if on_page:
+                        on_page(result)
+                except Exception as e:
+                    logger.error(f"❌ [ThreadPool] Error on page {page}: {str(e)}")
 
     # Remover duplicados por link
     seen = set()
     unique_data = []
-    for d in data:
-        link = d.get('Link', '')
-        if link and link not in seen:
-            unique_data.append(d)
-            seen.add(link)
+    for imovel in data:
+        if imovel.link and imovel.link not in seen:
+            unique_data.append(imovel)
+            seen.add(imovel.link)
 
     logger.info(f"✅ Scraping completed: {len(unique_data)} unique properties found")
     
     # APLICAR FILTROS ANTES DE RETORNAR - ESSA ERA A PARTE QUE ESTAVA FALTANDO!
     if refinamentos:
         logger.info(f"🔍 Applying filters: {refinamentos}")
-        filtered_data = apply_refinamentos(unique_data, refinamentos)
+        with job_stage(report, 'filter'):
+            filtered_data = apply_refinamentos(unique_data, refinamentos)
         logger.info(f"🔍 After filtering: {len(filtered_data)} properties remaining (from {len(unique_data)})")
         return filtered_data
     
     return unique_data
 
-def scrape_zap(url, refinamentos, max_pages=5, user_id=None, tipo_solicitado=None, tipo_transacao=None):
+def scrape_zap(url, refinamentos, max_pages=5, user_id=None, tipo_solicitado=None, tipo_transacao=None, on_page=None, report=None, max_workers=4):
     logger.info(f"🕷️ Starting Zap scraping: {url}, max_pages: {max_pages}, tipo: {tipo_solicitado}, transacao: {tipo_transacao}")
     data = []
-    max_workers = min(4, max_pages)  # Limite de 4 threads para não sobrecarregar
+    max_workers = min(max_workers, max_pages)  # Até 4 navegadores por busca (1 por fatia em buscas fatiadas)
 
     def scrape_page(page):
         # Verificar cancelamento no início de cada página
@@ -987,155 +1177,84 @@ def scrape_zap(url, refinamentos, max_pages=5, user_id=None, tipo_solicitado=Non
             logger.info(f"🚫 Scraping cancelled for user {user_id} on page {page}")
             return []
             
+        # Selenium só é carregado quando esta busca realmente usa um navegador
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service as ChromeService
+        from selenium.webdriver.chrome.options import Options as ChromeOptions
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+        from webdriver_manager.chrome import ChromeDriverManager
         options = ChromeOptions()
         options.add_argument("--headless=new")
         options.add_argument("--disable-gpu")
         options.add_argument("--window-size=1920,1200")
         options.add_argument("--no-sandbox")
         options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36')
+        options.page_load_strategy = PAGE_LOAD_STRATEGY
         driver = None
         page_data = []
         try:
-            service = ChromeService(ChromeDriverManager().install())
-            driver = webdriver.Chrome(service=service, options=options)
+            with job_stage(report, 'page.browser_start'):
+                service = ChromeService(ChromeDriverManager().install())
+                driver = webdriver.Chrome(service=service, options=options)
+                METRICS.inc('imobbot_browsers_alive')
+                apply_resource_blocking(driver)
             if page == 1:
                 page_url = url
             else:
                 page_url = f"{url}&pagina={page}" if '?' in url else f"{url}?pagina={page}"
-            logger.info(f"📄 [Thread] Scraping Zap page {page}: {page_url}")
-            driver.get(page_url)
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "li[data-cy='rp-property-cd'], div.results-list__container > p"))
-            )
+            logger.debug(f"📄 [Thread] Scraping Zap page {page}: {page_url}")
+            with job_stage(report, 'page.navigation'):
+                driver.get(page_url)
+            with job_stage(report, 'page.wait'):
+                WebDriverWait(driver, 10).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, SEARCH_RESULTS_SELECTOR))
+                )
             
             # Verificar cancelamento após carregar a página
             if user_id and is_scraping_cancelled(user_id):
                 logger.info(f"🚫 Scraping cancelled for user {user_id} after loading page {page}")
                 return []
                 
-            soup = BeautifulSoup(driver.page_source, 'html.parser')
-            listings = soup.find_all('li', {'data-cy': 'rp-property-cd'})
-            logger.info(f"🏠 [Thread] Found {len(listings)} properties on Zap page {page}")
-            for listing in listings:
-                # Verificar cancelamento durante o processamento
-                if user_id and is_scraping_cancelled(user_id):
-                    logger.info(f"🚫 Scraping cancelled for user {user_id} during processing page {page}")
-                    return page_data
-                    
-                try:
-                    d = {}
-                    # Adicionar Site
-                    d['Site'] = 'Zap Imóveis'
-                    
-                    # Adicionar tipo solicitado
-                    d['Tipo de Imóvel'] = tipo_solicitado if tipo_solicitado else 'N/A'
-                    
-                    # Adicionar tipo de transação
-                    d['Tipo de Transação'] = tipo_transacao if tipo_transacao else 'N/A'
-                    
-                    link_tag = listing.find('a', class_='block') if isinstance(listing, Tag) else None
-                    d['Link'] = link_tag['href'] if isinstance(link_tag, Tag) and link_tag.has_attr('href') else 'N/A'
-                    
-                    # Extrair rua
-                    street_p = listing.find('p', {'data-cy': 'rp-cardProperty-street-txt'}) if isinstance(listing, Tag) else None
-                    d['Rua'] = street_p.get_text(strip=True) if isinstance(street_p, Tag) else 'N/A'
-                    
-                    # Extrair endereço completo
-                    endereco_h2 = listing.find('h2', {'data-cy': 'rp-cardProperty-location-txt'}) if isinstance(listing, Tag) else None
-                    endereco_completo = endereco_h2.get_text(strip=True) if isinstance(endereco_h2, Tag) else 'N/A'
-                    d['Endereço'] = endereco_completo
-                    
-                    # Separar Estado, Município e Bairro do endereço
-                    if endereco_completo != 'N/A':
-                        # Formato típico: "Bairro, Cidade - Estado"
-                        parts = endereco_completo.split(',')
-                        if len(parts) >= 2:
-                            bairro = parts[0].strip()
-                            cidade_estado = parts[1].strip()
-                            
-                            # Separar cidade e estado
-                            if ' - ' in cidade_estado:
-                                cidade, estado = cidade_estado.split(' - ', 1)
-                                d['Bairro'] = bairro
-                                d['Município'] = cidade.strip()
-                                d['Estado'] = estado.strip()
-                            else:
-                                d['Bairro'] = bairro
-                                d['Município'] = cidade_estado
-                                d['Estado'] = 'RJ'  # Padrão para Rio de Janeiro
-                        else:
-                            d['Bairro'] = endereco_completo
-                            d['Município'] = 'Rio de Janeiro'
-                            d['Estado'] = 'RJ'
-                    else:
-                        d['Bairro'] = 'N/A'
-                        d['Município'] = 'N/A'
-                        d['Estado'] = 'N/A'
-                    
-                    price_div = listing.find('div', {'data-cy': 'rp-cardProperty-price-txt'}) if isinstance(listing, Tag) else None
-                    if isinstance(price_div, Tag):
-                        paragraphs = price_div.find_all('p')
-                        if paragraphs and isinstance(paragraphs[0], Tag):
-                            d['Preço'] = paragraphs[0].get_text(strip=True)
-                            if len(paragraphs) > 1 and isinstance(paragraphs[1], Tag):
-                                cond_iptu_text = paragraphs[1].get_text(strip=True)
-                                cond_match = re.search(r'Cond\.\s*R\$\s*([\d\.,]+)', cond_iptu_text)
-                                iptu_match = re.search(r'IPTU\s*R\$\s*([\d\.,]+)', cond_iptu_text)
-                                d['Condomínio'] = cond_match.group(1) if cond_match else 'N/A'
-                                d['IPTU'] = iptu_match.group(1) if iptu_match else 'N/A'
-                            else:
-                                d['Condomínio'] = 'N/A'
-                                d['IPTU'] = 'N/A'
-                        else:
-                            d['Preço'] = 'N/A'
-                            d['Condomínio'] = 'N/A'
-                            d['IPTU'] = 'N/A'
-                    else:
-                        d['Preço'] = 'N/A'
-                        d['Condomínio'] = 'N/A'
-                        d['IPTU'] = 'N/A'
-                    
-                    # Extrair características
-                    d['Área m²'] = extract_feature(listing, 'rp-cardProperty-propertyArea-txt')
-                    d['Quartos'] = extract_feature(listing, 'rp-cardProperty-bedroomQuantity-txt')
-                    d['Banheiros'] = extract_feature(listing, 'rp-cardProperty-bathroomQuantity-txt')
-                    d['Vagas'] = extract_feature(listing, 'rp-cardProperty-parkingSpacesQuantity-txt')
-                    
-                    # Campos padrão para compatibilidade
-                    d['Titulo_Anuncio'] = 'N/A'
-                    d['Codigos_Anuncio'] = 'N/A'
-                    d['Endereco_Completo'] = endereco_completo
-                    d['Anunciante'] = 'N/A'
-                    d['Creci'] = 'N/A'
-                    d['Classificacao_Anunciante'] = 'N/A'
-                    d['Imoveis_Cadastrados'] = 'N/A'
-                    d['Descricao'] = 'N/A'
-                    d['Telefone'] = 'N/A'
-                    d['Data_Criacao'] = 'N/A'
-                    
-                    page_data.append(d)
-                    
-                except Exception as e:
-                    logger.error(f"❌ Error processing Zap listing: {e}")
-                    continue
+            with job_stage(report, 'page.parse'):
+                page_data = parse_search_page(driver.page_source, 'Zap Imóveis', tipo_solicitado, tipo_transacao)
+            logger.info(f"🏠 [Thread] Found {len(page_data)} properties on Zap page {page}")
+            METRICS.inc('imobbot_pages_scraped_total', {'site': 'Zap Imóveis'})
+            METRICS.inc('imobbot_listings_scraped_total', {'site': 'Zap Imóveis'}, len(page_data))
                     
         except Exception as e:
             logger.error(f"❌ Error in Zap scraping thread for page {page}: {e}")
+            METRICS.inc('imobbot_page_errors_total', {'site': 'Zap Imóveis'})
         finally:
             if driver:
-                driver.quit()
+                try:
+                    driver.quit()
+                finally:
+                    METRICS.dec('imobbot_browsers_alive')
         return page_data
 
-    # Executar scraping em paralelo
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [executor.submit(scrape_page, page) for page in range(1, max_pages + 1)]
+    if SCRAPER_ENGINE == 'playwright':
+        for page_data in iter_search_pages_playwright(url, max_pages, 'Zap Imóveis', tipo_solicitado, tipo_transacao, report):
+            if user_id and is_scraping_cancelled(user_id):
+                logger.info(f"🚫 Scraping cancelled for user {user_id} during page processing")
+                break
+            data.extend(page_data)
+            if on_page:
+                on_page(page_data)
+    else:
+        # Executar scraping em paralelo
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=threading.current_thread().name) as executor:
+            futures = [executor.submit(scrape_page, page) for page in range(1, max_pages + 1)]
         
-        for future in as_completed(futures):
-            try:
-                page_data = future.result()
-                data.extend(page_data)
-            except Exception as e:
-                logger.error(f"❌ Error in Zap scraping future: {e}")
+            for future in as_completed(futures):
+                try:
+                    page_data = future.result()
+                    data.extend(page_data)
+                    if on_page:
+                        on_page(page_data)
+                except Exception as e:
+                    logger.error(f"❌ Error in Zap scraping future: {e}")
     
     logger.info(f"✅ Zap scraping completed. Total properties: {len(data)}")
     return data
@@ -1155,28 +1274,6 @@ def apply_refinamentos(data, refinamentos):
     if not refinamentos:
         return data
     
-    def clean_to_float(text):
-        """Converte texto para float, removendo caracteres não numéricos"""
-        if not isinstance(text, str) or text == 'N/A': 
-            return None
-        try:
-            # Remove tudo exceto dígitos e vírgulas, depois substitui vírgula por ponto
-            cleaned = re.sub(r'[^\d,]', '', text).replace(',', '.')
-            return float(cleaned) if cleaned else None
-        except (ValueError, TypeError):
-            return None
-
-    def clean_to_int(text):
-        """Converte texto para int, removendo caracteres não numéricos"""
-        if not isinstance(text, str) or text == 'N/A': 
-            return 0
-        try:
-            # Remove tudo exceto dígitos
-            cleaned = re.sub(r'[^\d]', '', text)
-            return int(cleaned) if cleaned else 0
-        except (ValueError, TypeError):
-            return 0
-    
     logger.info(f"🔍 Applying filters to {len(data)} properties: {refinamentos}")
     
     # Extrair valores dos filtros com defaults seguros
@@ -1189,50 +1286,34 @@ def apply_refinamentos(data, refinamentos):
     max_area = refinamentos.get('max_area')
     paga_condominio = refinamentos.get('paga_condominio', False)
     
-    # Detectar se é busca apenas por terreno (baseado no tipo de imóvel)
-    is_terreno_only = False
-    for item in data[:5]:  # Verifica os primeiros 5 itens para determinar o tipo
-        tipo_imovel = item.get('Tipo de Imóvel', '').lower()
-        if 'terreno' in tipo_imovel:
-            is_terreno_only = True
-            break
-    
     filtered_data = []
     original_count = len(data)
     
     for item in data:
-        # Extrair valores do item
-        item_preco = clean_to_float(item.get("Preço", "0"))
-        item_area = clean_to_float(item.get("Área m²", "0"))
-        item_quartos = clean_to_int(item.get("Quartos", "0"))
-        item_banheiros = clean_to_int(item.get("Banheiros", "0"))
-        item_vagas = clean_to_int(item.get("Vagas", "0"))
-        item_condominio = item.get("Condomínio", "N/A") != "N/A"
-        
-        # Aplicar filtros específicos por tipo de imóvel
-        if is_terreno_only:
+        # Aplicar filtros específicos por tipo de imóvel (uma busca pode misturar tipos)
+        if 'terreno' in (item.tipo_imovel or '').lower():
             # Para terrenos, apenas verificar condomínio se solicitado
-            if paga_condominio and not item_condominio: 
+            if paga_condominio and item.condominio is None: 
                 continue
         else:
             # Para outros tipos de imóveis, verificar quartos, banheiros e vagas
-            if item_quartos < min_quartos: 
+            if (item.quartos or 0) < min_quartos: 
                 continue
-            if item_banheiros < min_banheiros: 
+            if (item.banheiros or 0) < min_banheiros: 
                 continue
-            if item_vagas < min_vagas: 
+            if (item.vagas or 0) < min_vagas: 
                 continue
 
         # Filtros de preço (aplicam a todos os tipos)
-        if min_preco is not None and item_preco is not None and item_preco < min_preco: 
+        if min_preco is not None and item.preco is not None and item.preco < min_preco: 
             continue
-        if max_preco is not None and item_preco is not None and item_preco > max_preco: 
+        if max_preco is not None and item.preco is not None and item.preco > max_preco: 
             continue
             
         # Filtros de área (aplicam a todos os tipos)
-        if min_area is not None and item_area is not None and item_area < min_area: 
+        if min_area is not None and item.area is not None and item.area < min_area: 
             continue
-        if max_area is not None and item_area is not None and item_area > max_area: 
+        if max_area is not None and item.area is not None and item.area > max_area: 
             continue
         
         # Se chegou até aqui, o item passou em todos os filtros
@@ -1278,91 +1359,404 @@ def gpt4o_parse_refinamento(resposta_usuario):
         logger.error(f"❌ Erro ao interpretar refinamento: {str(e)} | Resposta: {resposta}")
     return {}
 
-def enrich_property_details(properties, max_workers=6, user_id=None):
+AD_ID_RE = re.compile(r'id-(\d+)')
+
+def _percentiles(values):
+    """Posição relativa (0 a 1) de cada valor entre os não nulos; None continua None"""
+    known = sorted(v for v in values if v is not None)
+    if len(known) < 2:
+        return [0.5 if v is not None else None for v in values]
+    rank = {v: i / (len(known) - 1) for i, v in enumerate(known)}
+    return [rank[v] if v is not None else None for v in values]
+
+def _closeness(value, low, high):
+    """1 dentro da faixa pedida, caindo até 0 a 100% de distância dela; 0.5 sem faixa ou sem valor"""
+    if value is None or (low is None and high is None):
+        return 0.5
+    if low is not None and value < low:
+        return max(0.0, 1 - (low - value) / low) if low else 0.0
+    if high is not None and value > high:
+        return max(0.0, 1 - (value - high) / high) if high else 0.0
+    return 1.0
+
+def enrichment_scores(properties, refinamentos=None):
+    """
+    Relevância de cada imóvel para o enriquecimento: proximidade do preço e da área
+    pedidos, preço por m² (mais barato primeiro) e anúncio mais novo (id maior).
+    """
+    refinamentos = refinamentos or {}
+    price_per_m2 = [imovel.preco / imovel.area if imovel.preco and imovel.area else None for imovel in properties]
+    ad_ids = []
+    for imovel in properties:
+        match = AD_ID_RE.search(imovel.link or '')
+        ad_ids.append(int(match.group(1)) if match else None)
+    cheapness = _percentiles(price_per_m2)
+    freshness = _percentiles(ad_ids)
+
+    scores = []
+    for i, imovel in enumerate(properties):
+        score = 0.3 * _closeness(imovel.preco, refinamentos.get('min_preco'), refinamentos.get('max_preco'))
+        score += 0.2 * _closeness(imovel.area, refinamentos.get('min_area'), refinamentos.get('max_area'))
+        score += 0.3 * (1 - cheapness[i] if cheapness[i] is not None else 0)
+        score += 0.2 * (freshness[i] if freshness[i] is not None else 0)
+        scores.append(score)
+    return scores
+
+def enrich_property_details(properties, max_workers=6, user_id=None, on_progress=None, report=None,
+                            refinamentos=None, top_k=ENRICH_TOP_K, time_budget=ENRICH_TIME_BUDGET):
     """
     Após a coleta inicial, extrai dados detalhados de cada anúncio usando multi-threading.
     Adaptado do DONE.py para o contexto do bot Telegram.
+    
+    Os anúncios são visitados do mais para o menos relevante (enrichment_scores); só os
+    top_k primeiros entram e o que não ficar pronto em time_budget segundos é marcado
+    como pendente (detalhes_pendentes), sem segurar a entrega da planilha.
     """
     logger.info(f"🔎 Starting enrichment for {len(properties)} properties")
     
-    if not properties:
-        logger.warning("⚠️ Nenhum imóvel encontrado para enriquecimento")
-        return []
+    if not properties:
+        logger.warning("⚠️ Nenhum imóvel encontrado para enriquecimento")
+        return []
+    
+    # Filtrar apenas imóveis com links válidos; os demais seguem sem detalhes
+    valid_links = [imovel.link for imovel in properties if imovel.has_valid_link()]
+    for imovel in properties:
+        if not imovel.has_valid_link():
+            logger.warning(f"[ENRICH] Link inválido ignorado: {imovel.link}", extra=SAMPLED)
+    
+    if not valid_links:
+        logger.warning("⚠️ Nenhum link válido encontrado para extração de detalhes")
+        return properties
+    
+    logger.info(f"🔗 Encontrados {len(valid_links)} links válidos para enriquecimento")
+    
+    # Mais relevantes primeiro; os executores processam na ordem de submissão
+    valid_properties = [imovel for imovel in properties if imovel.has_valid_link()]
+    scores = enrichment_scores(valid_properties, refinamentos)
+    ranked = sorted(range(len(valid_properties)), key=lambda i: -scores[i])
+    valid_links = list(dict.fromkeys(valid_properties[i].link for i in ranked))
+    if top_k and len(valid_links) > top_k:
+        logger.info(f"🏅 Enriquecendo os {top_k} mais relevantes de {len(valid_links)} anúncios")
+        valid_links = valid_links[:top_k]
+    deadline = time.monotonic() + time_budget if time_budget else None
+    
+    # Anúncios detalhados há pouco (ex.: a mesma busca repetida com /repetir) não são visitados de novo
+    cached = cached_ad_details(valid_links)
+    fetch_links = [link for link in valid_links if link not in cached]
+    if cached:
+        logger.info(f"♻️ {len(cached)} anúncios com detalhes em cache")
+        if report:
+            report.count('ad_cache_hits', len(cached))
+        if on_progress:
+            on_progress(len(cached), len(valid_links))
+    progress = (lambda done, _total: on_progress(len(cached) + done, len(valid_links))) if on_progress else None
+    
+    # Extrai dados detalhados usando a função multi-threaded
+    # max_workers: 6 threads por padrão (pode ser ajustado conforme capacidade do PC)
+    # - Mais threads = Mais rápido, mas mais uso de CPU/RAM
+    # - Recomendado: 4-8 threads para PCs normais, 8-12 para PCs potentes
+    skipped = set()  # links que ficaram sem visita por falta de tempo
+    if not fetch_links:
+        detailed_data = {}
+    elif ENRICH_MODE == 'http':
+        detailed_data, fallback_links = fetch_ad_info_http(fetch_links, user_id, on_progress=progress, report=report, deadline=deadline, skipped=skipped)
+        if fallback_links and not (user_id and is_scraping_cancelled(user_id)):
+            if deadline_passed(deadline):
+                skipped.update(fallback_links)
+            else:
+                logger.info(f"🌐 {len(fallback_links)} anúncios seguem para o navegador")
+                done_http = len(detailed_data)
+                browser_progress = (lambda done, _total: progress(done_http + done, len(fetch_links))) if progress else None
+                detailed_data.update(Extract_ad_info(fallback_links, max_workers, user_id, on_progress=browser_progress, report=report, deadline=deadline, skipped=skipped))
+    else:
+        detailed_data = Extract_ad_info(fetch_links, max_workers, user_id, on_progress=progress, report=report, deadline=deadline, skipped=skipped)
+    cache_ad_details(detailed_data)
+    detailed_data.update(cached)
+    
+    # Sem detalhes por falta de tempo ou fora do top_k: pendente; falhas dentro do prazo continuam sem detalhes
+    selected_links = set(valid_links)
+    
+    # Anexa os detalhes extraídos aos imóveis correspondentes
+    # (imóveis válidos primeiro, depois os sem link, como antes)
+    enriched = []
+    for imovel in properties:
+        if imovel.has_valid_link():
+            imovel.detalhes = detailed_data.get(imovel.link)
+            imovel.detalhes_pendentes = imovel.detalhes is None and (imovel.link in skipped or imovel.link not in selected_links)
+            if imovel.detalhes is None and not imovel.detalhes_pendentes:
+                logger.warning(f"[ENRICH] Dados não encontrados: {imovel.link}", extra=SAMPLED)
+            enriched.append(imovel)
+    enriched.extend(imovel for imovel in properties if not imovel.has_valid_link())
+    
+    pending = sum(1 for imovel in enriched if imovel.detalhes_pendentes)
+    if pending:
+        logger.info(f"⏳ {pending} imóveis ficaram pendentes (top_k={top_k}, orçamento={time_budget}s)")
+        if report:
+            report.count('pending', pending)
+    logger.info(f"🔎 Enriquecimento concluído para {len(enriched)} imóveis")
+    return enriched
+
+def parse_ad_details(html):
+    """Extrai os dados da página de detalhes de um anúncio (Viva Real ou Zap) a partir do HTML"""
+    # Parse do HTML para extrair os dados
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    # Inicializa dados do anúncio (campos não encontrados ficam None)
+    ad_data = DetalhesAnuncio()
+    
+    # Extrair dados do anunciante de forma mais robusta
+    try:
+        # Procurar seção do anunciante
+        advertiser_section = soup.find('section', {'data-testid': 'advertiser-info-container'})
+        if isinstance(advertiser_section, Tag):
+            # Nome do anunciante - tentar múltiplos seletores
+            name_tag = (advertiser_section.find('a', {'data-testid': 'official-store-redirect-link'}) or
+                       advertiser_section.find('h3') or
+                       advertiser_section.find('span', class_='advertiser-name'))
+            if isinstance(name_tag, Tag):
+                ad_data.anunciante = name_tag.get_text(strip=True)
+    
+            # Creci - buscar em parágrafos
+            for p in advertiser_section.find_all('p'):
+                if isinstance(p, Tag):
+                    text = p.get_text(strip=True)
+                    if 'creci' in text.lower():
+                        ad_data.creci = text
+                        break
+    
+            # Avaliação - buscar de forma mais simples
+            rating_div = advertiser_section.find('div', string=re.compile(r'\d+/\d+'))
+            if isinstance(rating_div, Tag):
+                ad_data.classificacao_anunciante = rating_div.get_text(strip=True)
+    
+            # Quantidade de imóveis - buscar números
+            for element in advertiser_section.find_all(['p', 'span', 'div']):
+                if isinstance(element, Tag):
+                    text = element.get_text(strip=True)
+                    if 'imóve' in text.lower() or 'propriedade' in text.lower():
+                        numbers = re.search(r'(\d+(?:\.\d+)?)', text)
+                        if numbers:
+                            ad_data.imoveis_cadastrados = parse_count(numbers.group(1).replace('.', ''))
+                            break
+    except Exception as e:
+        logger.warning(f"[ENRICH] Erro ao extrair dados do anunciante: {str(e)}", extra=SAMPLED)
+    
+    # Extrair dados do anúncio de forma mais robusta
+    try:
+        # Título - tentar múltiplos seletores
+        title_tag = (soup.find('h1', {'class': 'section-title'}) or
+                    soup.find('h1') or
+                    soup.find('title'))
+        if isinstance(title_tag, Tag):
+            ad_data.titulo = title_tag.get_text(strip=True)
+    
+        # Códigos do anúncio
+        code_tag = soup.find('p', {'data-cy': 'ldp-propertyCodes-txt'})
+        if isinstance(code_tag, Tag):
+            ad_data.codigos = code_tag.get_text(strip=True)
+    
+        # Descrição - buscar em seção de descrição
+        desc_section = soup.find('section', {'data-testid': 'description-container'})
+        if isinstance(desc_section, Tag):
+            desc_tag = desc_section.find('p', {'data-testid': 'description-content'})
+            if isinstance(desc_tag, Tag):
+                ad_data.descricao = desc_tag.get_text(strip=True)
     
-    # Filtrar apenas imóveis com links válidos
-    valid_properties = []
-    valid_links = []
+        # Telefone - buscar de forma mais ampla
+        phone_div = soup.find('div', {'data-testid': 'info-phone'})
+        if isinstance(phone_div, Tag):
+            phone_span = phone_div.find('span')
+            if isinstance(phone_span, Tag):
+                ad_data.telefone = phone_span.get_text(strip=True)
     
-    for prop in properties:
-        link = prop.get("Link", "")
-        if link and link != "N/A" and link.startswith("http"):
-            valid_properties.append(prop)
-            valid_links.append(link)
-        else:
-            # Para imóveis sem link válido, preencher com N/A e adicionar à lista final
-            prop.update({
-                'Anunciante': 'N/A',
-                'Creci': 'N/A',
-                'Classificacao_Anunciante': 'N/A',
-                'Imoveis_Cadastrados': 'N/A',
-                'Titulo_Anuncio': 'N/A',
-                'Codigos_Anuncio': 'N/A',
-                'Descricao': 'N/A',
-                'Telefone': 'N/A',
-                'Data_Criacao': 'N/A',
-                'Endereco_Completo': 'N/A'
+        # Endereço completo com número - buscar pelo seletor específico
+        address_p = None
+    
+        # Tentar múltiplos seletores para encontrar o endereço completo
+        try:
+            # Seletor exato fornecido pelo usuário
+            address_p = soup.find('p', {
+                'class': 'l-text l-u-color-neutral-28 l-text--variant-body-regular l-text--weight-bold address-info-value',
+                'data-testid': 'address-info-value'
             })
-            logger.warning(f"[ENRICH] Link inválido ignorado: {link}")
     
-    if not valid_links:
-        logger.warning("⚠️ Nenhum link válido encontrado para extração de detalhes")
-        return properties  # Retorna os imóveis com N/A preenchido
+            if isinstance(address_p, Tag):
+                address_text = address_p.get_text(strip=True)
+                if address_text and len(address_text) > 10:
+                    ad_data.endereco_completo = address_text
+                    logger.debug(f"[ENRICH] Endereço completo extraído: {ad_data.endereco_completo}")
     
-    logger.info(f"🔗 Encontrados {len(valid_links)} links válidos para enriquecimento")
+            # Se não encontrou, tentar seletor mais simples
+            if not address_p or ad_data.endereco_completo is None:
+                address_p = soup.find('p', {'data-testid': 'address-info-value'})
+                if isinstance(address_p, Tag):
+                    address_text = address_p.get_text(strip=True)
+                    if address_text and len(address_text) > 10:
+                        ad_data.endereco_completo = address_text
+                        logger.debug(f"[ENRICH] Endereço completo (fallback): {ad_data.endereco_completo}")
     
-    # Extrai dados detalhados usando a função multi-threaded
-    # max_workers: 6 threads por padrão (pode ser ajustado conforme capacidade do PC)
-    # - Mais threads = Mais rápido, mas mais uso de CPU/RAM
-    # - Recomendado: 4-8 threads para PCs normais, 8-12 para PCs potentes
-    detailed_data = Extract_ad_info(valid_links, max_workers, user_id)
+            # Se ainda não encontrou, tentar busca por classe
+            if not address_p or ad_data.endereco_completo is None:
+                address_p = soup.find('p', {'class': 'address-info-value'})
+                if isinstance(address_p, Tag):
+                    address_text = address_p.get_text(strip=True)
+                    if address_text and len(address_text) > 10:
+                        ad_data.endereco_completo = address_text
+                        logger.debug(f"[ENRICH] Endereço completo (classe): {ad_data.endereco_completo}")
     
-    # Adiciona os dados extraídos aos imóveis correspondentes
-    enriched = []
+        except Exception as e:
+            logger.warning(f"[ENRICH] Erro ao extrair endereço: {str(e)}", extra=SAMPLED)
     
-    # Processar imóveis válidos
-    for prop in valid_properties:
-        link = prop.get("Link")
-        if link in detailed_data:
-            # Adiciona os novos campos ao dicionário do imóvel
-            prop.update(detailed_data[link])
-            logger.info(f"[ENRICH] Sucesso: {link}")
-        else:
-            # Se não encontrou dados, preenche com N/A
-            prop.update({
-                'Anunciante': 'N/A',
-                'Creci': 'N/A',
-                'Classificacao_Anunciante': 'N/A',
-                'Imoveis_Cadastrados': 'N/A',
-                'Titulo_Anuncio': 'N/A',
-                'Codigos_Anuncio': 'N/A',
-                'Descricao': 'N/A',
-                'Telefone': 'N/A',
-                'Data_Criacao': 'N/A',
-                'Endereco_Completo': 'N/A'
-            })
-            logger.warning(f"[ENRICH] Dados não encontrados: {link}")
-        enriched.append(prop)
+        # Se não encontrou com nenhum seletor, tentar busca mais ampla
+        if not address_p or ad_data.endereco_completo is None:
+            # Buscar por qualquer elemento que contenha endereço
+            for element in soup.find_all(['p', 'div', 'span']):
+                if isinstance(element, Tag):
+                    text = element.get_text(strip=True)
+                    # Verificar se o texto parece ser um endereço (contém vírgula e números)
+                    if (',' in text and 
+                        any(char.isdigit() for char in text) and 
+                        len(text) > 15 and 
+                        ('rio de janeiro' in text.lower() or 'rj' in text.lower())):
+                        ad_data.endereco_completo = text
+                        logger.debug(f"[ENRICH] Endereço completo (busca ampla): {ad_data.endereco_completo}")
+                        break
     
-    # Adicionar imóveis com links inválidos (já com N/A preenchido)
-    for prop in properties:
-        link = prop.get("Link", "")
-        if not link or link == "N/A" or not link.startswith("http"):
-            enriched.append(prop)
+        # Data de criação
+        date_span = soup.find('span', {'data-testid': 'listing-created-date'})
+        if isinstance(date_span, Tag):
+            date_text = date_span.get_text(strip=True)
+            created_match = re.search(r'(\d{1,2}/\d{1,2}/\d{4})', date_text)
+            if created_match:
+                ad_data.data_criacao = created_match.group(1)
+            else:
+                ad_data.data_criacao = date_text
     
-    logger.info(f"🔎 Enriquecimento concluído para {len(enriched)} imóveis")
-    return enriched
+    except Exception as e:
+        logger.warning(f"[ENRICH] Erro ao extrair dados do anúncio: {str(e)}", extra=SAMPLED)
+    
+    return ad_data
+
+def deadline_passed(deadline):
+    return deadline is not None and time.monotonic() >= deadline
+
+# --- Cache de detalhes de anúncios ---
+_ad_cache = {}  # link -> (expira_em, DetalhesAnuncio), em ordem de inserção
+_ad_cache_lock = threading.Lock()
+
+def cached_ad_details(links):
+    """Detalhes ainda válidos no cache para os links pedidos"""
+    if AD_CACHE_TTL <= 0:
+        return {}
+    now = time.monotonic()
+    with _ad_cache_lock:
+        found = {}
+        for link in links:
+            entry = _ad_cache.get(link)
+            if entry and entry[0] > now:
+                found[link] = entry[1]
+        return found
+
+def cache_ad_details(details):
+    """Guarda os detalhes extraídos; descarta os mais antigos acima de AD_CACHE_MAX"""
+    if AD_CACHE_TTL <= 0:
+        return
+    expires = time.monotonic() + AD_CACHE_TTL
+    with _ad_cache_lock:
+        for link, ad_data in details.items():
+            if ad_data is not None:
+                _ad_cache.pop(link, None)
+                _ad_cache[link] = (expires, ad_data)
+        while len(_ad_cache) > AD_CACHE_MAX:
+            del _ad_cache[next(iter(_ad_cache))]
+
+# --- Enriquecimento por HTTP ---
+_http_session = None
+_http_session_lock = threading.Lock()
+
+def get_http_session():
+    """Sessão HTTP compartilhada, com pool de conexões keep-alive do tamanho de HTTP_ENRICH_WORKERS"""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+            session = requests.Session()
+            retry = Retry(total=2, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504], allowed_methods=['GET'])
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_ENRICH_WORKERS, max_retries=retry)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update({
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36',
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+                'Accept-Language': 'pt-BR,pt;q=0.9,en;q=0.8',
+            })
+            _http_session = session
+        return _http_session
+
+def needs_browser(ad_data):
+    """Anúncio lido por HTTP que precisa de navegador: página sem as seções estáticas (HTML montado por JS
+    ou bloqueio) ou telefone pedido e ausente"""
+    if ad_data.anunciante is None and ad_data.descricao is None:
+        return True
+    return ENRICH_PHONE and ad_data.telefone is None
+
+def fetch_ad_info_http(links, user_id=None, on_progress=None, report=None, deadline=None, skipped=None):
+    """
+    Lê as páginas de anúncio por HTTP, em paralelo e sem navegador.
+    Retorna ({link: DetalhesAnuncio}, links que precisam de navegador); os links
+    que ficaram sem resposta por falta de tempo vão para o conjunto skipped.
+    """
+    session = get_http_session()
+    total_links = len(links)
+    extracted_data = {}
+    fallback_links = []
+
+    def fetch_single_ad(link):
+        if (user_id and is_scraping_cancelled(user_id)) or deadline_passed(deadline):
+            return link, None
+        timeout = HTTP_TIMEOUT if deadline is None else max(0.5, min(HTTP_TIMEOUT, deadline - time.monotonic()))
+        try:
+            with job_stage(report, 'enrich.http'):
+                response = session.get(link, timeout=timeout)
+                response.raise_for_status()
+            with job_stage(report, 'enrich.parse'):
+                ad_data = parse_ad_details(response.text)
+            return link, ad_data
+        except Exception as e:
+            logger.warning(f"⚠️ [ENRICH] HTTP falhou para {link}: {e}", extra=SAMPLED)
+            return link, None
+
+    max_workers = max(1, min(HTTP_ENRICH_WORKERS, total_links))
+    logger.info(f"🔎 Starting HTTP enrichment with {max_workers} workers for {total_links} links")
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=threading.current_thread().name) as executor:
+        futures = [executor.submit(fetch_single_ad, link) for link in links]
+        for future in as_completed(futures):
+            if user_id and is_scraping_cancelled(user_id):
+                logger.info(f"🚫 Enrichment cancelled for user {user_id} during processing")
+                break
+            link, ad_data = future.result()
+            if ad_data is None and deadline_passed(deadline):
+                # Sem tempo (nem começou, ou o timeout foi cortado pelo prazo): fica pendente, não vai para o navegador
+                if skipped is not None:
+                    skipped.add(link)
+                continue
+            if ad_data is None or needs_browser(ad_data):
+                fallback_links.append(link)
+                METRICS.inc('imobbot_ads_http_total', {'result': 'fallback'})
+                continue
+            extracted_data[link] = ad_data
+            METRICS.inc('imobbot_ads_http_total', {'result': 'ok'})
+            METRICS.inc('imobbot_ads_enriched_total', {'result': 'ok'})
+            if on_progress:
+                on_progress(len(extracted_data), total_links)
+
+    logger.info(f"🔎 HTTP: {len(extracted_data)} anúncios lidos, {len(fallback_links)} para o navegador")
+    return extracted_data, fallback_links
 
-def Extract_ad_info(links, max_workers=6, user_id=None):
+def Extract_ad_info(links, max_workers=6, user_id=None, on_progress=None, report=None, deadline=None, skipped=None):
     """
     Extrai informações detalhadas de múltiplos anúncios usando multi-threading.
     Adaptado do DONE.py para o contexto do bot Telegram com melhor robustez.
@@ -1372,16 +1766,23 @@ def Extract_ad_info(links, max_workers=6, user_id=None):
     
     def extract_single_ad(link):
         """Extrai dados de um único anúncio com melhor tratamento de erros"""
-        logger.info(f"[ENRICH] Iniciando enriquecimento: {link}")
+        logger.debug(f"[ENRICH] Iniciando enriquecimento: {link}")
         
         # Verificar cancelamento
         if user_id and is_scraping_cancelled(user_id):
             logger.info(f"🚫 Enrichment cancelled for user {user_id} during fetch")
-            return link, {
-                'Anunciante': 'N/A', 'Creci': 'N/A', 'Classificacao_Anunciante': 'N/A',
-                'Imoveis_Cadastrados': 'N/A', 'Titulo_Anuncio': 'N/A', 'Codigos_Anuncio': 'N/A',
-                'Descricao': 'N/A', 'Telefone': 'N/A', 'Data_Criacao': 'N/A', 'Endereco_Completo': 'N/A'
-            }
+            return link, None
+        if deadline_passed(deadline):
+            return link, None
+        
+        # Selenium só é carregado quando esta busca realmente usa um navegador
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service as ChromeService
+        from selenium.webdriver.chrome.options import Options as ChromeOptions
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.common.exceptions import TimeoutException
+        from webdriver_manager.chrome import ChromeDriverManager
         
         # Configurações do Chrome mais robustas
         options = ChromeOptions()
@@ -1393,237 +1794,112 @@ def Extract_ad_info(links, max_workers=6, user_id=None):
         options.add_argument("--disable-blink-features=AutomationControlled")
         options.add_argument("--disable-extensions")
         options.add_argument("--disable-plugins")
-        options.add_argument("--disable-images")  # Desabilitar imagens para evitar bugs de foto
-        options.add_argument("--disable-javascript")  # Desabilitar JS desnecessário
         options.add_experimental_option("excludeSwitches", ["enable-automation"])
         options.add_experimental_option('useAutomationExtension', False)
         options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36')
+        options.page_load_strategy = PAGE_LOAD_STRATEGY
         
         driver = None
         try:
-            service = ChromeService(ChromeDriverManager().install())
-            driver = webdriver.Chrome(service=service, options=options)
+            with job_stage(report, 'enrich.browser_start'):
+                service = ChromeService(ChromeDriverManager().install())
+                driver = webdriver.Chrome(service=service, options=options)
+                METRICS.inc('imobbot_browsers_alive')
+                apply_resource_blocking(driver)
             
             # Timeout mais curto para evitar travamentos
             driver.set_page_load_timeout(15)  
-            driver.implicitly_wait(3)
-            
-            driver.get(link)
-            
-            # Aguardar menos tempo para acelerar o processo
-            time.sleep(0.5)
-            html = driver.page_source
             
-            # Parse do HTML para extrair os dados
-            soup = BeautifulSoup(html, 'html.parser')
-            
-            # Inicializa dados do anúncio
-            ad_data = {
-                'Anunciante': 'N/A',
-                'Creci': 'N/A',
-                'Classificacao_Anunciante': 'N/A',
-                'Imoveis_Cadastrados': 'N/A',
-                'Titulo_Anuncio': 'N/A',
-                'Codigos_Anuncio': 'N/A',
-                'Descricao': 'N/A',
-                'Telefone': 'N/A',
-                'Data_Criacao': 'N/A',
-                'Endereco_Completo': 'N/A'
-            }
-            
-            # Extrair dados do anunciante de forma mais robusta
-            try:
-                # Procurar seção do anunciante
-                advertiser_section = soup.find('section', {'data-testid': 'advertiser-info-container'})
-                if isinstance(advertiser_section, Tag):
-                    # Nome do anunciante - tentar múltiplos seletores
-                    name_tag = (advertiser_section.find('a', {'data-testid': 'official-store-redirect-link'}) or
-                               advertiser_section.find('h3') or
-                               advertiser_section.find('span', class_='advertiser-name'))
-                    if isinstance(name_tag, Tag):
-                        ad_data['Anunciante'] = name_tag.get_text(strip=True)
-                    
-                    # Creci - buscar em parágrafos
-                    for p in advertiser_section.find_all('p'):
-                        if isinstance(p, Tag):
-                            text = p.get_text(strip=True)
-                            if 'creci' in text.lower():
-                                ad_data['Creci'] = text
-                                break
-                    
-                    # Avaliação - buscar de forma mais simples
-                    rating_div = advertiser_section.find('div', string=re.compile(r'\d+/\d+'))
-                    if isinstance(rating_div, Tag):
-                        ad_data['Classificacao_Anunciante'] = rating_div.get_text(strip=True)
-                    
-                    # Quantidade de imóveis - buscar números
-                    for element in advertiser_section.find_all(['p', 'span', 'div']):
-                        if isinstance(element, Tag):
-                            text = element.get_text(strip=True)
-                            if 'imóve' in text.lower() or 'propriedade' in text.lower():
-                                numbers = re.search(r'(\d+(?:\.\d+)?)', text)
-                                if numbers:
-                                    ad_data['Imoveis_Cadastrados'] = numbers.group(1)
-                                    break
-            except Exception as e:
-                logger.warning(f"[ENRICH] Erro ao extrair dados do anunciante: {str(e)}")
+            with job_stage(report, 'enrich.navigation'):
+                driver.get(link)
             
-            # Extrair dados do anúncio de forma mais robusta
-            try:
-                # Título - tentar múltiplos seletores
-                title_tag = (soup.find('h1', {'class': 'section-title'}) or
-                            soup.find('h1') or
-                            soup.find('title'))
-                if isinstance(title_tag, Tag):
-                    ad_data['Titulo_Anuncio'] = title_tag.get_text(strip=True)
-                
-                # Códigos do anúncio
-                code_tag = soup.find('p', {'data-cy': 'ldp-propertyCodes-txt'})
-                if isinstance(code_tag, Tag):
-                    ad_data['Codigos_Anuncio'] = code_tag.get_text(strip=True)
-                
-                # Descrição - buscar em seção de descrição
-                desc_section = soup.find('section', {'data-testid': 'description-container'})
-                if isinstance(desc_section, Tag):
-                    desc_tag = desc_section.find('p', {'data-testid': 'description-content'})
-                    if isinstance(desc_tag, Tag):
-                        ad_data['Descricao'] = desc_tag.get_text(strip=True)
-                
-                # Telefone - buscar de forma mais ampla
-                phone_div = soup.find('div', {'data-testid': 'info-phone'})
-                if isinstance(phone_div, Tag):
-                    phone_span = phone_div.find('span')
-                    if isinstance(phone_span, Tag):
-                        ad_data['Telefone'] = phone_span.get_text(strip=True)
-                
-                # Endereço completo com número - buscar pelo seletor específico
-                address_p = None
-                
-                # Tentar múltiplos seletores para encontrar o endereço completo
+            # Espera só as seções lidas pelo parser; anúncios sem alguma delas seguem após AD_WAIT_TIMEOUT
+            with job_stage(report, 'enrich.wait'):
                 try:
-                    # Seletor exato fornecido pelo usuário
-                    address_p = soup.find('p', {
-                        'class': 'l-text l-u-color-neutral-28 l-text--variant-body-regular l-text--weight-bold address-info-value',
-                        'data-testid': 'address-info-value'
-                    })
-                    
-                    if isinstance(address_p, Tag):
-                        address_text = address_p.get_text(strip=True)
-                        if address_text and len(address_text) > 10:
-                            ad_data['Endereco_Completo'] = address_text
-                            logger.info(f"[ENRICH] Endereço completo extraído: {ad_data['Endereco_Completo']}")
-                    
-                    # Se não encontrou, tentar seletor mais simples
-                    if not address_p or ad_data['Endereco_Completo'] == 'N/A':
-                        address_p = soup.find('p', {'data-testid': 'address-info-value'})
-                        if isinstance(address_p, Tag):
-                            address_text = address_p.get_text(strip=True)
-                            if address_text and len(address_text) > 10:
-                                ad_data['Endereco_Completo'] = address_text
-                                logger.info(f"[ENRICH] Endereço completo (fallback): {ad_data['Endereco_Completo']}")
-                    
-                    # Se ainda não encontrou, tentar busca por classe
-                    if not address_p or ad_data['Endereco_Completo'] == 'N/A':
-                        address_p = soup.find('p', {'class': 'address-info-value'})
-                        if isinstance(address_p, Tag):
-                            address_text = address_p.get_text(strip=True)
-                            if address_text and len(address_text) > 10:
-                                ad_data['Endereco_Completo'] = address_text
-                                logger.info(f"[ENRICH] Endereço completo (classe): {ad_data['Endereco_Completo']}")
-                
-                except Exception as e:
-                    logger.warning(f"[ENRICH] Erro ao extrair endereço: {str(e)}")
-                
-                # Se não encontrou com nenhum seletor, tentar busca mais ampla
-                if not address_p or ad_data['Endereco_Completo'] == 'N/A':
-                    # Buscar por qualquer elemento que contenha endereço
-                    for element in soup.find_all(['p', 'div', 'span']):
-                        if isinstance(element, Tag):
-                            text = element.get_text(strip=True)
-                            # Verificar se o texto parece ser um endereço (contém vírgula e números)
-                            if (',' in text and 
-                                any(char.isdigit() for char in text) and 
-                                len(text) > 15 and 
-                                ('rio de janeiro' in text.lower() or 'rj' in text.lower())):
-                                ad_data['Endereco_Completo'] = text
-                                logger.info(f"[ENRICH] Endereço completo (busca ampla): {ad_data['Endereco_Completo']}")
-                                break
-                
-                # Data de criação
-                date_span = soup.find('span', {'data-testid': 'listing-created-date'})
-                if isinstance(date_span, Tag):
-                    date_text = date_span.get_text(strip=True)
-                    created_match = re.search(r'(\d{1,2}/\d{1,2}/\d{4})', date_text)
-                    if created_match:
-                        ad_data['Data_Criacao'] = created_match.group(1)
-                    else:
-                        ad_data['Data_Criacao'] = date_text
-                        
-            except Exception as e:
-                logger.warning(f"[ENRICH] Erro ao extrair dados do anúncio: {str(e)}")
-            
-            logger.info(f"[ENRICH] Sucesso: {link}")
+                    WebDriverWait(driver, AD_WAIT_TIMEOUT, poll_frequency=0.1).until(
+                        lambda d: all(d.find_elements(By.CSS_SELECTOR, selector) for selector in AD_DETAILS_SELECTORS)
+                    )
+                except TimeoutException:
+                    logger.debug(f"[ENRICH] Seções incompletas após {AD_WAIT_TIMEOUT}s: {link}")
+            with job_stage(report, 'enrich.parse'):
+                html = driver.page_source
+                ad_data = parse_ad_details(html)
+            logger.debug(f"[ENRICH] Sucesso: {link}")
+            METRICS.inc('imobbot_ads_enriched_total', {'result': 'ok'})
             return link, ad_data
             
         except Exception as e:
-            logger.error(f"❌ Error extracting data from {link}: {str(e)}")
-            return link, {
-                'Anunciante': 'N/A',
-                'Creci': 'N/A',
-                'Classificacao_Anunciante': 'N/A',
-                'Imoveis_Cadastrados': 'N/A',
-                'Titulo_Anuncio': 'N/A',
-                'Codigos_Anuncio': 'N/A',
-                'Descricao': 'N/A',
-                'Telefone': 'N/A',
-                'Data_Criacao': 'N/A'
-            }
+            logger.error(f"❌ Error extracting data from {link}: {str(e)}", extra=SAMPLED)
+            METRICS.inc('imobbot_ads_enriched_total', {'result': 'error'})
+            return link, None
         finally:
             if driver:
                 try:
                     driver.quit()
                 except:
                     pass
+                METRICS.dec('imobbot_browsers_alive')
             # Delay mais curto para acelerar o processo
             time.sleep(random.uniform(0.2, 0.5))
     
-    # Usa ThreadPoolExecutor para processar múltiplos anúncios simultaneamente
-    # Permitir mais threads para melhor performance, mas com limite de segurança
-    max_workers = min(max_workers, total_links, 4)  # Máximo de 12 workers para PCs potentes
     completed_count = 0
+    skipped = skipped if skipped is not None else set()  # links não visitados por falta de tempo
     
-    logger.info(f"🔎 Starting enrichment with {max_workers} workers for {total_links} links")
-    
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submete todas as tarefas
-        future_to_link = {executor.submit(extract_single_ad, link): link for link in links}
-        
-        # Processa os resultados conforme são concluídos
-        for future in as_completed(future_to_link):
+    if SCRAPER_ENGINE == 'playwright':
+        logger.info(f"🔎 Starting enrichment with Playwright for {total_links} links")
+        seen = set()
+        for link, html in fetch_pages_playwright(
+            links, 'enrich', report, wait_selector=AD_DETAILS_SELECTORS, timeout=15, wait_timeout=AD_WAIT_TIMEOUT, soft_wait=True
+        ):
             if user_id and is_scraping_cancelled(user_id):
                 logger.info(f"🚫 Enrichment cancelled for user {user_id} during processing")
                 break
-                
+            if deadline_passed(deadline):
+                logger.info(f"⏳ Orçamento de enriquecimento esgotado com {completed_count}/{total_links} anúncios")
+                skipped.update(set(links) - seen)
+                break
+            
             completed_count += 1
-            try:
-                link, ad_data = future.result(timeout=30)  # Timeout por thread
-                extracted_data[link] = ad_data
-                logger.info(f"✅ Progresso: {completed_count}/{total_links} - {link[:50]}...")
-            except Exception as e:
-                logger.error(f"❌ Error in enrichment thread: {str(e)}")
-                link = future_to_link[future]
-                extracted_data[link] = {
-                    'Anunciante': 'N/A',
-                    'Creci': 'N/A',
-                    'Classificacao_Anunciante': 'N/A',
-                    'Imoveis_Cadastrados': 'N/A',
-                    'Titulo_Anuncio': 'N/A',
-                    'Codigos_Anuncio': 'N/A',
-                    'Descricao': 'N/A',
-                    'Telefone': 'N/A',
-                    'Data_Criacao': 'N/A',
-                    'Endereco_Completo': 'N/A'
-                }
+            seen.add(link)
+            if html is None:
+                METRICS.inc('imobbot_ads_enriched_total', {'result': 'error'})
+            else:
+                with job_stage(report, 'enrich.parse'):
+                    extracted_data[link] = parse_ad_details(html)
+                METRICS.inc('imobbot_ads_enriched_total', {'result': 'ok'})
+            
+            if on_progress:
+                on_progress(completed_count, total_links)
+    else:
+        # Usa ThreadPoolExecutor para processar múltiplos anúncios simultaneamente
+        # Permitir mais threads para melhor performance, mas com limite de segurança
+        max_workers = min(max_workers, total_links, 4)  # Máximo de 12 workers para PCs potentes
+    
+        logger.info(f"🔎 Starting enrichment with {max_workers} workers for {total_links} links")
+    
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=threading.current_thread().name) as executor:
+            # Submete todas as tarefas
+            future_to_link = {executor.submit(extract_single_ad, link): link for link in links}
+        
+            # Processa os resultados conforme são concluídos
+            for future in as_completed(future_to_link):
+                if user_id and is_scraping_cancelled(user_id):
+                    logger.info(f"🚫 Enrichment cancelled for user {user_id} during processing")
+                    break
+                
+                completed_count += 1
+                try:
+                    link, ad_data = future.result(timeout=30)  # Timeout por thread
+                    if ad_data is not None:
+                        extracted_data[link] = ad_data
+                    elif deadline_passed(deadline):
+                        skipped.add(link)
+                    logger.debug(f"✅ Progresso: {completed_count}/{total_links} - {link[:50]}...")
+                except Exception as e:
+                    logger.error(f"❌ Error in enrichment thread: {str(e)}")
+            
+                if on_progress:
+                    on_progress(completed_count, total_links)
     
     logger.info(f"🔎 Extração concluída! {len(extracted_data)} anúncios processados")
     return extracted_data
@@ -1633,7 +1909,10 @@ def cancel_user_scraping(user_id):
     """Cancela o scraping ativo para um usuário específico"""
     with scraping_lock:
         if user_id in active_scraping_tasks:
-            active_scraping_tasks[user_id]['cancelled'] = True
+            task = active_scraping_tasks[user_id]
+            task['cancelled'] = True
+            if task.get('queued'):
+                task['queued']['cancelled'] = True
             logger.info(f"🚫 Cancelled scraping for user {user_id}")
             return True
         return False
@@ -1645,19 +1924,188 @@ def is_scraping_cancelled(user_id):
             return active_scraping_tasks[user_id]['cancelled']
         return False
 
+def get_active_scraping_task(user_id):
+    """Retorna uma cópia do registro da tarefa do usuário se ela ainda estiver rodando, senão None"""
+    with scraping_lock:
+        task = active_scraping_tasks.get(user_id)
+        if task and task['thread'].is_alive():
+            return dict(task)
+        return None
+
 def register_scraping_task(user_id, thread):
-    """Registra uma nova tarefa de scraping"""
+    """
+    Registra uma nova tarefa de scraping.
+    Recusa (retorna False) se o usuário já tem outra tarefa com a thread viva,
+    para que um mesmo usuário nunca rode duas coletas em paralelo.
+    """
     with scraping_lock:
-        active_scraping_tasks[user_id] = {'cancelled': False, 'thread': thread}
+        existing = active_scraping_tasks.get(user_id)
+        if existing and existing['thread'] is thread:
+            return True
+        if existing and existing['thread'].is_alive():
+            logger.warning(f"⚠️ User {user_id} already has a running scraping task, refusing a new one")
+            return False
+        active_scraping_tasks[user_id] = {'cancelled': False, 'thread': thread, 'queued': None}
         logger.info(f"📝 Registered scraping task for user {user_id}")
+        return True
 
-def unregister_scraping_task(user_id):
-    """Remove o registro de uma tarefa de scraping"""
+def unregister_scraping_task(user_id, thread=None):
+    """
+    Remove o registro de uma tarefa de scraping (apenas se pertencer à thread informada).
+    Se houver uma busca na fila, ela passa a ser a tarefa do usuário.
+    """
     with scraping_lock:
-        if user_id in active_scraping_tasks:
-            del active_scraping_tasks[user_id]
+        task = active_scraping_tasks.get(user_id)
+        if task and (thread is None or task['thread'] is thread):
+            if task.get('queued'):
+                _promote_queued_task(user_id, task['queued'])
+            else:
+                del active_scraping_tasks[user_id]
             logger.info(f"🗑️ Unregistered scraping task for user {user_id}")
 
+def _promote_queued_task(user_id, queued):
+    """Torna a busca da fila a tarefa registrada do usuário (chamar com scraping_lock)"""
+    active_scraping_tasks[user_id] = {'cancelled': queued['cancelled'], 'thread': queued['thread'], 'queued': None}
+
+def queue_scraping_task(user_id, spec, start_waiter):
+    """
+    Coloca uma busca na fila atrás da tarefa atual do usuário, que deve estar cancelada.
+    Cada usuário tem um único lugar na fila: uma confirmação mais nova substitui a busca
+    que aguardava e reaproveita a thread de espera. Só quando a fila estava vazia
+    start_waiter(queued) é chamada para criar e iniciar a thread que aguarda a anterior.
+    Retorna 'queued', 'replaced' ou None se não há mais tarefa a aguardar.
+    """
+    with scraping_lock:
+        task = active_scraping_tasks.get(user_id)
+        if not task or not task['thread'].is_alive():
+            return None
+        if task.get('queued'):
+            task['queued'].update(spec=spec, cancelled=False)
+            logger.info(f"🔁 Replaced queued search for user {user_id}")
+            return 'replaced'
+        queued = {'spec': spec, 'cancelled': False, 'thread': None}
+        # Iniciada sob o lock para que a fila nunca fique com uma thread que ainda não está viva
+        queued['thread'] = start_waiter(queued)
+        task['queued'] = queued
+        logger.info(f"⏳ Queued search for user {user_id} behind the previous one")
+        return 'queued'
+
+def start_queued_task(user_id, queued):
+    """
+    Chamada pela thread de espera quando a tarefa anterior encerra (ou o tempo de espera acaba).
+    Retorna ('start', spec) com a busca a iniciar, ('cancelled', None) se ela foi cancelada
+    ou ('busy', None) se a anterior continua rodando (neste caso a fila é esvaziada).
+    """
+    with scraping_lock:
+        task = active_scraping_tasks.get(user_id)
+        if task and task.get('queued') is queued:
+            if task['thread'].is_alive():
+                task['queued'] = None
+                return 'busy', None
+            _promote_queued_task(user_id, queued)
+        elif not (task and task['thread'] is queued['thread']):
+            return 'cancelled', None
+        # Agora a tarefa registrada é a própria thread de espera
+        task = active_scraping_tasks[user_id]
+        if task['cancelled']:
+            if task.get('queued'):
+                _promote_queued_task(user_id, task['queued'])
+            else:
+                del active_scraping_tasks[user_id]
+            return 'cancelled', None
+        return 'start', queued['spec']
+
+def count_active_scraping_tasks():
+    """Quantidade de coletas registradas com a thread ainda viva"""
+    with scraping_lock:
+        return sum(1 for task in active_scraping_tasks.values() if task['thread'].is_alive())
+
+METRICS.set_callback('imobbot_active_jobs', count_active_scraping_tasks)
+
+# Último resultado em modo rápido de cada usuário, para o /detalhar
+fast_results = {}
+fast_results_lock = threading.Lock()
+
+def store_fast_results(user_id, items, user_data):
+    with fast_results_lock:
+        fast_results[user_id] = {'items': list(items), 'user_data': dict(user_data)}
+
+def get_fast_results(user_id):
+    with fast_results_lock:
+        return fast_results.get(user_id)
+
+# Últimas buscas de cada usuário, para o /repetir; sobrevivem a /start, /r e reinícios do bot
+SEARCH_SPEC_KEYS = (
+    'site', 'local', 'zona', 'bairro', 'bairros_busca', 'cidade', 'cidade_interior', 'bairro_interior',
+    'tipo', 'tipos_busca', 'modalidade', 'Tipo de Transação', 'refinamentos', 'paginas', 'modo',
+)
+search_history = None  # user_id (str) -> buscas, a mais recente primeiro; carregado no primeiro uso
+search_history_lock = threading.Lock()
+
+def _load_search_history():
+    global search_history
+    if search_history is None:
+        try:
+            with open(SEARCH_HISTORY_FILE, encoding='utf-8') as f:
+                search_history = json.load(f)
+        except FileNotFoundError:
+            search_history = {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Não foi possível ler o histórico de buscas {SEARCH_HISTORY_FILE}: {e}")
+            search_history = {}
+    return search_history
+
+def remember_search(user_id, user_data):
+    """Guarda os parâmetros da busca no topo do histórico do usuário (sem repetir a mesma busca)"""
+    spec = {key: user_data[key] for key in SEARCH_SPEC_KEYS if user_data.get(key) is not None}
+    with search_history_lock:
+        history = _load_search_history()
+        previous = [entry for entry in history.get(str(user_id), []) if entry['spec'] != spec]
+        entry = {'spec': spec, 'em': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        history[str(user_id)] = [entry] + previous[:SEARCH_HISTORY_SIZE - 1]
+        # Grava num temporário e troca, para um crash não deixar o arquivo pela metade
+        try:
+            tmp_file = f"{SEARCH_HISTORY_FILE}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(history, f, ensure_ascii=False)
+            os.replace(tmp_file, SEARCH_HISTORY_FILE)
+        except OSError as e:
+            logger.warning(f"⚠️ Não foi possível gravar o histórico de buscas: {e}")
+
+def get_search_history(user_id):
+    with search_history_lock:
+        return list(_load_search_history().get(str(user_id), []))
+
+def search_label(spec):
+    """'Apartamento, Aluguel - Bairro Copacabana, Zona Sul (5 pág.)'"""
+    return (
+        f"{choices_label(spec, 'tipos_busca', 'tipo')}, {spec.get('modalidade', 'N/A')} - "
+        f"{get_local_description(spec)} ({spec.get('paginas', 5)} pág.)"
+    )
+
+def parse_item_selection(args, total):
+    """
+    Converte '1-10', '3,7,12', '2 5 9' ou 'todos' em posições (base 1) válidas,
+    na ordem pedida e sem repetição; None se algum trecho não for entendido
+    """
+    text = ' '.join(args).lower().replace(',', ' ')
+    if text.strip() in ('todos', 'tudo'):
+        return list(range(1, total + 1))
+    positions = []
+    for part in text.split():
+        match = re.fullmatch(r'(\d+)(?:-(\d+))?', part)
+        if not match:
+            return None
+        first = int(match.group(1))
+        last = int(match.group(2) or first)
+        low, high = min(first, last), max(first, last)
+        if high < 1 or low > total:
+            continue
+        # Recorta na lista antes de expandir: '1-999999999' não pode virar um bilhão de números
+        span = range(max(low, 1), min(high, total) + 1)
+        positions.extend(span if first <= last else reversed(span))
+    return list(dict.fromkeys(positions))
+
 async def cancel_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Comando /x - Cancela qualquer operação em andamento"""
     if not update.message:
@@ -1703,6 +2151,396 @@ async def restart_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Chama a função start para reiniciar
     return await start(update, context)
 
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Comando /perfil [user_id] - (admin) perfila a próxima busca do usuário"""
+    if not update.message:
+        return
+    
+    user_id = update.effective_user.id if update.effective_user else 0
+    if user_id not in ADMIN_USER_IDS:
+        logger.info(f"🚫 User {user_id} tried /perfil without admin rights")
+        return
+    
+    target = user_id
+    if context.args:
+        if not context.args[0].isdigit():
+            await update.message.reply_text("Uso: /perfil [user_id]")
+            return
+        target = int(context.args[0])
+    
+    request_profile(target)
+    logger.info(f"🔬 Admin {user_id} requested profiling of the next search of user {target}")
+    await update.message.reply_text(
+        f"🔬 A próxima busca do usuário {target} será perfilada. "
+        f"Os arquivos perfil_<job>.folded/.txt ficam ao lado de {JOB_REPORT_FILE}."
+    )
+
+async def detail_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Comando /detalhar 1-10 - coleta os detalhes de imóveis da última busca em modo rápido"""
+    if not update.message:
+        return
+    
+    user_id = update.effective_user.id if update.effective_user else 0
+    stored = get_fast_results(user_id)
+    if not stored:
+        await update.message.reply_text(
+            "ℹ️ Não há busca em modo rápido para detalhar. Faça uma busca com /start e escolha o modo rápido."
+        )
+        return
+    
+    items = stored['items']
+    positions = parse_item_selection(context.args or [], len(items))
+    if not positions:
+        await update.message.reply_text(
+            f"Uso: /detalhar 1-10, /detalhar 3,7,12 ou /detalhar todos\n\n"
+            f"Os números são os da coluna Nº da planilha (1 a {len(items)})."
+        )
+        return
+    if len(positions) > DETALHAR_MAX:
+        await update.message.reply_text(f"⚠️ Vou detalhar os primeiros {DETALHAR_MAX} imóveis da seleção.")
+        positions = positions[:DETALHAR_MAX]
+    
+    existing = get_active_scraping_task(user_id)
+    if existing and not existing['cancelled']:
+        await update.message.reply_text(
+            "⚠️ Você já tem uma busca em andamento.\n\n"
+            "Aguarde ela terminar ou use /x para cancelá-la."
+        )
+        return
+    
+    logger.info(f"🔎 User {user_id} requested details for {len(positions)} items")
+    await update.message.reply_text(f"🔎 Coletando os detalhes de {len(positions)} imóveis...")
+    selected = [(n, items[n - 1]) for n in positions]
+    thread = threading.Thread(
+        target=run_details_and_send,
+        args=(update, asyncio.get_event_loop(), selected, stored['user_data']),
+        name=job_thread_name(user_id)
+    )
+    if not register_scraping_task(user_id, thread):
+        await update.message.reply_text("⚠️ A busca anterior ainda está terminando. Tente novamente em instantes.")
+        return
+    thread.start()
+
+async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Comando /buscar <busca> - monta a busca inteira a partir de uma mensagem e já inicia a coleta"""
+    if not update.message:
+        return ConversationHandler.END
+    
+    user_id = update.effective_user.id if update.effective_user else 0
+    query = ' '.join(context.args or [])
+    logger.info(f"🔎 User {user_id} one-shot search: {query}")
+    if not query:
+        await update.message.reply_text(
+            f"Uso: /buscar <tipo> <aluguel|venda> <local> [filtros] [páginas] [site] [rápido]\n\n"
+            f"Exemplo: {BUSCAR_EXEMPLO}"
+        )
+        return ConversationHandler.END
+    
+    if rejects_new_search(get_active_scraping_task(user_id)):
+        await update.message.reply_text(DUPLICATE_JOB_MESSAGE)
+        logger.info(f"⚠️ Rejected one-shot search for user {user_id}: search already running")
+        return ConversationHandler.END
+    
+    user_data, erros, ignorados = parse_search_query(query)
+    if erros:
+        await update.message.reply_text(
+            "🤔 Faltou ou não entendi: " + "; ".join(erros) + ".\n\n"
+            f"Exemplo: {BUSCAR_EXEMPLO}\n\nOu use /start para a busca passo a passo."
+        )
+        logger.info(f"❌ User {user_id} one-shot search rejected: {erros}")
+        return ConversationHandler.END
+    
+    # Mesmo estado que a conversa deixaria ao confirmar
+    if isinstance(context.user_data, dict):
+        context.user_data.clear()
+        context.user_data.update(user_data)
+    resumo = search_summary(user_data)
+    if ignorados:
+        resumo += f"⚠️ Ignorei: {', '.join(ignorados)}\n\n"
+    await update.message.reply_text(resumo + "Iniciando a coleta. Isso pode levar alguns minutos...")
+    return await launch_search(update, context, dict(user_data))
+
+async def repeat_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Comando /repetir [n] - repete a última busca (ou a n-ésima do histórico) sem passar pela conversa"""
+    if not update.message:
+        return ConversationHandler.END
+    
+    user_id = update.effective_user.id if update.effective_user else 0
+    history = get_search_history(user_id)
+    if not history:
+        await update.message.reply_text(
+            "ℹ️ Você ainda não fez nenhuma busca. Use /start ou /buscar para começar."
+        )
+        return ConversationHandler.END
+    
+    args = context.args or []
+    position = int(args[0]) if len(args) == 1 and args[0].isdigit() else (1 if not args else 0)
+    if not 1 <= position <= len(history):
+        opcoes = '\n'.join(
+            f"{i + 1}. {search_label(entry['spec'])} - {entry['em'].replace('T', ' ')[:16]}"
+            for i, entry in enumerate(history)
+        )
+        await update.message.reply_text(
+            f"🕘 Suas últimas buscas:\n\n{opcoes}\n\n"
+            f"Use /repetir para a mais recente ou /repetir <número>."
+        )
+        return ConversationHandler.END
+    
+    if rejects_new_search(get_active_scraping_task(user_id)):
+        await update.message.reply_text(DUPLICATE_JOB_MESSAGE)
+        logger.info(f"⚠️ Rejected repeated search for user {user_id}: search already running")
+        return ConversationHandler.END
+    
+    user_data = dict(history[position - 1]['spec'])
+    logger.info(f"🔁 User {user_id} repeating search #{position}: {user_data}")
+    # Mesmo estado que a conversa deixaria ao confirmar
+    if isinstance(context.user_data, dict):
+        context.user_data.clear()
+        context.user_data.update(user_data)
+    await update.message.reply_text(
+        search_summary(user_data) + "🔁 Repetindo a busca. Isso pode levar alguns minutos..."
+    )
+    return await launch_search(update, context, user_data)
+
+def split_choices(text, index):
+    """
+    Quebra uma resposta com várias escolhas ('1, 3 5', 'Botafogo, Flamengo ou Laranjeiras')
+    em trechos; nomes que já contêm ' e ' ('Vinte e Cinco de Agosto') ficam inteiros
+    """
+    parts = []
+    for chunk in re.split(r'[,;/]', text):
+        chunk = chunk.strip()
+        if not chunk:
+            continue
+        if re.fullmatch(r'[\d\s]+', chunk):
+            parts.extend(chunk.split())
+            continue
+        best = index.search(chunk, limit=1)
+        if best and best[0][1] == 1.0:
+            parts.append(chunk)
+            continue
+        parts.extend(piece for piece in re.split(r'\s+(?:e|ou)\s+', chunk, flags=re.IGNORECASE) if piece.strip())
+    return parts
+
+def resolve_choices(text, options, index):
+    """
+    Uma ou várias escolhas pelo número da lista ou pelo nome.
+    Retorna (escolhidos, trecho não reconhecido ou None, sugestões para esse trecho)
+    """
+    chosen = []
+    for part in split_choices(text, index):
+        if part.isdigit():
+            position = int(part) - 1
+            if not 0 <= position < len(options):
+                return chosen, part, []
+            name = options[position]
+        else:
+            name, suggestions = index.resolve(part)
+            if name is None:
+                return chosen, part, suggestions
+        if name not in chosen:
+            chosen.append(name)
+    return chosen, (None if chosen else text), []
+
+def choices_label(user_data, list_key, key):
+    """'Botafogo, Flamengo' para buscas com várias escolhas, ou o valor único"""
+    return ', '.join(user_data.get(list_key) or [user_data.get(key) or 'N/A'])
+
+# --- Busca numa mensagem só (/buscar) ---
+BUSCAR_EXEMPLO = "/buscar apartamento aluguel copacabana até 4 mil 2 quartos 5 páginas ambos"
+QUERY_WORDS = {
+    'viva': ('site', 'viva'), 'vivareal': ('site', 'viva'), 'zap': ('site', 'zap'), 'ambos': ('site', 'ambos'),
+    'aluguel': ('modalidade', 'Aluguel'), 'alugar': ('modalidade', 'Aluguel'), 'locacao': ('modalidade', 'Aluguel'),
+    'venda': ('modalidade', 'Venda'), 'comprar': ('modalidade', 'Venda'), 'compra': ('modalidade', 'Venda'),
+    'rapido': ('modo', 'rapido'), 'completo': ('modo', 'completo'),
+    'estado': ('estado', True), 'rj': ('estado', True),
+}
+QUERY_FILLER = {
+    'a', 'o', 'e', 'ou', 'de', 'da', 'do', 'das', 'dos', 'em', 'no', 'na', 'nos', 'nas', 'com', 'para', 'pra',
+    'ate', 'real', 'imoveis', 'imovel', 'site', 'sites', 'todo', 'toda', 'modo', 'bairro', 'bairros', 'cidade',
+}
+_AMOUNT = r'(?:r\$\s*)?(\d[\d.,]*)\s*(?:(mil|k|milhoes|milhao|mi)\b)?\s*(m2|m²|metros?(?:\s+quadrados)?)?'
+_QUERY_COUNT_RE = re.compile(r'\b(\d+)\s*\+?\s*(quartos?|qtos?|dorms?|dormitorios?|banheiros?|vagas?|paginas?|pags?)\b')
+_QUERY_RANGE_RE = re.compile(rf'\bentre\s+{_AMOUNT}\s+e\s+{_AMOUNT}')
+_QUERY_MAX_RE = re.compile(rf'\b(?:ate|no maximo|maximo|max|abaixo de|menos de)\s+{_AMOUNT}')
+_QUERY_MIN_RE = re.compile(rf'\b(?:acima de|mais de|a partir de|pelo menos|no minimo|minimo|min|desde)\s+{_AMOUNT}')
+_QUERY_COUNT_KEYS = {'q': 'min_quartos', 'd': 'min_quartos', 'b': 'min_banheiros', 'v': 'min_vagas', 'p': 'paginas'}
+
+def _query_amount(number, unit):
+    """'4' + 'mil' -> 4000, '4.500' -> 4500, '1,5' + 'mi' -> 1500000"""
+    number = number.rstrip('.,')
+    if not unit and re.fullmatch(r'\d{1,3}([.,]\d{3})+', number):
+        number = re.sub(r'[.,]', '', number)
+    value = float(number.replace(',', '.')) if number.count(',') + number.count('.') <= 1 else float(re.sub(r'[.,]', '', number))
+    if unit in ('mil', 'k'):
+        value *= 1_000
+    elif unit:
+        value *= 1_000_000
+    return int(round(value))
+
+def parse_search_query(text):
+    """
+    Interpreta uma busca escrita numa linha só ('apartamento aluguel copacabana até 4 mil
+    2 quartos 5 páginas ambos') sem consultar o GPT, preenchendo as mesmas chaves de
+    user_data que a conversa passo a passo.
+    Retorna (user_data, erros, palavras ignoradas); com erros a busca não deve começar.
+    """
+    query = unicodedata.normalize('NFD', text.lower())
+    query = ''.join(c for c in query if unicodedata.category(c) != 'Mn')
+    refinamentos = {}
+    paginas = None
+    
+    # Números primeiro: contagens ('2 quartos', '5 páginas') e faixas de preço/área
+    for match in _QUERY_COUNT_RE.finditer(query):
+        key = _QUERY_COUNT_KEYS[match.group(2)[0]]
+        if key == 'paginas':
+            paginas = int(match.group(1))
+        else:
+            refinamentos[key] = int(match.group(1))
+    query = _QUERY_COUNT_RE.sub(' ', query)
+    for match in _QUERY_RANGE_RE.finditer(query):
+        # 'entre 300 e 500 mil': a unidade do segundo valor vale para os dois
+        area = match.group(3) or match.group(6)
+        refinamentos['min_area' if area else 'min_preco'] = _query_amount(match.group(1), match.group(2) or match.group(5))
+        refinamentos['max_area' if area else 'max_preco'] = _query_amount(match.group(4), match.group(5))
+    query = _QUERY_RANGE_RE.sub(' ', query)
+    for pattern, prefix in ((_QUERY_MAX_RE, 'max'), (_QUERY_MIN_RE, 'min')):
+        for match in pattern.finditer(query):
+            key = f"{prefix}_area" if match.group(3) else f"{prefix}_preco"
+            refinamentos[key] = _query_amount(match.group(1), match.group(2))
+        query = pattern.sub(' ', query)
+    
+    # Palavras: opções fixas e nomes conhecidos, do trecho mais longo para o mais curto
+    found = {'tipos': [], 'zonas': [], 'bairros': [], 'cidades': []}
+    options = {}
+    runs = [[]]
+    words = re.findall(r'\w+', query)
+    i = 0
+    while i < len(words):
+        for size in range(min(6, len(words) - i), 0, -1):
+            window = ' '.join(words[i:i + size])
+            if size == 1 and window in QUERY_WORDS:
+                key, value = QUERY_WORDS[window]
+                options[key] = value
+                break
+            for kind, index in (('tipos', TIPOS_INDEX), ('zonas', ZONAS_INDEX), ('bairros', BAIRROS_CAPITAL_INDEX), ('cidades', CIDADES_INDEX)):
+                name = index.exact(window)
+                if name:
+                    found[kind].append(name)
+                    break
+            else:
+                continue
+            break
+        else:
+            runs[-1].append(words[i])
+            i += 1
+            continue
+        runs.append([])
+        i += size
+    
+    def cities():
+        cidades = list(dict.fromkeys(found['cidades']))
+        if 'Rio de Janeiro' in cidades and (found['bairros'] or found['zonas'] or len(cidades) > 1):
+            cidades.remove('Rio de Janeiro')
+        return cidades
+    
+    cidades = cities()
+    cidade_index = BAIRROS_INTERIOR_INDEX.get(cidades[0]) if len(cidades) == 1 else None
+    if cidade_index:
+        # 'Centro' também é bairro da capital: com uma cidade do interior, vale o bairro dela
+        found['bairros_interior'] = [cidade_index.exact(bairro) for bairro in found['bairros'] if cidade_index.exact(bairro)]
+        found['bairros'] = [bairro for bairro in found['bairros'] if not cidade_index.exact(bairro)]
+    fuzzy = [
+        ('tipos', TIPOS_INDEX),
+        ('bairros_interior', cidade_index) if cidade_index else ('bairros', BAIRROS_CAPITAL_INDEX),
+        ('cidades', CIDADES_INDEX),
+    ]
+    
+    def resolve_fuzzy(candidate):
+        for kind, index in fuzzy:
+            name, _ = index.resolve(candidate)
+            if name:
+                found.setdefault(kind, []).append(name)
+                return True
+        return False
+    
+    # O que sobrou: nomes com erro de digitação, o trecho inteiro ('barra da tijuka') e depois palavra a palavra
+    ignorados = []
+    for run in runs:
+        while run and run[0] in QUERY_FILLER:
+            run.pop(0)
+        while run and run[-1] in QUERY_FILLER:
+            run.pop()
+        palavras = [word for word in run if word not in QUERY_FILLER]
+        if len(palavras) > 1 and resolve_fuzzy(' '.join(run)):
+            continue
+        for word in palavras:
+            if len(word) < 4 or word.isdigit() or not resolve_fuzzy(word):
+                ignorados.append(word)
+    cidades = cities()
+    
+    user_data = {
+        'site': options.get('site', 'viva'),
+        'paginas': 5 if paginas is None else paginas,
+        'modo': options.get('modo', 'completo'),
+        'refinamentos': refinamentos,
+    }
+    erros = []
+    tipos = list(dict.fromkeys(found['tipos']))
+    if tipos:
+        user_data['tipo'] = tipos[0]
+        user_data['tipos_busca'] = tipos
+    else:
+        erros.append("o tipo de imóvel (ex: apartamento, casa)")
+    if options.get('modalidade'):
+        user_data['modalidade'] = user_data['Tipo de Transação'] = options['modalidade']
+    else:
+        erros.append("aluguel ou venda")
+    
+    bairros = list(dict.fromkeys(found['bairros']))
+    bairros_interior = list(dict.fromkeys(found.get('bairros_interior', [])))
+    zonas = list(dict.fromkeys(found['zonas'] + [ZONA_DO_BAIRRO[bairro] for bairro in bairros]))
+    if len(cidades) > 1:
+        erros.append(f"uma cidade só (encontrei {', '.join(cidades)})")
+    elif cidades and (bairros or zonas):
+        erros.append(f"bairros da capital ou a cidade {cidades[0]}, não os dois")
+    elif bairros_interior:
+        user_data.update({
+            'local': 'bairro_interior', 'cidade': cidades[0], 'cidade_interior': cidades[0],
+            'bairro': bairros_interior[0], 'bairro_interior': bairros_interior[0], 'bairros_busca': bairros_interior,
+        })
+    elif cidades:
+        user_data.update({'local': 'cidade', 'cidade': cidades[0]})
+    elif len(zonas) > 1:
+        erros.append(f"uma zona só (encontrei bairros ou zonas da {' e da '.join(zonas)})")
+    elif bairros:
+        user_data.update({'local': 'bairro', 'zona': zonas[0], 'bairro': bairros[0], 'bairros_busca': bairros})
+    elif zonas:
+        user_data.update({'local': 'zona', 'zona': zonas[0]})
+    elif options.get('estado'):
+        user_data['local'] = 'todo_estado'
+    else:
+        erros.append("onde buscar: bairro, zona, cidade ou 'estado'")
+    
+    if not 1 <= user_data['paginas'] <= 20:
+        erros.append("entre 1 e 20 páginas")
+    combinacoes = len(tipos or [None]) * len(user_data.get('bairros_busca') or [None])
+    if combinacoes > MAX_SEARCH_COMBINATIONS:
+        erros.append(f"no máximo {MAX_SEARCH_COMBINATIONS} combinações de bairro e tipo (pedidas: {combinacoes})")
+    return user_data, erros, ignorados
+
+async def reply_name_suggestions(update, user_choice, suggestions):
+    """Oferece até 3 nomes parecidos com o digitado como botões; retorna False se não houver sugestões"""
+    if not suggestions:
+        return False
+    opcoes = '\n'.join(f"• {nome}" for nome in suggestions)
+    await update.message.reply_text(
+        f"🤔 Não encontrei \"{user_choice}\". Você quis dizer:\n\n{opcoes}\n\n"
+        f"Toque numa opção, digite o nome ou responda o número da lista.",
+        reply_markup=ReplyKeyboardMarkup([[nome] for nome in suggestions], one_time_keyboard=True, resize_keyboard=True)
+    )
+    return True
+
 # --- Telegram Bot Handlers ---
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not update.message:
@@ -1718,7 +2556,9 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     welcome_message = (
         " 🤖 Bem-vindo ao ImobBot!\n\n"
         "Vou te ajudar a encontrar imóveis no Rio de Janeiro através do Viva Real e Zap Imóveis.\n\n"
-        "• Use /start - Cancela e reinicia uma nova busca\n\n"
+        "• Use /start - Cancela e reinicia uma nova busca\n"
+        f"• Ou busque numa mensagem só: {BUSCAR_EXEMPLO}\n"
+        "• Use /repetir para refazer sua última busca\n\n"
         "Primeiro, escolha qual site você quer usar:\n\n"
         "1️⃣ Viva Real\n"
         "2️⃣ Zap Imóveis\n"
@@ -1825,7 +2665,7 @@ async def escolha_local(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(
             f"**PARTE 2:**\n\n"
             f"{cidades_str2}\n\n"
-            f"*Responda apenas o número da cidade desejada.*"
+            f"*Responda o número ou o nome da cidade desejada.*"
         )
         
         logger.info(f"📤 Sent complete city list to user {user_id}")
@@ -1874,7 +2714,7 @@ async def escolha_local(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(
             f"**PARTE 2:**\n\n"
             f"{cidades_str2}\n\n"
-            f"*Responda apenas o número da cidade desejada.*"
+            f"*Responda o número ou o nome da cidade desejada.*"
         )
         
         logger.info(f"📤 Sent interior cities list to user {user_id}")
@@ -1909,7 +2749,7 @@ async def escolha_zona(update: Update, context: ContextTypes.DEFAULT_TYPE):
         bairros = ZONAS_RJ[zona]
         bairros_str = '\n'.join(f"{i+1}. {b}" for i, b in enumerate(bairros))
         pergunta = gpt4o_ask(
-            f"O usuário escolheu a zona '{zona}'. Pergunte se ele deseja buscar em algum bairro específico, mostrando as opções:\n{bairros_str}\nPeça para responder o número do bairro ou '0' para buscar em toda a zona."
+            f"O usuário escolheu a zona '{zona}'. Pergunte se ele deseja buscar em algum bairro específico, mostrando as opções:\n{bairros_str}\nPeça para responder o número ou o nome do bairro (ou vários, separados por vírgula), ou '0' para buscar em toda a zona."
         )
         await update.message.reply_text(pergunta)
         logger.info(f"📤 Sent to user {user_id}: {pergunta[:100]}...")
@@ -1935,22 +2775,30 @@ async def escolha_bairro(update: Update, context: ContextTypes.DEFAULT_TYPE):
         context.user_data['local'] = 'zona'
         logger.info(f"📍 User {user_id} selected: entire zone")
         return await pergunta_tipo(update, context)
-    try:
-        bairros = context.user_data.get('bairros', [])
-        if not isinstance(bairros, list):
-            return ConversationHandler.END
-        idx = int(txt) - 1
-        if idx < 0 or idx >= len(bairros):
-            raise Exception
-        bairro = bairros[idx]
-        context.user_data['bairro'] = bairro
-        context.user_data['local'] = 'bairro'
-        logger.info(f"📍 User {user_id} selected neighborhood: {bairro}")
-        return await pergunta_tipo(update, context)
-    except:
-        await update.message.reply_text("Escolha inválida. Responda o número do bairro ou 0 para toda a zona.")
-        logger.info(f"❌ User {user_id} gave invalid neighborhood choice: {user_choice}")
+    bairros = context.user_data.get('bairros', [])
+    if not isinstance(bairros, list):
+        return ConversationHandler.END
+    # Número(s) da lista ou nome(s) digitado(s), aceitando erros de digitação
+    index = BAIRROS_ZONA_INDEX.get(context.user_data.get('zona')) or NameIndex(bairros)
+    escolhidos, invalido, sugestoes = resolve_choices(txt, bairros, index)
+    if invalido is not None:
+        if not await reply_name_suggestions(update, invalido, sugestoes):
+            await update.message.reply_text("Escolha inválida. Responda o número ou o nome do bairro (ou vários, separados por vírgula), ou 0 para toda a zona.")
+        logger.info(f"❌ User {user_id} gave invalid neighborhood choice: {user_choice} (suggested: {sugestoes})")
+        return ESCOLHA_BAIRRO
+    if len(escolhidos) > MAX_SEARCH_COMBINATIONS:
+        await update.message.reply_text(
+            f"⚠️ Você escolheu {len(escolhidos)} bairros; o máximo é {MAX_SEARCH_COMBINATIONS}. "
+            f"Escolha menos bairros ou 0 para toda a zona."
+        )
         return ESCOLHA_BAIRRO
+    context.user_data['bairro'] = escolhidos[0]
+    context.user_data['bairros_busca'] = escolhidos
+    context.user_data['local'] = 'bairro'
+    logger.info(f"📍 User {user_id} selected neighborhood(s): {escolhidos}")
+    if len(escolhidos) > 1:
+        await update.message.reply_text(f"✅ Bairros selecionados: {', '.join(escolhidos)}")
+    return await pergunta_tipo(update, context)
 
 async def escolha_cidade(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not update.message or not isinstance(update.message.text, str) or not update.message.text:
@@ -1988,21 +2836,22 @@ async def escolha_cidade(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return await pergunta_tipo(update, context)
         
     except ValueError:
-        # Se não conseguiu interpretar como número, tentar como nome exato
-        cidade = user_choice
-        if cidade not in CIDADES_RJ:
+        # Se não conseguiu interpretar como número, tentar pelo nome (aceita erros de digitação)
+        cidade, sugestoes = CIDADES_INDEX.resolve(user_choice)
+        if cidade is None:
             total_cidades = len(CIDADES_RJ)
-            await update.message.reply_text(
-                f"❌ Opção inválida. Por favor, responda com o **número** da cidade desejada "
-                f"(entre 1 e {total_cidades}), conforme mostrado na lista acima.\n\n"
-                f"Ou digite o nome exato da cidade."
-            )
-            logger.info(f"❌ User {user_id} gave invalid city choice: {user_choice} (Total cities: {total_cidades})")
+            if not await reply_name_suggestions(update, user_choice, sugestoes):
+                await update.message.reply_text(
+                    f"❌ Opção inválida. Por favor, responda com o **número** da cidade desejada "
+                    f"(entre 1 e {total_cidades}), conforme mostrado na lista acima.\n\n"
+                    f"Ou digite o nome da cidade."
+                )
+            logger.info(f"❌ User {user_id} gave invalid city choice: {user_choice} (Total cities: {total_cidades}, suggested: {sugestoes})")
             return ESCOLHA_CIDADE
         
-        # Se encontrou por nome exato
+        # Se encontrou pelo nome
         context.user_data['cidade'] = cidade
-        logger.info(f"📍 User {user_id} selected city by name: {cidade}")
+        logger.info(f"📍 User {user_id} selected city by name: {cidade} (typed: {user_choice})")
         
         await update.message.reply_text(f"✅ Cidade selecionada: **{cidade}**")
         return await pergunta_tipo(update, context)
@@ -2089,12 +2938,12 @@ async def escolha_cidade_interior(update: Update, context: ContextTypes.DEFAULT_
                 f"🏘️ Bairros de **{cidade_interior}** - PARTE 1:\n\n{bairros_str1}\n\n*Continua na próxima mensagem...*"
             )
             await update.message.reply_text(
-                f"🏘️ Bairros de **{cidade_interior}** - PARTE 2:\n\n{bairros_str2}\n\n*Responda o número do bairro desejado.*"
+                f"🏘️ Bairros de **{cidade_interior}** - PARTE 2:\n\n{bairros_str2}\n\n*Responda o número ou o nome do bairro desejado (ou vários, separados por vírgula).*"
             )
         else:
             bairros_str = '\n'.join(f"{i+1}. {b}" for i, b in enumerate(bairros_cidade))
             await update.message.reply_text(
-                f"🏘️ Bairros de **{cidade_interior}**:\n\n{bairros_str}\n\n*Responda o número do bairro desejado.*"
+                f"🏘️ Bairros de **{cidade_interior}**:\n\n{bairros_str}\n\n*Responda o número ou o nome do bairro desejado (ou vários, separados por vírgula).*"
             )
         
         logger.info(f"📤 Sent neighborhoods list for {cidade_interior} to user {user_id}")
@@ -2102,21 +2951,22 @@ async def escolha_cidade_interior(update: Update, context: ContextTypes.DEFAULT_
         return ESCOLHA_BAIRRO_INTERIOR
         
     except ValueError:
-        # Se não conseguiu interpretar como número, tentar como nome exato
-        cidade_interior = user_choice
-        if cidade_interior not in CIDADES_INTERIOR_BAIRROS:
-            total_cidades = len(cidades_interior)
-            await update.message.reply_text(
-                f"❌ Opção inválida. Por favor, responda com o **número** da cidade desejada "
-                f"(entre 1 e {total_cidades}), conforme mostrado na lista acima.\n\n"
-                f"Ou digite o nome exato da cidade."
-            )
-            logger.info(f"❌ User {user_id} gave invalid interior city choice: {user_choice}")
+        # Se não conseguiu interpretar como número, tentar pelo nome (aceita erros de digitação)
+        cidade_interior, sugestoes = CIDADES_INTERIOR_INDEX.resolve(user_choice)
+        if cidade_interior is None:
+            total_cidades = len(cidades_interior)
+            if not await reply_name_suggestions(update, user_choice, sugestoes):
+                await update.message.reply_text(
+                    f"❌ Opção inválida. Por favor, responda com o **número** da cidade desejada "
+                    f"(entre 1 e {total_cidades}), conforme mostrado na lista acima.\n\n"
+                    f"Ou digite o nome da cidade."
+                )
+            logger.info(f"❌ User {user_id} gave invalid interior city choice: {user_choice} (suggested: {sugestoes})")
             return ESCOLHA_CIDADE_INTERIOR
         
-        # Se encontrou por nome exato
+        # Se encontrou pelo nome
         context.user_data['cidade_interior'] = cidade_interior
-        logger.info(f"📍 User {user_id} selected interior city by name: {cidade_interior}")
+        logger.info(f"📍 User {user_id} selected interior city by name: {cidade_interior} (typed: {user_choice})")
         
         # Buscar bairros da cidade selecionada
         bairros_cidade = CIDADES_INTERIOR_BAIRROS.get(cidade_interior, [])
@@ -2140,12 +2990,12 @@ async def escolha_cidade_interior(update: Update, context: ContextTypes.DEFAULT_
                 f"🏘️ Bairros de **{cidade_interior}** - PARTE 1:\n\n{bairros_str1}\n\n*Continua na próxima mensagem...*"
             )
             await update.message.reply_text(
-                f"🏘️ Bairros de **{cidade_interior}** - PARTE 2:\n\n{bairros_str2}\n\n*Responda o número do bairro desejado.*"
+                f"🏘️ Bairros de **{cidade_interior}** - PARTE 2:\n\n{bairros_str2}\n\n*Responda o número ou o nome do bairro desejado (ou vários, separados por vírgula).*"
             )
         else:
             bairros_str = '\n'.join(f"{i+1}. {b}" for i, b in enumerate(bairros_cidade))
             await update.message.reply_text(
-                f"🏘️ Bairros de **{cidade_interior}**:\n\n{bairros_str}\n\n*Responda o número do bairro desejado.*"
+                f"🏘️ Bairros de **{cidade_interior}**:\n\n{bairros_str}\n\n*Responda o número ou o nome do bairro desejado (ou vários, separados por vírgula).*"
             )
         
         logger.info(f"📤 Sent neighborhoods list for {cidade_interior} to user {user_id}")
@@ -2162,58 +3012,47 @@ async def escolha_bairro_interior(update: Update, context: ContextTypes.DEFAULT_
     user_choice = update.message.text.strip()
     logger.info(f"👤 User {user_id} chose interior neighborhood: {user_choice}")
     
-    try:
-        # Tentar interpretar como número
-        bairros_cidade = context.user_data.get('bairros_cidade_interior', [])
-        if not isinstance(bairros_cidade, list):
-            return ConversationHandler.END
-        
-        # Debug: verificar se a lista está vazia
-        if len(bairros_cidade) == 0:
-            await update.message.reply_text(
-                "❌ Lista de bairros não disponível. Use /restart para tentar novamente."
-            )
-            logger.error(f"❌ Empty neighborhoods list for user {user_id}")
-            return ConversationHandler.END
-        
-        idx = int(user_choice) - 1
-        if idx < 0 or idx >= len(bairros_cidade):
-            raise ValueError("Índice fora do range")
-        
-        bairro_interior = bairros_cidade[idx]
-        context.user_data['bairro_interior'] = bairro_interior
-        context.user_data['local'] = 'bairro_interior'
-        context.user_data['cidade'] = context.user_data.get('cidade_interior')
-        context.user_data['bairro'] = bairro_interior
-        logger.info(f"📍 User {user_id} selected interior neighborhood: {bairro_interior}")
-        
-        cidade_interior = context.user_data.get('cidade_interior', 'N/A')
-        await update.message.reply_text(f"✅ Selecionado: **{bairro_interior}**, {cidade_interior}")
-        return await pergunta_tipo(update, context)
-        
-    except ValueError:
-        # Se não conseguiu interpretar como número, tentar como nome exato
-        bairro_interior = user_choice
-        if bairro_interior not in bairros_cidade:
-            total_bairros = len(bairros_cidade)
+    bairros_cidade = context.user_data.get('bairros_cidade_interior', [])
+    if not isinstance(bairros_cidade, list):
+        return ConversationHandler.END
+
+    # Debug: verificar se a lista está vazia
+    if len(bairros_cidade) == 0:
+        await update.message.reply_text(
+            "❌ Lista de bairros não disponível. Use /restart para tentar novamente."
+        )
+        logger.error(f"❌ Empty neighborhoods list for user {user_id}")
+        return ConversationHandler.END
+
+    # Número(s) da lista ou nome(s) digitado(s), aceitando erros de digitação
+    index = BAIRROS_INTERIOR_INDEX.get(context.user_data.get('cidade_interior')) or NameIndex(bairros_cidade)
+    escolhidos, invalido, sugestoes = resolve_choices(user_choice, bairros_cidade, index)
+    if invalido is not None:
+        total_bairros = len(bairros_cidade)
+        if not await reply_name_suggestions(update, invalido, sugestoes):
             await update.message.reply_text(
                 f"❌ Opção inválida. Por favor, responda com o **número** do bairro desejado "
                 f"(entre 1 e {total_bairros}), conforme mostrado na lista acima.\n\n"
-                f"Ou digite o nome exato do bairro."
+                f"Ou digite o nome do bairro (ou vários, separados por vírgula)."
             )
-            logger.info(f"❌ User {user_id} gave invalid interior neighborhood choice: {user_choice}")
-            return ESCOLHA_BAIRRO_INTERIOR
-        
-        # Se encontrou por nome exato
-        context.user_data['bairro_interior'] = bairro_interior
-        context.user_data['local'] = 'bairro_interior'
-        context.user_data['cidade'] = context.user_data.get('cidade_interior')
-        context.user_data['bairro'] = bairro_interior
-        logger.info(f"📍 User {user_id} selected interior neighborhood by name: {bairro_interior}")
-        
-        cidade_interior = context.user_data.get('cidade_interior', 'N/A')
-        await update.message.reply_text(f"✅ Selecionado: **{bairro_interior}**, {cidade_interior}")
-        return await pergunta_tipo(update, context)
+        logger.info(f"❌ User {user_id} gave invalid interior neighborhood choice: {user_choice} (suggested: {sugestoes})")
+        return ESCOLHA_BAIRRO_INTERIOR
+    if len(escolhidos) > MAX_SEARCH_COMBINATIONS:
+        await update.message.reply_text(
+            f"⚠️ Você escolheu {len(escolhidos)} bairros; o máximo é {MAX_SEARCH_COMBINATIONS}. Escolha menos bairros."
+        )
+        return ESCOLHA_BAIRRO_INTERIOR
+
+    context.user_data['bairro_interior'] = escolhidos[0]
+    context.user_data['local'] = 'bairro_interior'
+    context.user_data['cidade'] = context.user_data.get('cidade_interior')
+    context.user_data['bairro'] = escolhidos[0]
+    context.user_data['bairros_busca'] = escolhidos
+    logger.info(f"📍 User {user_id} selected interior neighborhood(s): {escolhidos} (typed: {user_choice})")
+
+    cidade_interior = context.user_data.get('cidade_interior', 'N/A')
+    await update.message.reply_text(f"✅ Selecionado: **{', '.join(escolhidos)}**, {cidade_interior}")
+    return await pergunta_tipo(update, context)
 
 async def pergunta_tipo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not update.message or not isinstance(update.message.text, str):
@@ -2229,7 +3068,7 @@ async def pergunta_tipo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     await update.message.reply_text(
         f"🏠 Qual tipo de imóvel você procura?\n\n{tipos_str}\n\n"
-        "*Responda apenas o número.*"
+        "*Responda o número (ou vários, ex: 1, 4).*"
     )
     context.user_data['tipos'] = tipos
     return ESCOLHA_TIPO
@@ -2244,28 +3083,36 @@ async def escolha_tipo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_choice = update.message.text.strip()
     logger.info(f"👤 User {user_id} chose property type: {user_choice}")
     
-    try:
-        tipos = context.user_data.get('tipos', [])
-        if not isinstance(tipos, list):
-            return ConversationHandler.END
-        idx = int(update.message.text.strip()) - 1
-        if idx < 0 or idx >= len(tipos):
-            raise Exception
-        tipo = tipos[idx]
-        context.user_data['tipo'] = tipo
-        logger.info(f"🏠 User {user_id} selected property type: {tipo}")
-        
+    tipos = context.user_data.get('tipos', [])
+    if not isinstance(tipos, list):
+        return ConversationHandler.END
+    escolhidos, invalido, _ = resolve_choices(user_choice, tipos, TIPOS_INDEX)
+    if invalido is not None:
+        await update.message.reply_text("Escolha inválida. Responda o número do tipo de imóvel (ou vários, ex: 1, 4).")
+        logger.info(f"❌ User {user_id} gave invalid property type choice: {user_choice}")
+        return ESCOLHA_TIPO
+    
+    n_bairros = len(context.user_data.get('bairros_busca') or [None])
+    combinacoes = len(escolhidos) * n_bairros
+    if combinacoes > MAX_SEARCH_COMBINATIONS:
+        # Os bairros já respeitam o limite sozinhos, então sempre cabe ao menos um tipo
+        max_tipos = MAX_SEARCH_COMBINATIONS // n_bairros
         await update.message.reply_text(
-            "💰 Você deseja:\n\n"
-            "1️⃣ Alugar\n"
-            "2️⃣ Comprar\n\n"
-            "*Responda 1 ou 2.*"
+            f"⚠️ {len(escolhidos)} tipo(s) x {n_bairros} bairro(s) geram {combinacoes} buscas; o máximo é "
+            f"{MAX_SEARCH_COMBINATIONS}. Escolha até {max_tipos} tipo(s)."
         )
-        return ESCOLHA_MODALIDADE
-    except:
-        await update.message.reply_text("Escolha inválida. Responda o número do tipo de imóvel.")
-        logger.info(f"❌ User {user_id} gave invalid property type choice: {user_choice}")
         return ESCOLHA_TIPO
+    context.user_data['tipo'] = escolhidos[0]
+    context.user_data['tipos_busca'] = escolhidos
+    logger.info(f"🏠 User {user_id} selected property type(s): {escolhidos}")
+    
+    await update.message.reply_text(
+        "💰 Você deseja:\n\n"
+        "1️⃣ Alugar\n"
+        "2️⃣ Comprar\n\n"
+        "*Responda 1 ou 2.*"
+    )
+    return ESCOLHA_MODALIDADE
 
 async def escolha_modalidade(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not update.message or not isinstance(update.message.text, str) or not update.message.text:
@@ -2361,14 +3208,48 @@ async def escolha_paginas(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.info(f"❌ User {user_id} gave invalid page format: {txt}")
         return ESCOLHA_PAGINAS
     
+    await update.message.reply_text(
+        "⚡ Como deseja receber os resultados?\n\n"
+        "1️⃣ Completo - com anunciante, descrição, endereço e data de cada anúncio\n"
+        "2️⃣ Rápido - só os dados da listagem (preço, área, quartos, local), bem mais rápido; "
+        "depois você pode detalhar os que interessarem com /detalhar\n\n"
+        "Responda 1 ou 2."
+    )
+    return ESCOLHA_MODO
+
+async def escolha_modo(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not update.message or not isinstance(update.message.text, str) or not update.message.text:
+        return ConversationHandler.END
+    if not isinstance(context.user_data, dict):
+        return ConversationHandler.END
+    
+    user_id = update.effective_user.id
+    txt = update.message.text.strip().lower()
+    logger.info(f"👤 User {user_id} chose mode: {txt}")
+    
+    if txt in ['1', 'completo', 'c']:
+        context.user_data['modo'] = 'completo'
+    elif txt in ['2', 'rapido', 'rápido', 'r']:
+        context.user_data['modo'] = 'rapido'
+    else:
+        await update.message.reply_text("Responda 1 para Completo ou 2 para Rápido.")
+        logger.info(f"❌ User {user_id} gave invalid mode: {txt}")
+        return ESCOLHA_MODO
+    
     # Resumo direto da busca
-    user_data = context.user_data if isinstance(context.user_data, dict) else {}
-    tipo = user_data.get('tipo', 'N/A')
+    resumo = search_summary(context.user_data) + "Posso iniciar a coleta?"
+    await update.message.reply_text(resumo)
+    return CONFIRMA_BUSCA
+
+def search_summary(user_data):
+    """Resumo dos parâmetros da busca, mostrado antes de iniciar a coleta"""
+    tipo = choices_label(user_data, 'tipos_busca', 'tipo')
     modalidade = user_data.get('modalidade', 'N/A')
     local = user_data.get('local', 'N/A')
     refinamentos = user_data.get('refinamentos', {})
     
     resumo = f"📋 **Resumo da busca:**\n"
+    resumo += f"• Site: {get_site_description(user_data)}\n"
     resumo += f"• Tipo: {tipo}\n"
     resumo += f"• Modalidade: {modalidade}\n"
     
@@ -2379,7 +3260,9 @@ async def escolha_paginas(update: Update, context: ContextTypes.DEFAULT_TYPE):
     elif local == 'zona_completa':
         resumo += f"• Zona Completa: {user_data.get('zona', 'N/A')}\n"
     elif local == 'bairro':
-        resumo += f"• Bairro: {user_data.get('bairro', 'N/A')} ({user_data.get('zona', 'N/A')})\n"
+        resumo += f"• Bairro: {choices_label(user_data, 'bairros_busca', 'bairro')} ({user_data.get('zona', 'N/A')})\n"
+    elif local == 'bairro_interior':
+        resumo += f"• Bairro: {choices_label(user_data, 'bairros_busca', 'bairro')} ({user_data.get('cidade', 'N/A')})\n"
     elif local == 'cidade':
         resumo += f"• Cidade: {user_data.get('cidade', 'N/A')}\n"
     
@@ -2396,14 +3279,17 @@ async def escolha_paginas(update: Update, context: ContextTypes.DEFAULT_TYPE):
             filtros.append(f"mín R$ {refinamentos['min_preco']:,}".replace(',', '.'))
         if refinamentos.get('min_quartos'):
             filtros.append(f"{refinamentos['min_quartos']}+ quartos")
+        if refinamentos.get('min_banheiros'):
+            filtros.append(f"{refinamentos['min_banheiros']}+ banheiros")
+        if refinamentos.get('min_vagas'):
+            filtros.append(f"{refinamentos['min_vagas']}+ vagas")
         resumo += ", ".join(filtros) if filtros else "Nenhum"
         resumo += "\n"
     
-    resumo += f"• Páginas: {paginas}\n\n"
-    resumo += "Posso iniciar a coleta?"
+    resumo += f"• Páginas: {user_data.get('paginas', 5)}\n"
+    resumo += f"• Modo: {'Rápido (sem detalhes)' if user_data.get('modo') == 'rapido' else 'Completo'}\n\n"
+    return resumo
     
-    await update.message.reply_text(resumo)
-    return CONFIRMA_BUSCA
 
 async def confirma_busca(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not update.message or not isinstance(update.message.text, str) or not update.message.text:
@@ -2420,24 +3306,488 @@ async def confirma_busca(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.info(f"❌ User {user_id} cancelled the search")
         return ConversationHandler.END
     await update.message.reply_text("Iniciando a coleta. Isso pode levar alguns minutos...")
+    # Cópia dos parâmetros: /start durante a coleta limpa context.user_data
+    return await launch_search(update, context, dict(context.user_data))
+
+DUPLICATE_JOB_MESSAGE = (
+    "⚠️ Você já tem uma busca em andamento.\n\n"
+    "Aguarde ela terminar ou use /x para cancelá-la antes de iniciar outra."
+)
+
+def rejects_new_search(existing):
+    """True se a busca ativa do usuário impede uma nova (política DUPLICATE_JOB_POLICY)"""
+    return bool(existing) and not existing['cancelled'] and DUPLICATE_JOB_POLICY != 'replace'
+
+async def launch_search(update, context, user_data):
+    """Inicia a coleta numa thread do usuário (ou na fila atrás da anterior) e retorna o próximo estado"""
+    user_id = update.effective_user.id
     logger.info(f"🚀 Starting scraping for user {user_id}")
     
     # Obter o event loop da thread principal
     loop = asyncio.get_event_loop()
-    threading.Thread(target=run_scraping_and_send, args=(update, context, loop)).start()
+    
+    existing = get_active_scraping_task(user_id)
+    if existing:
+        if rejects_new_search(existing):
+            await update.message.reply_text(DUPLICATE_JOB_MESSAGE)
+            logger.info(f"⚠️ Rejected duplicate search for user {user_id}")
+            return ConversationHandler.END
+        if not existing['cancelled']:
+            cancel_user_scraping(user_id)
+            await update.message.reply_text("🔄 Cancelando a busca anterior para iniciar a nova...")
+        # A nova coleta só começa quando a anterior liberar os navegadores
+        def start_waiter(queued):
+            waiter = threading.Thread(
+                target=run_scraping_after,
+                args=(existing['thread'], queued, loop),
+                name=job_thread_name(user_id)
+            )
+            waiter.start()
+            return waiter
+        
+        queued = queue_scraping_task(user_id, (update, context, user_data), start_waiter)
+        if queued == 'replaced':
+            await update.message.reply_text("🔄 A busca que aguardava na fila foi substituída por esta.")
+        if queued:
+            return AGUARDA_SCRAPING
+        # A anterior terminou enquanto isso: inicia normalmente
+    
+    thread = threading.Thread(target=run_scraping_and_send, args=(update, context, loop, user_data), name=job_thread_name(user_id))
+    if not register_scraping_task(user_id, thread):
+        await update.message.reply_text("⚠️ A busca anterior ainda está terminando. Tente novamente em instantes.")
+        return ConversationHandler.END
+    thread.start()
+    record_search(loop, user_id, user_data)
     return AGUARDA_SCRAPING
 
-def run_scraping_and_send(update, context, loop):
+def record_search(loop, user_id, user_data):
+    """Guarda a busca iniciada no histórico do /repetir sem bloquear o event loop com a escrita do arquivo"""
+    loop.run_in_executor(None, remember_search, user_id, dict(user_data))
+
+def run_scraping_after(previous_thread, queued, loop):
+    """Aguarda a coleta anterior do usuário encerrar e então inicia a busca da fila (a mais recente)"""
+    METRICS.inc('imobbot_jobs_waiting')
+    try:
+        previous_thread.join(timeout=PREVIOUS_JOB_WAIT_TIMEOUT)
+    finally:
+        METRICS.dec('imobbot_jobs_waiting')
+    
+    user_id = queued['spec'][0].effective_user.id
+    status, spec = start_queued_task(user_id, queued)
+    if status == 'busy':
+        asyncio.run_coroutine_threadsafe(
+            queued['spec'][0].message.reply_text(
+                "⚠️ A busca anterior ainda está em andamento. Use /x para cancelá-la e tente novamente."
+            ),
+            loop
+        )
+    if status != 'start':
+        return
+    update, context, user_data = spec
+    # Já estamos fora do event loop: grava o histórico do /repetir direto
+    remember_search(user_id, user_data)
+    run_scraping_and_send(update, context, loop, user_data)
+
+def export_excel_parts(df, file_path, max_bytes=TELEGRAM_MAX_DOCUMENT_BYTES):
+    """
+    Exporta o DataFrame para .xlsx respeitando o limite de documentos do Telegram.
+    Se o arquivo completo passar do limite, divide as linhas em partes numeradas
+    (imoveis_..._parte1.xlsx, ...). Retorna a lista de arquivos na ordem de envio.
+    """
+    df.to_excel(file_path, index=False)
+    file_size = os.path.getsize(file_path)
+    if file_size <= max_bytes or len(df) <= 1:
+        return [file_path]
+    
+    os.remove(file_path)
+    base, ext = os.path.splitext(file_path)
+    # Estimativa inicial pelo tamanho médio por linha, com 10% de folga
+    n_parts = math.ceil(file_size / (max_bytes * 0.9))
+    rows_per_part = math.ceil(len(df) / n_parts)
+    logger.info(f"📦 Excel com {file_size} bytes excede o limite de {max_bytes}; dividindo em ~{n_parts} partes")
+    
+    chunks = [df.iloc[i:i + rows_per_part] for i in range(0, len(df), rows_per_part)]
+    part_paths = []
+    while chunks:
+        chunk = chunks.pop(0)
+        part_path = f"{base}_parte{len(part_paths) + 1}{ext}"
+        chunk.to_excel(part_path, index=False)
+        if os.path.getsize(part_path) > max_bytes and len(chunk) > 1:
+            # Estimativa falhou para esta parte (linhas maiores que a média): dividir ao meio
+            os.remove(part_path)
+            half = len(chunk) // 2
+            chunks[:0] = [chunk.iloc[:half], chunk.iloc[half:]]
+            continue
+        part_paths.append(part_path)
+    
+    return part_paths
+
+def send_document_with_retry(update, loop, file_path, filename, caption, user_id):
+    """
+    Envia um arquivo ao usuário aguardando a confirmação do Telegram.
+    Faz uma segunda tentativa após 2 segundos só se a primeira falhou com certeza:
+    num timeout o arquivo pode ter chegado, e reenviar duplicaria a parte.
+    Retorna True se o envio foi confirmado.
+    """
+    def send(document, **kwargs):
+        future = asyncio.run_coroutine_threadsafe(
+            update.message.reply_document(
+                document=document,
+                caption=caption,
+                connect_timeout=TELEGRAM_CONNECT_TIMEOUT,
+                write_timeout=TELEGRAM_UPLOAD_TIMEOUT,
+                read_timeout=TELEGRAM_READ_TIMEOUT,
+                **kwargs
+            ),
+            loop
+        )
+        try:
+            future.result(timeout=TELEGRAM_UPLOAD_WAIT)
+        except FutureTimeoutError:
+            # Não deixar o upload seguindo no event loop depois de desistirmos dele
+            future.cancel()
+            raise
+    
+    try:
+        logger.info(f"📤 Tentativa 1: Enviando {filename} para user {user_id}")
+        
+        # Verificar se o arquivo existe
+        if not os.path.exists(file_path):
+            logger.error(f"❌ Arquivo não encontrado: {file_path}")
+            raise FileNotFoundError(f"Arquivo não encontrado: {file_path}")
+        
+        # Verificar tamanho do arquivo
+        file_size = os.path.getsize(file_path)
+        logger.info(f"📁 Tamanho do arquivo: {file_size} bytes")
+        
+        # Usar InputFile para forçar o envio
+        with open(file_path, 'rb') as file:
+            send(InputFile(file, filename=filename))
+        
+        logger.info(f"✅ Arquivo {filename} enviado com sucesso na primeira tentativa para user {user_id}")
+        METRICS.inc('imobbot_telegram_documents_sent_total')
+        return True
+    except (FutureTimeoutError, TimedOut) as timeout_error:
+        logger.error(f"⏱️ Timeout no envio de {filename} para user {user_id}, sem nova tentativa para não duplicar: {timeout_error!r}")
+        METRICS.inc('imobbot_telegram_send_failures_total', {'kind': 'document', 'attempt': '1'})
+        return False
+    except Exception as send_error:
+        logger.error(f"❌ Erro na primeira tentativa de envio de {filename} para user {user_id}: {str(send_error)}")
+        METRICS.inc('imobbot_telegram_send_failures_total', {'kind': 'document', 'attempt': '1'})
+    
+    # SEGUNDA TENTATIVA após 2 segundos
+    try:
+        logger.info(f"🔄 Tentativa 2: Aguardando 2 segundos e tentando novamente para user {user_id}")
+        time.sleep(2)
+        
+        # Segunda tentativa usando caminho do arquivo
+        send(file_path, filename=filename)
+        logger.info(f"✅ Arquivo {filename} enviado com sucesso na segunda tentativa para user {user_id}")
+        METRICS.inc('imobbot_telegram_documents_sent_total')
+        return True
+    except Exception as second_send_error:
+        logger.error(f"❌ Erro na segunda tentativa de envio de {filename} para user {user_id}: {second_send_error!r}")
+        METRICS.inc('imobbot_telegram_send_failures_total', {'kind': 'document', 'attempt': '2'})
+        return False
+
+def format_listing_preview(item, position):
+    """Formata um imóvel coletado como texto curto para a prévia no chat"""
+    detalhes = [format_brl(item.preco)]
+    if item.area is not None:
+        detalhes.append(f"{format_number(item.area)} m²")
+    if item.quartos is not None:
+        detalhes.append(f"{item.quartos} quartos")
+    if item.vagas is not None:
+        detalhes.append(f"{item.vagas} vagas")
+    
+    local = ', '.join(v for v in (item.rua, item.endereco) if v)
+    
+    linhas = [f"{position}. {' • '.join(detalhes)}"]
+    if local:
+        linhas.append(f"📍 {local}")
+    linhas.append(f"🔗 {_text_or_na(item.link)}")
+    return '\n'.join(linhas)
+
+class ResultPreview:
+    """
+    Envia ao usuário os primeiros imóveis compatíveis assim que as primeiras
+    páginas chegam, enquanto o restante da coleta e o enriquecimento continuam.
+    """
+    def __init__(self, update, loop, refinamentos, user_id, size=PREVIEW_SIZE):
+        self.update = update
+        self.loop = loop
+        self.refinamentos = refinamentos
+        self.user_id = user_id
+        self.size = size
+        self.matches = []
+        self.sent = False
+        self.lock = threading.Lock()
+
+    def add_page(self, page_data):
+        """Callback de página concluída: acumula os compatíveis e envia ao atingir o tamanho da prévia"""
+        if self.size <= 0:
+            return
+        with self.lock:
+            if self.sent:
+                return
+            matches = apply_refinamentos(page_data, self.refinamentos) if self.refinamentos else page_data
+            self.matches.extend(matches)
+            if len(self.matches) < self.size:
+                return
+            self.sent = True
+            items = self.matches[:self.size]
+        self._send(items)
+
+    def flush(self):
+        """Envia a prévia com o que houver, caso a coleta termine antes de atingir o tamanho"""
+        if self.size <= 0:
+            return
+        with self.lock:
+            if self.sent or not self.matches:
+                return
+            self.sent = True
+            items = self.matches[:self.size]
+        self._send(items)
+
+    def _send(self, items):
+        if is_scraping_cancelled(self.user_id):
+            return
+        try:
+            texto = (
+                f"👀 Prévia: {len(items)} primeiros imóveis compatíveis "
+                f"(a planilha completa chega ao final da coleta)\n\n"
+                + '\n\n'.join(format_listing_preview(item, i) for i, item in enumerate(items, start=1))
+            )
+            asyncio.run_coroutine_threadsafe(
+                self.update.message.reply_text(
+                    texto,
+                    link_preview_options=LinkPreviewOptions(is_disabled=True)
+                ),
+                self.loop
+            )
+            logger.info(f"👀 Preview with {len(items)} properties sent to user {self.user_id}")
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao enviar prévia para user {self.user_id}: {str(e)}")
+
+def format_duration(seconds):
+    """Formata uma duração em segundos como '1 min 20 s'"""
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds} s"
+    return f"{seconds // 60} min {seconds % 60:02d} s"
+
+# Última edição da mensagem de status quando a busca termina sem planilha
+PROGRESS_FINAL_TEXT = {
+    'cancelled': "❌ Busca cancelada.",
+    'empty': "❌ Busca encerrada sem imóveis compatíveis.",
+    'error': "⚠️ Busca interrompida por um erro.",
+}
+
+class ProgressReporter:
+    """
+    Mantém uma única mensagem de status por busca e a edita conforme o progresso
+    (páginas, imóveis encontrados, detalhes coletados e tempo estimado).
+    As edições são espaçadas por PROGRESS_UPDATE_INTERVAL para respeitar os
+    limites de taxa do Telegram.
+    """
+    def __init__(self, update, loop, user_id, min_interval=PROGRESS_UPDATE_INTERVAL):
+        self.update = update
+        self.loop = loop
+        self.user_id = user_id
+        self.min_interval = min_interval
+        self.lock = threading.Lock()
+        self.message = None
+        self.pending_edit = None
+        self.last_edit = 0.0
+        self.last_text = None
+        self.finished = False
+        self.started_at = time.time()
+        self.pages_total = 0
+        self.pages_done = 0
+        self.cards = 0
+        self.enrich_started_at = None
+        self.enrich_total = 0
+        self.enrich_done = 0
+
+    def set_pages_total(self, total):
+        with self.lock:
+            self.pages_total = total
+        self._refresh(force=True)
+
+    def page_done(self, cards):
+        with self.lock:
+            self.pages_done += 1
+            self.cards += cards
+        self._refresh()
+
+    def start_enrichment(self, total):
+        with self.lock:
+            self.enrich_started_at = time.time()
+            self.enrich_total = total
+            self.enrich_done = 0
+        self._refresh(force=True)
+
+    def enrichment_progress(self, done, total):
+        with self.lock:
+            self.enrich_done = done
+            self.enrich_total = total
+        self._refresh()
+
+    def finish(self, text):
+        """Edita a mensagem de status uma última vez e encerra as atualizações; chamadas seguintes não fazem nada"""
+        self._refresh(force=True, text=text, final=True)
+
+    def _eta(self):
+        if self.enrich_started_at is not None:
+            started, done, total = self.enrich_started_at, self.enrich_done, self.enrich_total
+        else:
+            started, done, total = self.started_at, self.pages_done, self.pages_total
+        if done <= 0 or total <= done:
+            return None
+        return (time.time() - started) / done * (total - done)
+
+    def _render(self):
+        linhas = ["⏳ Busca em andamento..."]
+        if self.pages_total:  # /detalhar só enriquece, sem páginas de busca
+            linhas.append(f"📄 Páginas: {min(self.pages_done, self.pages_total)}/{self.pages_total}")
+            linhas.append(f"🏠 Imóveis encontrados: {self.cards}")
+        if self.enrich_started_at is not None:
+            linhas.append(f"🔎 Detalhes coletados: {self.enrich_done}/{self.enrich_total}")
+        eta = self._eta()
+        if eta is not None:
+            linhas.append(f"⏱️ Tempo restante estimado: ~{format_duration(eta)}")
+        linhas.append(f"🕐 Decorrido: {format_duration(time.time() - self.started_at)}")
+        return '\n'.join(linhas)
+
+    def _refresh(self, force=False, text=None, final=False):
+        with self.lock:
+            if self.finished or (not final and is_scraping_cancelled(self.user_id)):
+                return
+            if final:
+                self.finished = True
+                if self.message is None:
+                    return  # sem mensagem de status para encerrar
+            now = time.time()
+            if not force and now - self.last_edit < self.min_interval:
+                return
+            # Não empilhar edições: se a anterior ainda não terminou, espera a próxima janela
+            if not force and self.pending_edit is not None and not self.pending_edit.done():
+                return
+            text = text or self._render()
+            if text == self.last_text:
+                return
+            self.last_edit = now
+            self.last_text = text
+            message = self.message
+        
+        try:
+            if message is None:
+                # Primeira chamada: criar a mensagem de status e guardar a referência para editar depois
+                sent = asyncio.run_coroutine_threadsafe(
+                    self.update.message.reply_text(text),
+                    self.loop
+                ).result(timeout=15)
+                with self.lock:
+                    self.message = sent
+            else:
+                future = asyncio.run_coroutine_threadsafe(message.edit_text(text), self.loop)
+                with self.lock:
+                    self.pending_edit = future
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao atualizar status para user {self.user_id}: {str(e)}")
+            if message is None:
+                # Sem a mensagem original não há o que editar: parar, em vez de mandar uma nova a cada atualização
+                with self.lock:
+                    self.finished = True
+
+def build_results_dataframe(items, user_data, numbered=False, numbers=None):
+    """Planilha de resultados: colunas de localização conforme a busca e ordem fixa de colunas"""
+    import pandas as pd
+    df = pd.DataFrame([imovel.to_row() for imovel in items])
+    
+    # Adicionar informações de localização baseadas na busca
+    local_tipo = user_data.get('local', '')
+    
+    if local_tipo == 'bairro':
+        # Se a busca foi por bairro específico, usar esse bairro (com vários, vale o extraído do card)
+        if len(user_data.get('bairros_busca') or []) <= 1:
+            df['Bairro'] = user_data.get('bairro', 'N/A')
+        df['Município'] = 'Rio de Janeiro'
+        df['Estado'] = 'RJ'
+    elif local_tipo == 'zona':
+        # Se foi por zona, manter o bairro extraído do endereço
+        # Bairro já vem preenchido do scraping
+        df['Município'] = 'Rio de Janeiro'
+        df['Estado'] = 'RJ'
+    elif local_tipo == 'zona_completa':
+        # Se foi por zona completa, manter o bairro extraído do endereço
+        # Bairro já vem preenchido do scraping
+        df['Município'] = 'Rio de Janeiro'
+        df['Estado'] = 'RJ'
+    elif local_tipo == 'cidade':
+        # Se foi por cidade do interior
+        cidade_busca = user_data.get('cidade', 'N/A')
+        df['Município'] = cidade_busca
+        df['Estado'] = 'RJ'
+        # Bairro já vem preenchido do scraping
+    elif local_tipo == 'todo_estado':
+        # Se foi todo o estado, manter município e bairro extraídos
+        df['Estado'] = 'RJ'
+        # Bairro e Município já vêm preenchidos do scraping
+    
+    # Ordem e nomes das colunas igual ao DONE.py
+    column_order = [
+        'Site', 'Tipo de Imóvel', 'Tipo de Transação',
+        'Titulo_Anuncio', 'Codigos_Anuncio',
+        'Preço', 'Condomínio', 'IPTU',
+        'Quartos', 'Banheiros', 'Vagas', 'Área m²',
+        'Rua', 'Bairro', 'Município', 'Estado', 'Endereco_Completo',
+        'Anunciante', 'Creci', 'Classificacao_Anunciante', 'Imoveis_Cadastrados',
+        'Descricao', 'Telefone', 'Data_Criacao',
+        'Link'
+    ]
+    
+    # Filtra apenas as colunas que existem no DataFrame
+    existing_columns = [col for col in column_order if col in df.columns]
+    df = df[existing_columns]
+    if any(imovel.detalhes_pendentes for imovel in items):
+        df.insert(0, 'Detalhes', ['Pendente' if imovel.detalhes_pendentes else '' for imovel in items])
+    if numbered:
+        # Nº é a posição usada pelo /detalhar
+        df.insert(0, 'Nº', numbers or range(1, len(df) + 1))
+    return df
+
+def run_scraping_and_send(update, context, loop, user_data=None):
     user_id = update.effective_user.id
-    user_data = context.user_data if isinstance(context.user_data, dict) else {}
+    if user_data is None:
+        user_data = dict(context.user_data) if isinstance(context.user_data, dict) else {}
     site_choice = user_data.get('site', 'viva')  # Padrão Viva Real se não especificado
     refinamentos = user_data.get('refinamentos', {})
     max_pages = user_data.get('paginas', 5)  # Padrão 5 páginas se não especificado
+    fast_mode = user_data.get('modo') == 'rapido'  # só os dados dos cards, sem enriquecimento
+    
+    logger.info(f"🕷️ Starting scraping for user {user_id}, site: {site_choice}, pages: {max_pages}, fast: {fast_mode}")
+    
+    # Registrar a tarefa de scraping (normalmente já registrada por confirma_busca)
+    if not register_scraping_task(user_id, threading.current_thread()):
+        return
+    
+    # Prévia enviada assim que as primeiras páginas trazem imóveis compatíveis
+    preview = ResultPreview(update, loop, refinamentos, user_id)
     
-    logger.info(f"🕷️ Starting scraping for user {user_id}, site: {site_choice}, pages: {max_pages}")
+    # Mensagem de status única, editada conforme a coleta avança
+    progress = ProgressReporter(update, loop, user_id)
+    sites = SEARCH_SITES.get(site_choice, ['viva'])  # Fallback para Viva Real
+    plan = plan_search(user_data, max_pages)
+    progress.set_pages_total(len(sites) * sum(pages for _, pages in plan))
     
-    # Registrar a tarefa de scraping
-    register_scraping_task(user_id, threading.current_thread())
+    def on_page(page_data):
+        progress.page_done(len(page_data))
+        preview.add_page(page_data)
+    
+    # Relatório de tempos por etapa, gravado ao final (mesmo em erro ou cancelamento)
+    report = JobReport(user_id, user_data)
+    profiler = start_job_profiler(user_id)
     
     try:
         # Verificar se foi cancelado antes de começar
@@ -2450,47 +3800,21 @@ def run_scraping_and_send(update, context, loop):
             return
         
         data = []
+        scraping_started = time.perf_counter()
         
-        # Executar scraping baseado na escolha do site
-        if site_choice == 'viva':
-            url = build_vivareal_url(user_data)
-            logger.info(f"🌐 Scraping Viva Real: {url}")
-            data = scrape_vivareal(url, refinamentos, max_pages=max_pages, user_id=user_id, tipo_solicitado=user_data.get('tipo', 'N/A'), tipo_transacao=user_data.get('modalidade', 'N/A'))
-        elif site_choice == 'zap':
-            url = build_zap_url(user_data)
-            logger.info(f"🌐 Scraping Zap Imóveis: {url}")
-            data = scrape_zap(url, refinamentos, max_pages=max_pages, user_id=user_id, tipo_solicitado=user_data.get('tipo', 'N/A'), tipo_transacao=user_data.get('modalidade', 'N/A'))
-        elif site_choice == 'ambos':
-            # Scraping de ambos os sites
-            all_data = []
-            
-            # Viva Real
-            viva_url = build_vivareal_url(user_data)
-            logger.info(f"🌐 Scraping Viva Real: {viva_url}")
-            viva_data = scrape_vivareal(viva_url, refinamentos, max_pages=max_pages, user_id=user_id, tipo_solicitado=user_data.get('tipo', 'N/A'), tipo_transacao=user_data.get('modalidade', 'N/A'))
-            all_data.extend(viva_data)
-            
-            # Verificar cancelamento entre sites
-            if is_scraping_cancelled(user_id):
-                logger.info(f"🚫 Scraping cancelled for user {user_id} between sites")
-                asyncio.run_coroutine_threadsafe(
-                    update.message.reply_text("❌ Operação cancelada pelo usuário."),
-                    loop
-                )
-                return
-            
-            # Zap Imóveis
-            zap_url = build_zap_url(user_data)
-            logger.info(f"🌐 Scraping Zap Imóveis: {zap_url}")
-            zap_data = scrape_zap(zap_url, refinamentos, max_pages=max_pages, user_id=user_id, tipo_solicitado=user_data.get('tipo', 'N/A'), tipo_transacao=user_data.get('modalidade', 'N/A'))
-            all_data.extend(zap_data)
-            
-            data = all_data
+        # Executar scraping baseado na escolha do site (e nas fatias/combinações da busca)
+        if len(plan) > 1:
+            data = scrape_sharded(sites, plan, refinamentos, user_id=user_id, on_page=on_page, report=report)
         else:
-            # Fallback para Viva Real
-            url = build_vivareal_url(user_data)
-            logger.info(f"🌐 Fallback to Viva Real: {url}")
-            data = scrape_vivareal(url, refinamentos, max_pages=max_pages, user_id=user_id, tipo_solicitado=user_data.get('tipo', 'N/A'), tipo_transacao=user_data.get('modalidade', 'N/A'))
+            for site in sites:
+                # Verificar cancelamento entre sites
+                if is_scraping_cancelled(user_id):
+                    logger.info(f"🚫 Scraping cancelled for user {user_id} between sites")
+                    break
+                data.extend(scrape_search(site, user_data, refinamentos, max_pages, user_id=user_id, on_page=on_page, report=report))
+
+        report.add('scraping', time.perf_counter() - scraping_started)
+        report.count('cards', len(data))
         
         # Verificar se foi cancelado após o scraping inicial
         if is_scraping_cancelled(user_id):
@@ -2511,20 +3835,31 @@ def run_scraping_and_send(update, context, loop):
                 loop
             )
             logger.info(f"❌ No properties found for user {user_id}")
+            report.status = 'empty'
             return
         
-        # Nova mensagem: "Encontrei alguma coisa..."
-        asyncio.run_coroutine_threadsafe(
-            update.message.reply_text(
-                f"🎯 Encontrei alguma coisa! {len(data)} imóveis coletados.\n\n"
-                f"Agora estou aplicando seus filtros e coletando detalhes..."
-            ),
-            loop
-        )
-        logger.info(f"🔎 Enriquecendo detalhes dos imóveis para user {user_id}")
+        # Garantir a prévia mesmo quando a coleta trouxe menos imóveis que o tamanho da prévia
+        preview.flush()
+        
+        if fast_mode:
+            logger.info(f"⚡ Fast mode for user {user_id}: skipping enrichment of {len(data)} properties")
+            enriched_data = data
+            store_fast_results(user_id, data, user_data)
+        else:
+            # Nova mensagem: "Encontrei alguma coisa..."
+            asyncio.run_coroutine_threadsafe(
+                update.message.reply_text(
+                    f"🎯 Encontrei alguma coisa! {len(data)} imóveis coletados.\n\n"
+                    f"Agora estou aplicando seus filtros e coletando detalhes..."
+                ),
+                loop
+            )
+            logger.info(f"🔎 Enriquecendo detalhes dos imóveis para user {user_id}")
         
-        # Enriquecer detalhes
-        enriched_data = enrich_property_details(data, max_workers=4, user_id=user_id)
+            # Enriquecer detalhes
+            progress.start_enrichment(len(data))
+            with report.stage('enrichment'):
+                enriched_data = enrich_property_details(data, max_workers=4, user_id=user_id, on_progress=progress.enrichment_progress, report=report, refinamentos=refinamentos)
         
         # Verificar se foi cancelado após o enriquecimento
         if is_scraping_cancelled(user_id):
@@ -2546,192 +3881,132 @@ def run_scraping_and_send(update, context, loop):
                 loop
             )
             logger.info(f"❌ No properties remaining after enrichment for user {user_id}")
+            report.status = 'empty'
             return
         
-        # Criar planilha com os dados coletados
-        df = pd.DataFrame(enriched_data)
-        
-        # Adicionar informações de localização baseadas na busca
-        local_tipo = user_data.get('local', '')
-        
-        if local_tipo == 'bairro':
-            # Se a busca foi por bairro específico, usar esse bairro
-            bairro_busca = user_data.get('bairro', 'N/A')
-            df['Bairro'] = bairro_busca
-            df['Município'] = 'Rio de Janeiro'
-            df['Estado'] = 'RJ'
-        elif local_tipo == 'zona':
-            # Se foi por zona, manter o bairro extraído do endereço
-            # Bairro já vem preenchido do scraping
-            df['Município'] = 'Rio de Janeiro'
-            df['Estado'] = 'RJ'
-        elif local_tipo == 'zona_completa':
-            # Se foi por zona completa, manter o bairro extraído do endereço
-            # Bairro já vem preenchido do scraping
-            df['Município'] = 'Rio de Janeiro'
-            df['Estado'] = 'RJ'
-        elif local_tipo == 'cidade':
-            # Se foi por cidade do interior
-            cidade_busca = user_data.get('cidade', 'N/A')
-            df['Município'] = cidade_busca
-            df['Estado'] = 'RJ'
-            # Bairro já vem preenchido do scraping
-        elif local_tipo == 'todo_estado':
-            # Se foi todo o estado, manter município e bairro extraídos
-            df['Estado'] = 'RJ'
-            # Bairro e Município já vêm preenchidos do scraping
-        
-        # Ordem e nomes das colunas igual ao DONE.py
-        column_order = [
-            'Site', 'Tipo de Imóvel', 'Tipo de Transação',
-            'Titulo_Anuncio', 'Codigos_Anuncio',
-            'Preço', 'Condomínio', 'IPTU',
-            'Quartos', 'Banheiros', 'Vagas', 'Área m²',
-            'Rua', 'Bairro', 'Município', 'Estado', 'Endereco_Completo',
-            'Anunciante', 'Creci', 'Classificacao_Anunciante', 'Imoveis_Cadastrados',
-            'Descricao', 'Telefone', 'Data_Criacao',
-            'Link'
-        ]
+        progress.finish("✅ Coleta concluída! Preparando a planilha...")
         
-        # Remove a coluna Endereço do DataFrame (já temos Bairro, Município e Estado separados)
-        if 'Endereço' in df.columns:
-            df = df.drop(columns=['Endereço'])
+        # Criar planilha com os dados coletados (conversão para texto só aqui)
+        dataframe_started = time.perf_counter()
+        pending = sum(1 for imovel in enriched_data if imovel.detalhes_pendentes)
+        if pending:
+            # Os pendentes podem ser detalhados depois com /detalhar, como no modo rápido
+            store_fast_results(user_id, enriched_data, user_data)
+        df = build_results_dataframe(enriched_data, user_data, numbered=fast_mode or bool(pending))
         
-        # Filtra apenas as colunas que existem no DataFrame
-        existing_columns = [col for col in column_order if col in df.columns]
-        df = df[existing_columns]
+        report.add('dataframe', time.perf_counter() - dataframe_started)
         
         file_path = f"imoveis_{user_id}_{int(time.time())}.xlsx"
-        df.to_excel(file_path, index=False)
-        logger.info(f"📊 Excel file created: {file_path} with {len(enriched_data)} properties")
+        with report.stage('export'):
+            part_paths = export_excel_parts(df, file_path)
+        report.count('rows', len(df))
+        report.count('parts', len(part_paths))
+        logger.info(f"📊 Excel file(s) created: {part_paths} with {len(enriched_data)} properties")
         
         # Verificar se foi cancelado antes de enviar o arquivo
         if is_scraping_cancelled(user_id):
             logger.info(f"🚫 Scraping cancelled for user {user_id} before sending file")
-            try:
-                os.remove(file_path)
-            except:
-                pass
+            for part_path in part_paths:
+                try:
+                    os.remove(part_path)
+                except:
+                    pass
             asyncio.run_coroutine_threadsafe(
                 update.message.reply_text("❌ Operação cancelada pelo usuário."),
                 loop
             )
             return
         
-        # Função para gerar descrição específica do local
-        def get_local_description(user_data):
-            local = user_data.get('local', 'N/A')
-            if local == 'todo_estado':
-                return "Todo o estado do RJ"
-            elif local == 'zona':
-                zona = user_data.get('zona', 'N/A')
-                return f"{zona} (com bairros)"
-            elif local == 'zona_completa':
-                zona = user_data.get('zona', 'N/A')
-                return f"{zona} (completa)"
-            elif local == 'bairro':
-                bairro = user_data.get('bairro', 'N/A')
-                zona = user_data.get('zona', 'N/A')
-                return f"Bairro {bairro}, {zona}"
-            elif local == 'bairro_interior':
-                bairro = user_data.get('bairro', 'N/A')
-                cidade = user_data.get('cidade', 'N/A')
-                return f"Bairro {bairro}, {cidade}"
-            elif local == 'cidade':
-                cidade = user_data.get('cidade', 'N/A')
-                return f"Cidade {cidade}"
-            else:
-                return local
+        resumo_envio = (
+            f"✅ Busca finalizada! {len(enriched_data)} imóveis encontrados.\n\n"
+            f"📊 Dados coletados:\n"
+            f"• Site: {get_site_description(user_data)}\n"
+            f"• Local: {get_local_description(user_data)}\n"
+            f"• Tipo: {choices_label(user_data, 'tipos_busca', 'tipo')}\n"
+            f"• Modalidade: {user_data.get('modalidade', 'N/A')}\n"
+            f"• Páginas: {max_pages}\n\n"
+        )
+        if fast_mode:
+            resumo_envio += "⚡ Modo rápido: para os detalhes, use /detalhar com os números da coluna Nº (ex: /detalhar 1-10).\n\n"
+        elif pending:
+            resumo_envio += f"⏳ {pending} imóveis ficaram sem detalhes (marcados como pendentes); use /detalhar com os números da coluna Nº.\n\n"
 
         # Aguardar 3 segundos antes de enviar o arquivo
         logger.info(f"⏳ Aguardando 3 segundos antes de enviar arquivo para user {user_id}")
         time.sleep(3)
         
-        # Enviar arquivo como .xlsx - PRIMEIRA TENTATIVA
-        try:
-            logger.info(f"📤 Tentativa 1: Enviando arquivo para user {user_id}")
-            
-            # Verificar se o arquivo existe
-            if not os.path.exists(file_path):
-                logger.error(f"❌ Arquivo não encontrado: {file_path}")
-                raise FileNotFoundError(f"Arquivo não encontrado: {file_path}")
-            
-            # Verificar tamanho do arquivo
-            file_size = os.path.getsize(file_path)
-            logger.info(f"📁 Tamanho do arquivo: {file_size} bytes")
-            
-            # Usar InputFile para forçar o envio
-            with open(file_path, 'rb') as file:
-                input_file = InputFile(file, filename=f"imoveis_rj_{len(enriched_data)}_imoveis.xlsx")
-                
-                asyncio.run_coroutine_threadsafe(
-                    update.message.reply_document(
-                        document=input_file,
-                        caption=f"✅ Busca finalizada! {len(enriched_data)} imóveis encontrados.\n\n📊 Dados coletados:\n• Site: {get_site_description(user_data)}\n• Local: {get_local_description(user_data)}\n• Tipo: {user_data.get('tipo', 'N/A')}\n• Modalidade: {user_data.get('modalidade', 'N/A')}\n• Páginas: {max_pages}\n\nUse /start para nova busca."
-                    ),
-                    loop
-                )
+        total_parts = len(part_paths)
+        if total_parts > 1:
+            # Resultado acima do limite do Telegram: avisar e enviar em partes numeradas
+            total_mb = sum(os.path.getsize(p) for p in part_paths) / (1024 * 1024)
+            asyncio.run_coroutine_threadsafe(
+                update.message.reply_text(
+                    f"📦 O resultado ficou grande ({total_mb:.1f} MB) e será enviado em {total_parts} partes."
+                ),
+                loop
+            )
+        
+        failed_parts = []
+        upload_started = time.perf_counter()
+        for part_number, part_path in enumerate(part_paths, start=1):
+            if is_scraping_cancelled(user_id):
+                logger.info(f"🚫 Scraping cancelled for user {user_id} while sending part {part_number}/{total_parts}")
+                break
             
-            logger.info(f"✅ Arquivo enviado com sucesso na primeira tentativa para user {user_id}")
-        except Exception as send_error:
-            logger.error(f"❌ Erro na primeira tentativa de envio para user {user_id}: {str(send_error)}")
+            if total_parts == 1:
+                filename = f"imoveis_rj_{len(enriched_data)}_imoveis.xlsx"
+                caption = resumo_envio + "Use /start para nova busca."
+            else:
+                filename = f"imoveis_rj_{len(enriched_data)}_imoveis_parte{part_number}de{total_parts}.xlsx"
+                caption = f"📎 Parte {part_number}/{total_parts}"
+                if part_number == total_parts:
+                    caption = resumo_envio + caption + "\n\nUse /start para nova busca."
             
-            # SEGUNDA TENTATIVA após 2 segundos
+            if not send_document_with_retry(update, loop, part_path, filename, caption, user_id):
+                failed_parts.append(part_number)
+        
+        report.add('upload', time.perf_counter() - upload_started)
+        report.count('failed_parts', len(failed_parts))
+        
+        if failed_parts:
+            # ÚLTIMA TENTATIVA - Enviar como mensagem de texto com informações
             try:
-                logger.info(f"🔄 Tentativa 2: Aguardando 2 segundos e tentando novamente para user {user_id}")
-                time.sleep(2)
+                logger.info(f"🔄 Enviando informações como texto para user {user_id} (partes com falha: {failed_parts})")
+                
+                if total_parts == 1:
+                    erro_envio = "❌ Erro ao enviar arquivo."
+                else:
+                    erro_envio = f"❌ Erro ao enviar as partes {', '.join(str(p) for p in failed_parts)} de {total_parts}."
+                info_message = resumo_envio + f"{erro_envio}\n\nUse /start para uma nova busca."
                 
-                # Segunda tentativa usando caminho do arquivo
                 asyncio.run_coroutine_threadsafe(
-                    update.message.reply_document(
-                        document=file_path,
-                        filename=f"imoveis_rj_{len(enriched_data)}_imoveis.xlsx",
-                        caption=f"✅ Busca finalizada! {len(enriched_data)} imóveis encontrados.\n\n📊 Dados coletados:\n• Site: {get_site_description(user_data)}\n• Local: {get_local_description(user_data)}\n• Tipo: {user_data.get('tipo', 'N/A')}\n• Modalidade: {user_data.get('modalidade', 'N/A')}\n• Páginas: {max_pages}\n\nUse /start para nova busca."
-                    ),
+                    update.message.reply_text(info_message),
                     loop
                 )
-                logger.info(f"✅ Arquivo enviado com sucesso na segunda tentativa para user {user_id}")
-            except Exception as second_send_error:
-                logger.error(f"❌ Erro na segunda tentativa de envio para user {user_id}: {str(second_send_error)}")
-                
-                # TERCEIRA TENTATIVA - Enviar como mensagem de texto com informações
-                try:
-                    logger.info(f"🔄 Tentativa 3: Enviando informações como texto para user {user_id}")
-                    
-                    info_message = (
-                        f"✅ Busca finalizada! {len(enriched_data)} imóveis encontrados.\n\n"
-                        f"📊 Dados coletados:\n"
-                        f"• Site: {get_site_description(user_data)}\n"
-                        f"• Local: {get_local_description(user_data)}\n"
-                        f"• Tipo: {user_data.get('tipo', 'N/A')}\n"
-                        f"• Modalidade: {user_data.get('modalidade', 'N/A')}\n"
-                        f"• Páginas: {max_pages}\n\n"
-                        f"❌ Erro ao enviar arquivo: {str(second_send_error)}\n\n"
-                        f"Use /start para uma nova busca."
-                    )
-                    
-                    asyncio.run_coroutine_threadsafe(
-                        update.message.reply_text(info_message),
-                        loop
-                    )
-                    logger.info(f"✅ Informações enviadas como texto para user {user_id}")
-                except Exception as text_error:
-                    logger.error(f"❌ Erro ao enviar texto para user {user_id}: {str(text_error)}")
-                    logger.error(f"💥 Falha total na comunicação com user {user_id}")
+                logger.info(f"✅ Informações enviadas como texto para user {user_id}")
+            except Exception as text_error:
+                logger.error(f"❌ Erro ao enviar texto para user {user_id}: {str(text_error)}")
+                METRICS.inc('imobbot_telegram_send_failures_total', {'kind': 'text', 'attempt': '1'})
+                logger.error(f"💥 Falha total na comunicação com user {user_id}")
         
-        # Limpar arquivo temporário
-        try:
-            os.remove(file_path)
-            logger.info(f"🗑️ Arquivo temporário removido: {file_path}")
-        except Exception as cleanup_error:
-            logger.warning(f"⚠️ Erro ao remover arquivo temporário {file_path}: {str(cleanup_error)}")
+        # Limpar arquivos temporários
+        for part_path in part_paths:
+            try:
+                os.remove(part_path)
+                logger.info(f"🗑️ Arquivo temporário removido: {part_path}")
+            except Exception as cleanup_error:
+                logger.warning(f"⚠️ Erro ao remover arquivo temporário {part_path}: {str(cleanup_error)}")
+        
+        report.status = 'ok' if not failed_parts else 'upload_failed'
         
         # Limpar registro da tarefa
-        unregister_scraping_task(user_id)
+        unregister_scraping_task(user_id, threading.current_thread())
         logger.info(f"✅ Processo finalizado para user {user_id}")
         
     except Exception as e:
         logger.error(f"❌ Error in scraping for user {user_id}: {str(e)}")
+        report.status = 'error'
+        report.error = str(e)
         try:
             asyncio.run_coroutine_threadsafe(
                 update.message.reply_text(
@@ -2742,8 +4017,95 @@ def run_scraping_and_send(update, context, loop):
         except Exception as send_error:
             logger.error(f"❌ Error sending error message to user {user_id}: {str(send_error)}")
     finally:
+        if is_scraping_cancelled(user_id):
+            report.status = 'cancelled'
+        # Cancelamento, busca vazia ou erro: a mensagem de status não pode ficar em "em andamento"
+        progress.finish(PROGRESS_FINAL_TEXT.get(report.status, "⏹️ Busca encerrada."))
+        finish_job_profiler(profiler, report)
+        report.finish()
         # Sempre desregistrar a tarefa ao final
-        unregister_scraping_task(user_id)
+        unregister_scraping_task(user_id, threading.current_thread())
+
+def run_details_and_send(update, loop, selected, user_data):
+    """Enriquece os imóveis escolhidos com /detalhar e envia uma planilha só com eles"""
+    user_id = update.effective_user.id
+    numbers = [n for n, _ in selected]
+    items = [imovel for _, imovel in selected]
+    report = JobReport(user_id, {**user_data, 'detalhar': len(items)})
+    progress = ProgressReporter(update, loop, user_id)
+    part_paths = []
+    
+    try:
+        progress.start_enrichment(len(items))
+        with report.stage('enrichment'):
+            enrich_property_details(items, max_workers=4, user_id=user_id, on_progress=progress.enrichment_progress, report=report, top_k=0)
+        if is_scraping_cancelled(user_id):
+            logger.info(f"🚫 Details cancelled for user {user_id}")
+            asyncio.run_coroutine_threadsafe(
+                update.message.reply_text("❌ Operação cancelada pelo usuário."),
+                loop
+            )
+            return
+        progress.finish("✅ Detalhes coletados! Preparando a planilha...")
+        
+        with report.stage('dataframe'):
+            df = build_results_dataframe(items, user_data, numbered=True, numbers=numbers)
+        with report.stage('export'):
+            part_paths = export_excel_parts(df, f"detalhes_{user_id}_{int(time.time())}.xlsx")
+        report.count('rows', len(df))
+        
+        failed_parts = []
+        with report.stage('upload'):
+            for part_number, part_path in enumerate(part_paths, start=1):
+                suffix = f"_parte{part_number}de{len(part_paths)}" if len(part_paths) > 1 else ""
+                filename = f"imoveis_rj_{len(items)}_detalhados{suffix}.xlsx"
+                if not send_document_with_retry(update, loop, part_path, filename, f"🔎 {len(items)} imóveis detalhados", user_id):
+                    failed_parts.append(part_number)
+        report.status = 'ok' if not failed_parts else 'upload_failed'
+    except Exception as e:
+        logger.error(f"❌ Error detailing properties for user {user_id}: {str(e)}")
+        report.status = 'error'
+        report.error = str(e)
+        asyncio.run_coroutine_threadsafe(
+            update.message.reply_text(f"❌ Ocorreu um erro ao coletar os detalhes: {str(e)}"),
+            loop
+        )
+    finally:
+        for part_path in part_paths:
+            try:
+                os.remove(part_path)
+            except Exception:
+                pass
+        if is_scraping_cancelled(user_id):
+            report.status = 'cancelled'
+        progress.finish(PROGRESS_FINAL_TEXT.get(report.status, "⏹️ Busca encerrada."))
+        report.finish()
+        unregister_scraping_task(user_id, threading.current_thread())
+
+def get_local_description(user_data):
+    """Descrição amigável do local da busca"""
+    local = user_data.get('local', 'N/A')
+    if local == 'todo_estado':
+        return "Todo o estado do RJ"
+    elif local == 'zona':
+        zona = user_data.get('zona', 'N/A')
+        return f"{zona} (com bairros)"
+    elif local == 'zona_completa':
+        zona = user_data.get('zona', 'N/A')
+        return f"{zona} (completa)"
+    elif local == 'bairro':
+        bairro = choices_label(user_data, 'bairros_busca', 'bairro')
+        zona = user_data.get('zona', 'N/A')
+        return f"Bairro {bairro}, {zona}"
+    elif local == 'bairro_interior':
+        bairro = choices_label(user_data, 'bairros_busca', 'bairro')
+        cidade = user_data.get('cidade', 'N/A')
+        return f"Bairro {bairro}, {cidade}"
+    elif local == 'cidade':
+        cidade = user_data.get('cidade', 'N/A')
+        return f"Cidade {cidade}"
+    else:
+        return local
 
 def get_site_description(user_data):
     """Retorna uma descrição amigável do site escolhido"""
@@ -2768,14 +4130,18 @@ def main():
     logger.info(f"🔑 Telegram Token: {TELEGRAM_TOKEN[:10]}...")
     logger.info(f"🔑 OpenAI API Key: {OPENAI_API_KEY[:10]}...")
     
+    start_metrics_server()
+    
     app = ApplicationBuilder().token(TELEGRAM_TOKEN).build()
     
     # Adicionar handlers para comandos de controle
     app.add_handler(CommandHandler('x', cancel_command))
     app.add_handler(CommandHandler('r', restart_command))
+    app.add_handler(CommandHandler('perfil', profile_command))
+    app.add_handler(CommandHandler('detalhar', detail_command))
     
     conv = ConversationHandler(
-        entry_points=[CommandHandler('start', start)],
+        entry_points=[CommandHandler('start', start), CommandHandler('buscar', search_command), CommandHandler('repetir', repeat_command)],
         states={
             ESCOLHA_SITE: [MessageHandler(filters.TEXT & ~filters.COMMAND, escolha_site)],
             ESCOLHA_LOCAL: [MessageHandler(filters.TEXT & ~filters.COMMAND, escolha_local)],
@@ -2789,11 +4155,14 @@ def main():
             ESCOLHA_MODALIDADE: [MessageHandler(filters.TEXT & ~filters.COMMAND, escolha_modalidade)],
             ESCOLHA_REFINAMENTO: [MessageHandler(filters.TEXT & ~filters.COMMAND, escolha_refinamento)],
             ESCOLHA_PAGINAS: [MessageHandler(filters.TEXT & ~filters.COMMAND, escolha_paginas)],
+            ESCOLHA_MODO: [MessageHandler(filters.TEXT & ~filters.COMMAND, escolha_modo)],
             CONFIRMA_BUSCA: [MessageHandler(filters.TEXT & ~filters.COMMAND, confirma_busca)],
             AGUARDA_SCRAPING: [],
         },
         fallbacks=[
             CommandHandler('start', start),
+            CommandHandler('buscar', search_command),
+            CommandHandler('repetir', repeat_command),
             CommandHandler('x', cancel_command),
             CommandHandler('r', restart_command)
         ],
@@ -0,0 +1,149 @@
+"""
+Benchmark offline do ImobBot.
+
+Reprocessa páginas salvas do Viva Real e do Zap Imóveis (pasta fixtures/)
+pelas mesmas funções usadas pelo bot: parser de cards, extract_feature,
+apply_refinamentos, extrator da página de detalhes e exportação para .xlsx.
+Não usa rede nem navegador, então qualquer mudança de desempenho pode ser
+comparada num notebook.
+
+Fixtures:
+    fixtures/<site>_busca*.html    páginas de resultado (site = vivareal ou zap)
+    fixtures/<site>_anuncio*.html  páginas de detalhes de anúncio
+Para atualizar, salve uma página real no navegador ("Salvar como > HTML")
+com um desses nomes.
+
+Uso:
+    python benchmark_imobbot.py [--repeat 20] [--rows 5000] [--fixtures fixtures]
+"""
+import argparse
+import glob
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+
+import ImobBotZAPVIVA as bot
+
+SITES = {'vivareal': 'Viva Real', 'zap': 'Zap Imóveis'}
+FEATURES = [
+    'rp-cardProperty-propertyArea-txt',
+    'rp-cardProperty-bedroomQuantity-txt',
+    'rp-cardProperty-bathroomQuantity-txt',
+    'rp-cardProperty-parkingSpacesQuantity-txt',
+]
+REFINAMENTOS = {'min_quartos': 2, 'min_vagas': 1, 'max_preco': 8000, 'min_area': 50}
+
+
+def load_fixtures(fixtures_dir, kind):
+    """Retorna [(nome_site, html)] das fixtures do tipo 'busca' ou 'anuncio'"""
+    pages = []
+    for path in sorted(glob.glob(os.path.join(fixtures_dir, f"*_{kind}*.html"))):
+        prefix = os.path.basename(path).split('_', 1)[0]
+        with open(path, encoding='utf-8') as f:
+            pages.append((SITES.get(prefix, prefix), f.read()))
+    return pages
+
+
+def measure(func):
+    """Executa func uma vez medindo tempo; depois de novo sob tracemalloc para o pico de memória"""
+    start = time.perf_counter()
+    count = func()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, elapsed, peak
+
+
+def report(stage, unit, count, elapsed, peak):
+    rate = count / elapsed if elapsed > 0 else float('inf')
+    print(f"{stage:<36} {count:>8} {unit:<8} {elapsed:>8.3f} s {rate:>12.1f} {unit}/s   pico {peak / 1024:>9.0f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline das etapas de parsing, filtro e exportação do ImobBot")
+    parser.add_argument('--fixtures', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures'))
+    parser.add_argument('--repeat', type=int, default=20, help="repetições por página de fixture")
+    parser.add_argument('--rows', type=int, default=5000, help="imóveis usados nas etapas de filtro e exportação")
+    args = parser.parse_args()
+
+    # O bot registra uma linha por imóvel em INFO; no benchmark isso só mediria o logging
+    logging.getLogger().setLevel(logging.WARNING)
+
+    search_pages = load_fixtures(args.fixtures, 'busca')
+    ad_pages = load_fixtures(args.fixtures, 'anuncio')
+    if not search_pages or not ad_pages:
+        raise SystemExit(f"Fixtures não encontradas em {args.fixtures}")
+
+    print(f"Fixtures: {len(search_pages)} páginas de busca, {len(ad_pages)} páginas de anúncio; repeat={args.repeat}, rows={args.rows}\n")
+
+    # 1. Parser de cards (BeautifulSoup + parse_listing_card)
+    def stage_cards():
+        pages = 0
+        for _ in range(args.repeat):
+            for site, html in search_pages:
+                bot.parse_search_page(html, site, 'Apartamento', 'Aluguel')
+                pages += 1
+        return pages
+    report("parse_search_page", "páginas", *measure(stage_cards))
+
+    records = []
+    for site, html in search_pages:
+        records.extend(bot.parse_search_page(html, site, 'Apartamento', 'Aluguel'))
+    print(f"{'':<36} ({len(records)} cards por rodada)")
+
+    # 2. extract_feature sobre cards já parseados
+    from bs4 import BeautifulSoup
+    listings = []
+    for _, html in search_pages:
+        listings.extend(BeautifulSoup(html, 'html.parser').find_all('li', {'data-cy': 'rp-property-cd'}))
+
+    def stage_features():
+        calls = 0
+        for _ in range(args.repeat):
+            for listing in listings:
+                for feature in FEATURES:
+                    bot.extract_feature(listing, feature)
+                    calls += 1
+        return calls
+    report("extract_feature", "chamadas", *measure(stage_features))
+
+    # 3. apply_refinamentos sobre um volume de imóveis de busca estadual
+    rows = (records * (args.rows // max(len(records), 1) + 1))[:args.rows]
+
+    def stage_filter():
+        for _ in range(args.repeat):
+            bot.apply_refinamentos(rows, REFINAMENTOS)
+        return len(rows) * args.repeat
+    report("apply_refinamentos", "imóveis", *measure(stage_filter))
+
+    # 4. Extrator da página de detalhes (usado por Extract_ad_info)
+    def stage_details():
+        pages = 0
+        for _ in range(args.repeat):
+            for _, html in ad_pages:
+                bot.parse_ad_details(html)
+                pages += 1
+        return pages
+    report("parse_ad_details", "páginas", *measure(stage_details))
+
+    # 5. Exportação: to_row + DataFrame + .xlsx
+    detalhes = bot.parse_ad_details(ad_pages[0][1])
+    for imovel in rows:
+        imovel.detalhes = detalhes
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        def stage_export():
+            import pandas as pd
+            df = pd.DataFrame([imovel.to_row() for imovel in rows])
+            bot.export_excel_parts(df, os.path.join(tmp_dir, "benchmark.xlsx"))
+            return len(rows)
+        report("export (DataFrame + xlsx)", "linhas", *measure(stage_export))
+
+
+if __name__ == "__main__":
+    main()
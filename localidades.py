@@ -0,0 +1,172 @@
+"""
+Dados de localização do RJ compartilhados pelos bots (ImobBotZAPVIVA.py, ImobBot.py
+e ImobBot copy.py): zonas e bairros da capital, cidades do estado, bairros das
+cidades do interior e tipos de imóvel.
+
+A fonte única é localidades_rj.json, lido uma vez na importação. Os slugs usados
+nas URLs do Viva Real e do Zap Imóveis são calculados aqui, na carga, para que
+montar uma URL seja só consulta a dicionário. As tabelas são indexadas pelo nome
+em minúsculas, que é como os valores chegam de user_data nos build_*_url.
+
+Para incluir um bairro, cidade ou abreviação do Zap, edite o JSON.
+"""
+import json
+import logging
+import os
+import re
+import unicodedata
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'localidades_rj.json')
+
+
+_NON_SLUG_CHARS = re.compile(r'[^\w\s-]')  # tudo que não é alfanumérico, espaço ou hífen
+_SEPARATORS = re.compile(r'[-\s]+')  # sequências de espaços/hífens
+
+
+@lru_cache(maxsize=4096)
+def normalize_str(s):
+    """Slug no formato dos portais ('São Cristóvão' -> 'sao-cristovao'); memoizado, os nomes se repetem muito"""
+    if not s:
+        return ""
+    # Remove acentos e caracteres especiais
+    s = unicodedata.normalize('NFD', s)
+    s = ''.join(c for c in s if unicodedata.category(c) != 'Mn')
+    # Converte para minúsculas e substitui espaços por hífens
+    s = s.lower().strip()
+    s = _NON_SLUG_CHARS.sub('', s)
+    s = _SEPARATORS.sub('-', s)
+    return s.strip('-')
+
+
+def slug(table, name):
+    """Slug pré-calculado de um nome conhecido; nomes fora do dataset (texto livre) passam pelo normalize_str"""
+    return table.get(name) or normalize_str(name)
+
+
+with open(DATA_FILE, encoding='utf-8') as f:
+    _data = json.load(f)
+
+ZONAS_RJ = _data['zonas']
+CIDADES_RJ = _data['cidades']
+CIDADES_INTERIOR_BAIRROS = _data['cidades_interior']
+TIPOS_IMOVEL = [tipo['nome'] for tipo in _data['tipos_imovel']]
+
+# --- Tabelas de slugs (chave: nome em minúsculas) ---
+TIPO_SLUGS_VIVAREAL = {tipo['nome'].lower(): tipo['vivareal'] for tipo in _data['tipos_imovel']}
+TIPO_SLUGS_ZAP = {tipo['nome'].lower(): tipo['zap'] for tipo in _data['tipos_imovel']}
+ZONA_SLUGS = dict(_data['zona_slugs'])
+for _zona in ZONAS_RJ:
+    ZONA_SLUGS.setdefault(_zona.lower(), normalize_str(_zona))
+
+CIDADE_SLUGS = {cidade.lower(): normalize_str(cidade) for cidade in [*CIDADES_RJ, *CIDADES_INTERIOR_BAIRROS]}
+
+_todos_bairros = {
+    bairro
+    for bairros in [*ZONAS_RJ.values(), *CIDADES_INTERIOR_BAIRROS.values()]
+    for bairro in bairros
+}
+BAIRRO_SLUGS_VIVAREAL = {bairro.lower(): normalize_str(bairro) for bairro in _todos_bairros}
+# O Zap abrevia alguns bairros (Santa -> sta, Vila -> vl, Jardim -> jd...)
+_zap_abreviacoes = {nome.lower(): abrev for nome, abrev in _data['zap_abreviacoes'].items()}
+BAIRRO_SLUGS_ZAP = {
+    nome: _zap_abreviacoes.get(nome, slug_viva)
+    for nome, slug_viva in BAIRRO_SLUGS_VIVAREAL.items()
+}
+for _nome, _abrev in _zap_abreviacoes.items():
+    BAIRRO_SLUGS_ZAP.setdefault(_nome, _abrev)
+
+del _data, _todos_bairros, _zap_abreviacoes, _zona, _nome, _abrev
+
+
+# --- Busca de nomes digitados em texto livre ---
+class NameIndex:
+    """
+    Índice de trigramas e prefixos sobre uma lista de nomes, insensível a acentos e
+    maiúsculas, para resolver o que o usuário digita ('copacabna', 'sao goncalo',
+    'niter') sem exigir o número da lista.
+    """
+    AUTO_SCORE = 0.6  # similaridade mínima para aceitar o melhor candidato sem perguntar
+    AUTO_MARGIN = 0.15  # e a vantagem mínima sobre o segundo colocado
+
+    def __init__(self, names):
+        self.names = list(dict.fromkeys(names))
+        self._keys = [self._fold(name) for name in self.names]
+        self._exact = {}
+        self._grams = []
+        self._postings = {}
+        for i, key in enumerate(self._keys):
+            self._exact.setdefault(key, i)
+            grams = self._trigrams(key)
+            self._grams.append(len(grams))
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(i)
+
+    @staticmethod
+    def _fold(text):
+        return normalize_str(text).replace('-', ' ')
+
+    @staticmethod
+    def _trigrams(key):
+        padded = f"  {key} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def search(self, text, limit=3):
+        """Até `limit` pares (nome, score de 0 a 1), do mais para o menos parecido"""
+        query = self._fold(text)
+        if not query:
+            return []
+        if query in self._exact:
+            return [(self.names[self._exact[query]], 1.0)]
+
+        grams = self._trigrams(query)
+        shared = {}
+        for gram in grams:
+            for i in self._postings.get(gram, ()):
+                shared[i] = shared.get(i, 0) + 1
+
+        scores = {}
+        for i, count in shared.items():
+            # Coeficiente de Dice sobre os trigramas
+            scores[i] = 2 * count / (len(grams) + self._grams[i])
+        for i, key in enumerate(self._keys):
+            # Início do nome ou de uma palavra do nome ('niter', 'goncalo')
+            if key.startswith(query) or f" {query}" in f" {key}":
+                scores[i] = max(scores.get(i, 0), 0.7 + 0.3 * len(query) / len(key))
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], self._keys[item[0]]))
+        return [(self.names[i], round(score, 3)) for i, score in ranked[:limit]]
+
+    def exact(self, text):
+        """O nome cuja forma sem acentos/maiúsculas é igual ao texto, ou None"""
+        i = self._exact.get(self._fold(text))
+        return self.names[i] if i is not None else None
+
+    def resolve(self, text):
+        """(nome, sugestões): o nome quando a correspondência é inequívoca, senão None e até 3 sugestões"""
+        matches = self.search(text, limit=3)
+        if not matches:
+            return None, []
+        best_name, best_score = matches[0]
+        runner_up = matches[1][1] if len(matches) > 1 else 0
+        if best_score == 1.0 or (best_score >= self.AUTO_SCORE and best_score - runner_up >= self.AUTO_MARGIN):
+            return best_name, []
+        return None, [name for name, _ in matches]
+
+
+CIDADES_INDEX = NameIndex(CIDADES_RJ)
+CIDADES_INTERIOR_INDEX = NameIndex(CIDADES_INTERIOR_BAIRROS)
+BAIRROS_ZONA_INDEX = {zona: NameIndex(bairros) for zona, bairros in ZONAS_RJ.items()}
+BAIRROS_INTERIOR_INDEX = {cidade: NameIndex(bairros) for cidade, bairros in CIDADES_INTERIOR_BAIRROS.items()}
+TIPOS_INDEX = NameIndex(TIPOS_IMOVEL)
+ZONAS_INDEX = NameIndex(ZONAS_RJ)
+# Bairros da capital sem passar pela zona (os nomes não se repetem entre zonas)
+ZONA_DO_BAIRRO = {bairro: zona for zona, bairros in ZONAS_RJ.items() for bairro in bairros}
+BAIRROS_CAPITAL_INDEX = NameIndex(ZONA_DO_BAIRRO)
+
+logger.info(
+    f"✅ Loaded {len(CIDADES_RJ)} cities, {sum(len(b) for b in ZONAS_RJ.values())} capital neighborhoods "
+    f"and {len(CIDADES_INTERIOR_BAIRROS)} interior cities from {os.path.basename(DATA_FILE)}"
+)
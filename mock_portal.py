@@ -0,0 +1,211 @@
+"""
+Portal local que imita o Viva Real e o Zap Imóveis para testes de carga do ImobBot.
+
+Serve as fixtures de fixtures/ nos mesmos formatos de URL gerados por
+build_vivareal_url/build_zap_url, com paginação (?pagina=N), páginas de
+detalhe de anúncio, latência e taxa de erro configuráveis:
+
+    /vivareal/<qualquer caminho de busca>/?pagina=N   página de resultados do Viva Real
+    /zap/<qualquer caminho de busca>/?pagina=N        página de resultados do Zap
+    /<portal>/imovel/<slug>/                          página de detalhes do anúncio
+    /__stats                                          contadores de requisições (JSON)
+
+Só o servidor (aponte o bot para ele pelas variáveis de ambiente):
+    python mock_portal.py --port 8765 --latency 0.3 --error-rate 0.05
+    VIVAREAL_BASE_URL=http://127.0.0.1:8765/vivareal ZAP_BASE_URL=http://127.0.0.1:8765/zap python ImobBotZAPVIVA.py
+
+Teste de carga ponta a ponta (navegadores, paginação, enriquecimento e
+exportação) com N usuários simulados, sem Telegram:
+    python mock_portal.py --users 4 --pages 3
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+PORTALS = {'vivareal': 'vivareal', 'zap': 'zap'}  # prefixo da URL -> prefixo da fixture
+EMPTY_RESULTS = (
+    '<!DOCTYPE html><html lang="pt-BR"><body><div class="results-list__container">'
+    '<p>Não encontramos resultados para a sua busca.</p></div></body></html>'
+)
+AD_LINK_RE = re.compile(r'href="[^"]*/imovel/([^"/]+)-id-(\d+)/"')
+
+
+class MockPortalServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, jitter=0.0, error_rate=0.0, max_pages=20):
+        super().__init__(address, MockPortalHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.max_pages = max_pages
+        self.stats = {'busca': 0, 'anuncio': 0, 'erros': 0, 'vazias': 0}
+        self.stats_lock = threading.Lock()
+        self.fixtures = {}
+        for prefix in set(PORTALS.values()):
+            for kind in ('busca', 'anuncio'):
+                with open(os.path.join(FIXTURES_DIR, f"{prefix}_{kind}.html"), encoding='utf-8') as f:
+                    self.fixtures[(prefix, kind)] = f.read()
+
+    def count(self, key):
+        with self.stats_lock:
+            self.stats[key] += 1
+
+
+class MockPortalHandler(BaseHTTPRequestHandler):
+    server_version = "MockPortal/1.0"
+
+    def log_message(self, format, *args):
+        pass  # Uma linha por requisição distorceria o teste de carga
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        parts = [p for p in parsed.path.split('/') if p]
+
+        if parts == ['__stats']:
+            with self.server.stats_lock:
+                return self._send(200, json.dumps(self.server.stats), 'application/json')
+
+        if not parts or parts[0] not in PORTALS:
+            return self._send(404, "portal desconhecido")
+        fixture_prefix = PORTALS[parts[0]]
+
+        # Latência simulada e falhas aleatórias, como um portal sob carga
+        delay = self.server.latency + random.uniform(-self.server.jitter, self.server.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if random.random() < self.server.error_rate:
+            self.server.count('erros')
+            return self._send(503, "Service Unavailable")
+
+        if len(parts) >= 2 and parts[1] == 'imovel':
+            self.server.count('anuncio')
+            return self._send(200, self.server.fixtures[(fixture_prefix, 'anuncio')])
+
+        page = int(parse_qs(parsed.query).get('pagina', ['1'])[0] or 1)
+        if page > self.server.max_pages:
+            self.server.count('vazias')
+            return self._send(200, EMPTY_RESULTS)
+
+        self.server.count('busca')
+        base = f"http://{self.headers.get('Host')}/{parts[0]}"
+        # Links de anúncio únicos por página e apontando para este servidor
+        html = AD_LINK_RE.sub(
+            lambda m: f'href="{base}/imovel/{m.group(1)}-id-{int(m.group(2)) + page * 1000}/"',
+            self.server.fixtures[(fixture_prefix, 'busca')]
+        )
+        return self._send(200, html)
+
+    def _send(self, status, body, content_type='text/html; charset=utf-8'):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakeMessage:
+    """Mensagem do Telegram simulada: registra textos e documentos em vez de enviá-los"""
+    def __init__(self, log):
+        self.log = log
+
+    async def reply_text(self, text, **kwargs):
+        self.log.append(('texto', text))
+        return FakeMessage(self.log)
+
+    async def edit_text(self, text, **kwargs):
+        self.log.append(('edicao', text))
+        return self
+
+    async def reply_document(self, document=None, filename=None, caption=None, **kwargs):
+        self.log.append(('documento', filename or getattr(document, 'filename', None)))
+        return self
+
+
+def run_load_test(base_url, users, pages, site):
+    """Executa N buscas completas em paralelo contra o portal local e mede a vazão ponta a ponta"""
+    os.environ['VIVAREAL_BASE_URL'] = f"{base_url}/vivareal"
+    os.environ['ZAP_BASE_URL'] = f"{base_url}/zap"
+    import ImobBotZAPVIVA as bot
+
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+
+    results = []
+
+    def simulated_user(user_id):
+        log = []
+        update = SimpleNamespace(effective_user=SimpleNamespace(id=user_id), message=FakeMessage(log))
+        user_data = {
+            'site': site, 'local': 'bairro', 'zona': 'Zona Sul', 'bairro': 'Copacabana',
+            'tipo': 'Apartamento', 'modalidade': 'Aluguel', 'paginas': pages, 'refinamentos': {},
+        }
+        context = SimpleNamespace(user_data=dict(user_data))
+        start = time.perf_counter()
+        bot.run_scraping_and_send(update, context, loop, user_data)
+        results.append((user_id, time.perf_counter() - start, log))
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=simulated_user, args=(900000 + i,)) for i in range(users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    total = time.perf_counter() - start
+    loop.call_soon_threadsafe(loop.stop)
+
+    print(f"\n{users} usuários simulados, {pages} páginas, site={site}: {total:.1f} s no total")
+    for user_id, elapsed, log in sorted(results):
+        documentos = sum(1 for kind, _ in log if kind == 'documento')
+        print(f"  user {user_id}: {elapsed:6.1f} s, {documentos} arquivo(s), {len(log)} mensagens")
+    print(f"  vazão: {users / total * 60:.2f} buscas/min")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Portal local que imita o Viva Real e o Zap Imóveis")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help="latência média por requisição (s)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="variação máxima da latência (s)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fração de requisições respondidas com 503")
+    parser.add_argument('--max-pages', type=int, default=20, help="páginas com resultados por busca")
+    parser.add_argument('--users', type=int, default=0, help="roda um teste de carga com N usuários simulados")
+    parser.add_argument('--pages', type=int, default=3, help="páginas por busca no teste de carga")
+    parser.add_argument('--site', default='ambos', choices=['viva', 'zap', 'ambos'])
+    args = parser.parse_args()
+
+    server = MockPortalServer(
+        (args.host, args.port), latency=args.latency, jitter=args.jitter,
+        error_rate=args.error_rate, max_pages=args.max_pages
+    )
+    base_url = f"http://{args.host}:{server.server_address[1]}"
+
+    if not args.users:
+        print(f"Mock portal em {base_url} (Ctrl+C para sair)")
+        print(f"  VIVAREAL_BASE_URL={base_url}/vivareal ZAP_BASE_URL={base_url}/zap")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        run_load_test(base_url, args.users, args.pages, args.site)
+    finally:
+        server.shutdown()
+        print(f"  requisições ao portal: {json.dumps(server.stats)}")
+
+
+if __name__ == "__main__":
+    main()
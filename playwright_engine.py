@@ -0,0 +1,189 @@
+"""
+Motor de scraping alternativo ao Selenium, com a API assíncrona do Playwright.
+
+Em vez de um Chrome por página/anúncio, poucos navegadores (PLAYWRIGHT_BROWSERS)
+ficam abertos durante toda a vida do processo e cada requisição usa um contexto
+leve (aba isolada, com cookies próprios). Um event loop asyncio dedicado, numa
+thread própria, orquestra até PLAYWRIGHT_MAX_PAGES abas simultâneas somando todas
+as buscas em andamento.
+
+As threads de busca do bot continuam síncronas: fetch_iter() agenda as páginas
+no loop do motor e devolve os HTMLs à medida que ficam prontos.
+
+Ativado por deployment com SCRAPER_ENGINE=playwright (exige
+`pip install playwright && playwright install chromium`).
+"""
+import asyncio
+import logging
+import os
+import queue
+import threading
+from contextlib import nullcontext
+
+logger = logging.getLogger(__name__)
+
+PLAYWRIGHT_BROWSERS = int(os.getenv('PLAYWRIGHT_BROWSERS', '1'))
+PLAYWRIGHT_MAX_PAGES = int(os.getenv('PLAYWRIGHT_MAX_PAGES', '8'))  # abas simultâneas no processo todo
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36'
+
+_DONE = object()
+
+
+class PlaywrightEngine:
+    def __init__(self, browsers=PLAYWRIGHT_BROWSERS, max_pages=PLAYWRIGHT_MAX_PAGES, block_request=None):
+        """block_request(resource_type, url) -> bool decide quais sub-requisições abortar"""
+        self.browser_count = max(1, browsers)
+        self.max_pages = max(1, max_pages)
+        self.block_request = block_request
+        self.open_pages = 0
+        self._browsers = []
+        self._next_browser = 0
+        self._loop = None
+        self._playwright = None
+        self._semaphore = None
+        self._start_lock = threading.Lock()
+
+    # --- Ciclo de vida ---
+    def start(self):
+        """Sobe o event loop e os navegadores na primeira chamada; chamadas seguintes não fazem nada"""
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='playwright-engine', daemon=True).start()
+            try:
+                asyncio.run_coroutine_threadsafe(self._start(), loop).result(timeout=120)
+            except Exception:
+                loop.call_soon_threadsafe(loop.stop)
+                raise
+            self._loop = loop
+
+    async def _start(self):
+        from playwright.async_api import async_playwright
+        self._playwright = await async_playwright().start()
+        self._semaphore = asyncio.Semaphore(self.max_pages)
+        for _ in range(self.browser_count):
+            self._browsers.append(await self._launch())
+        logger.info(f"🎭 Playwright engine started: {self.browser_count} browser(s), up to {self.max_pages} concurrent pages")
+
+    async def _launch(self):
+        return await self._playwright.chromium.launch(
+            headless=True,
+            args=["--disable-gpu", "--no-sandbox", "--window-size=1920,1200"],
+        )
+
+    def close(self):
+        if self._loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._close(), self._loop).result(timeout=30)
+        except Exception as e:
+            logger.warning(f"⚠️ Error closing Playwright engine: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop = None
+
+    async def _close(self):
+        for browser in self._browsers:
+            try:
+                await browser.close()
+            except Exception:
+                pass
+        self._browsers = []
+        if self._playwright:
+            await self._playwright.stop()
+
+    @property
+    def browsers_alive(self):
+        return sum(1 for browser in self._browsers if browser.is_connected())
+
+    # --- Navegação ---
+    async def _browser(self):
+        """Próximo navegador em rodízio; relança o que tiver caído"""
+        index = self._next_browser % len(self._browsers)
+        self._next_browser += 1
+        if not self._browsers[index].is_connected():
+            logger.warning(f"⚠️ Playwright browser {index} disconnected, relaunching")
+            self._browsers[index] = await self._launch()
+        return self._browsers[index]
+
+    async def _route(self, route):
+        request = route.request
+        if self.block_request(request.resource_type, request.url):
+            await route.abort('blockedbyclient')
+        else:
+            await route.continue_()
+
+    async def _fetch(self, url, wait_selectors, timeout, wait_timeout, soft_wait, wait_until, stop, stage):
+        async with self._semaphore:
+            if stop.is_set():
+                return None
+            browser = await self._browser()
+            context = await browser.new_context(user_agent=USER_AGENT, viewport={'width': 1920, 'height': 1200})
+            self.open_pages += 1
+            try:
+                if self.block_request:
+                    await context.route('**/*', self._route)
+                page = await context.new_page()
+                with stage('navigation'):
+                    await page.goto(url, wait_until=wait_until, timeout=timeout * 1000)
+                if wait_selectors:
+                    with stage('wait'):
+                        await self._wait_for(page, wait_selectors, wait_timeout, soft_wait, url)
+                return await page.content()
+            finally:
+                self.open_pages -= 1
+                await context.close()
+
+    async def _wait_for(self, page, selectors, wait_timeout, soft_wait, url):
+        """Espera todos os seletores existirem no DOM, com um prazo único para o conjunto"""
+        deadline = asyncio.get_running_loop().time() + wait_timeout
+        for selector in selectors:
+            remaining = max(deadline - asyncio.get_running_loop().time(), 0.001)
+            try:
+                await page.wait_for_selector(selector, state='attached', timeout=remaining * 1000)
+            except Exception:
+                if not soft_wait:
+                    raise
+                logger.debug(f"[Playwright] {selector} not found after {wait_timeout}s on {url}")
+                return
+
+    def fetch_iter(self, urls, wait_selector=None, timeout=15, wait_until='domcontentloaded', stage=None,
+                   wait_timeout=None, soft_wait=False):
+        """
+        Busca as URLs em paralelo e gera (url, html) na ordem em que terminam;
+        html é None quando a página falhou ou estourou o tempo. Interromper a
+        iteração (break) cancela as páginas que ainda não começaram.
+
+        wait_selector pode ser um seletor ou uma lista (espera todos). Com
+        soft_wait, o prazo de espera estourado devolve o HTML como estiver.
+        """
+        self.start()
+        wait_selectors = [wait_selector] if isinstance(wait_selector, str) else list(wait_selector or [])
+        wait_timeout = timeout if wait_timeout is None else wait_timeout
+        stage = stage or (lambda name: nullcontext())
+        results = queue.Queue()
+        stop = threading.Event()
+
+        async def fetch_one(url):
+            html = None
+            try:
+                html = await self._fetch(url, wait_selectors, timeout, wait_timeout, soft_wait, wait_until, stop, stage)
+            except Exception as e:
+                logger.warning(f"⚠️ [Playwright] Error on {url}: {e}", extra={'sampled': True})
+            results.put((url, html))
+
+        async def fetch_all():
+            try:
+                await asyncio.gather(*(fetch_one(url) for url in urls))
+            finally:
+                results.put(_DONE)
+
+        asyncio.run_coroutine_threadsafe(fetch_all(), self._loop)
+        try:
+            while True:
+                item = results.get()
+                if item is _DONE:
+                    break
+                yield item
+        finally:
+            stop.set()